@@ -6,14 +6,14 @@ Allow runtime configuration of RAG without redeploying.
 from fastapi import APIRouter, HTTPException, Query, Depends
 from typing import List, Dict, Any
 
-from rag.config import RAGConfigManager
+from rag.config import get_rag_config_manager
 from auth_admin import verify_admin_key
 
 
 router = APIRouter(prefix="/admin/rag", tags=["admin"])
 
-# Initialize config manager
-config_manager = RAGConfigManager()
+# Same process-wide instance the detectors read, so edits apply without a restart
+config_manager = get_rag_config_manager()
 
 
 @router.get("/config")
@@ -194,8 +194,7 @@ async def reset_to_defaults(authenticated: bool = Depends(verify_admin_key)) ->
     POST /admin/rag/reset-defaults
     Reset all RAG configuration to defaults (all layers enabled)
     """
-    config_manager.config = config_manager._create_default_config()
-    success = config_manager.save_config()
+    success = config_manager.reset_to_defaults()
     if not success:
         raise HTTPException(status_code=500, detail="Failed to reset configuration")
     
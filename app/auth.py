@@ -1,47 +1,303 @@
+import asyncio
+import math
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict
+from typing import Any, Callable, Dict, List, Optional, Protocol, Sequence, Tuple, TypeVar, Union
 
 from config import settings
 
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# What a Redis outage raises: redis-py errors, plus socket errors from other clients
+BACKEND_ERRORS: Tuple[type, ...] = (redis.RedisError, OSError) if REDIS_AVAILABLE else (OSError,)
+
+
+T = TypeVar("T")
+
+DAY_SECONDS = 86400
+# Counters outlive their window by a day so the sliding window can still read yesterday
+COUNTER_TTL_SECONDS = 2 * DAY_SECONDS
+
+
+class RateLimitBackend(Protocol):
+    # True when calls do network I/O; RateLimiter's async methods then run them in a thread
+    blocking: bool
+
+    def get_many(self, keys: Sequence[str]) -> List[float]:
+        ...
+
+    def incr(self, key: str, amount: Union[int, float], ttl_seconds: int, fallback: bool = True) -> float:
+        """Add `amount` to `key`; with fallback=False an unreachable store raises instead of failing over."""
+        ...
+
+    def active(self) -> "RateLimitBackend":
+        """The store that takes writes right now (a failover store while the primary is down)."""
+        ...
+
+
+class MemoryRateLimitBackend:
+    """Per-process counters with TTL; expired windows are swept out periodically."""
+
+    blocking = False
+
+    def __init__(self, sweep_interval_seconds: float = 300.0) -> None:
+        self._values: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._next_sweep = time.monotonic() + sweep_interval_seconds
+
+    def get_many(self, keys: Sequence[str]) -> List[float]:
+        now = time.time()
+        values = []
+        for key in keys:
+            entry = self._values.get(key)
+            values.append(entry[0] if entry is not None and entry[1] > now else 0.0)
+        return values
+
+    def incr(self, key: str, amount: Union[int, float], ttl_seconds: int, fallback: bool = True) -> float:
+        now = time.time()
+        with self._lock:
+            entry = self._values.get(key)
+            value = entry[0] if entry is not None and entry[1] > now else 0.0
+            value += amount
+            self._values[key] = (value, now + ttl_seconds)
+            if time.monotonic() >= self._next_sweep:
+                self._sweep(now)
+        return value
+
+    def _sweep(self, now: float) -> None:
+        self._next_sweep = time.monotonic() + self.sweep_interval_seconds
+        for key in [key for key, (_, expires_at) in self._values.items() if expires_at <= now]:
+            del self._values[key]
+
+    def active(self) -> "MemoryRateLimitBackend":
+        return self
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class RedisRateLimitBackend:
+    """
+    Counters shared by every worker through Redis (or anything speaking its protocol).
+    INCRBY/INCRBYFLOAT + EXPIRE run in one MULTI/EXEC, so updates are atomic across workers.
+
+    When Redis is unreachable the limits fail over to per-process counters (with a
+    warning) and Redis is retried after `retry_after_seconds`, so an outage degrades
+    to per-worker limits instead of failing every request.
+    """
+
+    blocking = True
+
+    def __init__(self, client, retry_after_seconds: float = 30.0) -> None:
+        self.client = client
+        self.retry_after_seconds = retry_after_seconds
+        self.fallback = MemoryRateLimitBackend()
+        self._retry_at = 0.0
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisRateLimitBackend":
+        return cls(redis.Redis.from_url(url, socket_timeout=1.0))
+
+    def _available(self) -> bool:
+        return time.monotonic() >= self._retry_at
+
+    def _failed(self, exc: Exception) -> None:
+        self._retry_at = time.monotonic() + self.retry_after_seconds
+        print(
+            f"Rate limit backend unavailable ({exc!r}); using per-process limits "
+            f"for {self.retry_after_seconds:.0f}s"
+        )
+
+    def get_many(self, keys: Sequence[str]) -> List[float]:
+        if self._available():
+            try:
+                return [float(value) if value is not None else 0.0 for value in self.client.mget(list(keys))]
+            except BACKEND_ERRORS as exc:
+                self._failed(exc)
+        return self.fallback.get_many(keys)
+
+    def incr(self, key: str, amount: Union[int, float], ttl_seconds: int, fallback: bool = True) -> float:
+        if self._available():
+            try:
+                return self._incr(key, amount, ttl_seconds)
+            except BACKEND_ERRORS as exc:
+                self._failed(exc)
+                if not fallback:
+                    raise
+        elif not fallback:
+            raise ConnectionError("Rate limit backend unavailable")
+        return self.fallback.incr(key, amount, ttl_seconds)
+
+    def active(self) -> RateLimitBackend:
+        return self if self._available() else self.fallback
+
+    def _incr(self, key: str, amount: Union[int, float], ttl_seconds: int) -> float:
+        pipe = self.client.pipeline(transaction=True)
+        if isinstance(amount, int):
+            pipe.incrby(key, amount)
+        else:
+            pipe.incrbyfloat(key, amount)
+        pipe.expire(key, ttl_seconds)
+        value, _ = pipe.execute()
+        return float(value)
+
+
+def _default_backend() -> RateLimitBackend:
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        if REDIS_AVAILABLE:
+            return RedisRateLimitBackend.from_url(settings.RATE_LIMIT_REDIS_URL)
+        print("RATE_LIMIT_BACKEND=redis but the redis package is not installed; using per-process limits")
+    return MemoryRateLimitBackend()
+
+
+@dataclass
+class Reservation:
+    """Budget held for one in-flight request; settle it with the request's actual cost."""
+
+    ip: str
+    cost_key: str
+    reserved_usd: float
+    # Where the hold was written; the settle goes to the same store
+    backend: Optional[RateLimitBackend] = None
+    settled: bool = False
+
 
 class RateLimiter:
-    def __init__(self) -> None:
-        self.limits: Dict[str, int] = {}
-        self.costs: Dict[str, float] = {}
+    """
+    Daily query and budget limits per client IP.
+
+    algorithm="fixed" counts per calendar day. "sliding" approximates a rolling 24h window
+    from today's and yesterday's counters (yesterday weighted by the part of its window
+    still in range), so a client cannot double up around midnight. Both read at most two
+    counters per check.
+    """
+
+    def __init__(self, backend: Optional[RateLimitBackend] = None, algorithm: Optional[str] = None) -> None:
+        self.backend = backend or _default_backend()
+        self.algorithm = algorithm or settings.RATE_LIMIT_ALGORITHM
+        if self.algorithm not in {"fixed", "sliding"}:
+            raise ValueError(f"Unknown rate limit algorithm: {self.algorithm}")
         self.daily_limit = settings.RATE_LIMIT_PER_DAY
         self.daily_budget = settings.FREE_TIER_DAILY_BUDGET_USD
 
-    def _key(self, ip: str) -> str:
-        today = datetime.now().strftime("%Y-%m-%d")
-        return f"{ip}:{today}"
+    def _windows(self, ip: str, kind: str) -> List[Tuple[str, float]]:
+        """(counter key, weight) pairs; the first entry is the window new usage is added to."""
+        now = time.time()
+        if self.algorithm == "sliding":
+            day, offset = divmod(now, DAY_SECONDS)
+            return [
+                (f"ratelimit:{ip}:{int(day)}:{kind}", 1.0),
+                (f"ratelimit:{ip}:{int(day) - 1}:{kind}", 1.0 - offset / DAY_SECONDS),
+            ]
+        today = datetime.fromtimestamp(now).strftime("%Y-%m-%d")
+        return [(f"ratelimit:{ip}:{today}:{kind}", 1.0)]
+
+    def _usage(self, ip: str, kind: str) -> float:
+        windows = self._windows(ip, kind)
+        values = self.backend.get_many([key for key, _ in windows])
+        return sum(value * weight for value, (_, weight) in zip(values, windows))
+
+    def _add(self, ip: str, kind: str, amount: Union[int, float]) -> float:
+        key, _ = self._windows(ip, kind)[0]
+        return self.backend.incr(key, amount, COUNTER_TTL_SECONDS)
+
+    def reserve(self, ip: str, estimated_cost_usd: float) -> Tuple[Optional[Reservation], str]:
+        """
+        Atomically count the query and hold `estimated_cost_usd` of today's budget.
+
+        Each counter is bumped first and rolled back if the new total is over the limit,
+        so concurrent requests cannot all pass a check before any of them is recorded.
+        Returns (None, reason) when the query or budget limit would be exceeded.
+        """
+        count_windows = self._windows(ip, "count")
+        count = self.backend.incr(count_windows[0][0], 1, COUNTER_TTL_SECONDS) + self._carried_over(count_windows)
+        if count > self.daily_limit:
+            self.backend.incr(count_windows[0][0], -1, COUNTER_TTL_SECONDS)
+            return None, f"Rate limit exceeded ({self.daily_limit} per day)"
+
+        estimate = float(max(0.0, estimated_cost_usd))
+        cost_windows = self._windows(ip, "cost")
+        cost_key = cost_windows[0][0]
+        if self.daily_budget > 0:
+            spent = self.backend.incr(cost_key, estimate, COUNTER_TTL_SECONDS) + self._carried_over(cost_windows)
+            if spent > self.daily_budget + 1e-9:
+                self.backend.incr(cost_key, -estimate, COUNTER_TTL_SECONDS)
+                self.backend.incr(count_windows[0][0], -1, COUNTER_TTL_SECONDS)
+                return None, f"Free-tier budget exceeded (${self.daily_budget:.2f} per day)"
+        else:
+            estimate = 0.0
+        # After the writes: a failure during them has already switched to the fallback
+        backend = self.backend.active()
+        return Reservation(ip=ip, cost_key=cost_key, reserved_usd=estimate, backend=backend), "OK"
+
+    async def reserve_async(self, ip: str, estimated_cost_usd: float) -> Tuple[Optional[Reservation], str]:
+        return await self._offload(self.reserve, ip, estimated_cost_usd)
+
+    async def settle_async(self, reservation: Reservation, actual_cost_usd: float) -> None:
+        await self._offload(self.settle, reservation, actual_cost_usd)
+
+    async def remaining_async(self, ip: str) -> Tuple[int, float]:
+        """(queries left, budget left in USD) in one hop off the event loop."""
+        return await self._offload(lambda: (self.get_remaining(ip), self.get_remaining_budget(ip)))
+
+    async def _offload(self, func: Callable[..., T], *args: Any) -> T:
+        # Async handlers must not wait on Redis round trips on the event loop
+        if getattr(self.backend, "blocking", False):
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    def settle(self, reservation: Reservation, actual_cost_usd: float) -> None:
+        """Replace the held estimate with the actual cost (idempotent; 0 releases the hold)."""
+        if reservation.settled:
+            return
+        reservation.settled = True
+        delta = float(max(0.0, actual_cost_usd)) - reservation.reserved_usd
+        if not delta:
+            return
+        # Same key and store as the reservation, even if the day rolled over or the store failed over
+        backend = reservation.backend or self.backend
+        try:
+            backend.incr(reservation.cost_key, delta, COUNTER_TTL_SECONDS, fallback=False)
+        except BACKEND_ERRORS as exc:
+            print(
+                f"Rate limit backend unavailable ({exc!r}); not settling {reservation.cost_key}, "
+                f"its hold expires with the counter"
+            )
+
+    def _carried_over(self, windows: List[Tuple[str, float]]) -> float:
+        previous = windows[1:]
+        if not previous:
+            return 0.0
+        values = self.backend.get_many([key for key, _ in previous])
+        return sum(value * weight for value, (_, weight) in zip(values, previous))
 
     def check_limit(self, ip: str) -> tuple[bool, str]:
-        key = self._key(ip)
-        count = self.limits.get(key, 0)
-        if count >= self.daily_limit:
+        if self._usage(ip, "count") >= self.daily_limit:
             return False, f"Rate limit exceeded ({self.daily_limit} per day)"
         if self.daily_budget > 0:
-            spent = self.costs.get(key, 0.0)
-            if spent >= self.daily_budget:
+            if self._usage(ip, "cost") >= self.daily_budget:
                 return False, f"Free-tier budget exceeded (${self.daily_budget:.2f} per day)"
         return True, "OK"
 
     def increment(self, ip: str) -> None:
-        key = self._key(ip)
-        self.limits[key] = self.limits.get(key, 0) + 1
+        self._add(ip, "count", 1)
 
     def get_remaining(self, ip: str) -> int:
-        key = self._key(ip)
-        count = self.limits.get(key, 0)
-        return max(0, self.daily_limit - count)
+        used = math.ceil(self._usage(ip, "count") - 1e-9)
+        return max(0, self.daily_limit - used)
 
     def add_cost(self, ip: str, amount: float) -> None:
-        key = self._key(ip)
-        self.costs[key] = self.costs.get(key, 0.0) + max(0.0, amount)
+        self._add(ip, "cost", float(max(0.0, amount)))
 
     def get_remaining_budget(self, ip: str) -> float:
         if self.daily_budget <= 0:
             return float("inf")
-        key = self._key(ip)
-        spent = self.costs.get(key, 0.0)
+        spent = self._usage(ip, "cost")
         return max(0.0, self.daily_budget - spent)
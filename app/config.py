@@ -24,11 +24,86 @@ class Settings:
     ROUTER_HIGH_MODEL = os.getenv("ROUTER_HIGH_MODEL", "gpt-4-turbo")
     ROUTER_LOW_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_LOW_CONFIDENCE_THRESHOLD", "0.7"))
     ROUTER_RESOURCE_COUNT_FOR_MID = int(os.getenv("ROUTER_RESOURCE_COUNT_FOR_MID", "2"))
+    ROUTER_DEFAULT_FALLBACK_MODEL = os.getenv("ROUTER_DEFAULT_FALLBACK_MODEL", "")
+    ROUTER_MID_FALLBACK_MODEL = os.getenv("ROUTER_MID_FALLBACK_MODEL", "")
+    ROUTER_HIGH_FALLBACK_MODEL = os.getenv("ROUTER_HIGH_FALLBACK_MODEL", "")
+    ROUTER_HEALTH_WINDOW = int(os.getenv("ROUTER_HEALTH_WINDOW", "200"))
+    ROUTER_HEALTH_WINDOW_SECONDS = float(os.getenv("ROUTER_HEALTH_WINDOW_SECONDS", "300"))
+    ROUTER_HEALTH_MIN_SAMPLES = int(os.getenv("ROUTER_HEALTH_MIN_SAMPLES", "20"))
+    ROUTER_DEGRADED_ERROR_RATE = float(os.getenv("ROUTER_DEGRADED_ERROR_RATE", "0.25"))
+    ROUTER_DEGRADED_P95_MS = float(os.getenv("ROUTER_DEGRADED_P95_MS", "10000"))
+    ROUTER_HEDGING_ENABLED = os.getenv("ROUTER_HEDGING_ENABLED", "false").lower() in {"1", "true", "yes"}
+    ROUTER_HEDGE_DEFAULT_DELAY_MS = float(os.getenv("ROUTER_HEDGE_DEFAULT_DELAY_MS", "3000"))
+    ROUTER_HEDGE_MIN_DELAY_MS = float(os.getenv("ROUTER_HEDGE_MIN_DELAY_MS", "250"))
+    FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "false").lower() in {"1", "true", "yes"}
+    FAST_PATH_ESI2_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_ESI2_MIN_CONFIDENCE", "0.9"))
+    FAST_PATH_ESI5_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_ESI5_MIN_CONFIDENCE", "0.9"))
+    FAST_PATH_MIN_NORMAL_VITALS = int(os.getenv("FAST_PATH_MIN_NORMAL_VITALS", "3"))
+    SPECULATIVE_FINAL_DECISION = os.getenv("SPECULATIVE_FINAL_DECISION", "false").lower() in {"1", "true", "yes"}
+
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "30"))
+    LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() in {"1", "true", "yes"}
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+    LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "20"))
+    LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_STUB_MODE = os.getenv("LLM_STUB_MODE", "false").lower() in {"1", "true", "yes"}
+    LLM_STUB_URL = os.getenv("LLM_STUB_URL", "http://127.0.0.1:8099/v1")
+
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+    LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+    LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.2"))
+    LLM_CACHE_SQLITE_PATH = os.getenv("LLM_CACHE_SQLITE_PATH", "")
+    LLM_PROMPT_CACHE_HINTS = os.getenv("LLM_PROMPT_CACHE_HINTS", "true").lower() in {"1", "true", "yes"}
+    # Model name fragments whose providers take explicit cache_control breakpoints
+    LLM_CACHE_CONTROL_MODELS = tuple(
+        item.strip().lower()
+        for item in os.getenv("LLM_CACHE_CONTROL_MODELS", "claude,anthropic/").split(",")
+        if item.strip()
+    )
+
+    # JSON pattern pack for the injection scanner (see config/injection_patterns.json); empty = built-in pack
+    INJECTION_PATTERNS_PATH = os.getenv("INJECTION_PATTERNS_PATH", "")
+
+    RAG_CONFIG_PATH = os.getenv("RAG_CONFIG_PATH", "/app/config/rag_config.json")
+    RAG_CONFIG_RELOAD_INTERVAL_SECONDS = float(os.getenv("RAG_CONFIG_RELOAD_INTERVAL_SECONDS", "1.0"))
+    EVIDENCE_CACHE_MAX_ENTRIES = int(os.getenv("EVIDENCE_CACHE_MAX_ENTRIES", "2048"))
+
+    PIPELINE_LAYER_TIMEOUT_SECONDS = float(os.getenv("PIPELINE_LAYER_TIMEOUT_SECONDS", "30"))
+    # uvicorn worker processes per host (uvicorn reads the same variable for --workers)
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+    # layer:mode pairs; mode is inline, thread, process or auto (by input size)
+    OFFLOAD_LAYER_POLICY = dict(
+        item.strip().split(":", 1)
+        for item in os.getenv(
+            "OFFLOAD_LAYER_POLICY", "extraction:auto,malicious:auto,resources:auto,router:inline"
+        ).split(",")
+        if ":" in item
+    )
+    OFFLOAD_THREAD_MIN_CHARS = int(os.getenv("OFFLOAD_THREAD_MIN_CHARS", "4096"))
+    OFFLOAD_PROCESS_MIN_CHARS = int(os.getenv("OFFLOAD_PROCESS_MIN_CHARS", "32768"))
+    OFFLOAD_THREAD_WORKERS = int(os.getenv("OFFLOAD_THREAD_WORKERS", "0"))
+    OFFLOAD_PROCESS_WORKERS = int(os.getenv("OFFLOAD_PROCESS_WORKERS", "0"))
+    EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("EVENT_LOOP_LAG_INTERVAL_SECONDS", "0.5"))
+
+    BATCH_MAX_CASES = int(os.getenv("BATCH_MAX_CASES", "5000"))
+    BATCH_DEFAULT_CONCURRENCY = int(os.getenv("BATCH_DEFAULT_CONCURRENCY", "8"))
+    BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
 
     RATE_LIMIT_PER_DAY = int(os.getenv("RATE_LIMIT_PER_DAY", "20"))
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+    RATE_LIMIT_ALGORITHM = os.getenv("RATE_LIMIT_ALGORITHM", "fixed").lower()
     FREE_TIER_DAILY_BUDGET_USD = float(os.getenv("FREE_TIER_DAILY_BUDGET_USD", "1.00"))
     COST_PER_1K_INPUT = float(os.getenv("COST_PER_1K_INPUT", "0.01"))
     COST_PER_1K_OUTPUT = float(os.getenv("COST_PER_1K_OUTPUT", "0.03"))
+    # Price of prompt tokens served from the provider's prompt cache
+    COST_PER_1K_CACHED_INPUT = float(os.getenv("COST_PER_1K_CACHED_INPUT", "0.005"))
+    # System prompt + RAG evidence tokens added to each LLM call when reserving budget
+    BUDGET_PROMPT_OVERHEAD_TOKENS = int(os.getenv("BUDGET_PROMPT_OVERHEAD_TOKENS", "1200"))
     
     # Admin authentication
     ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "admin123")
@@ -1,86 +1,67 @@
-import re
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, FrozenSet, List
 
+from keyword_matcher import clinical_lexicon
+from vitals_parser import parse_vitals
 
-class ExtractionDetector:
-    def __init__(self) -> None:
-        pass
-
-    def _extract_age(self, text: str) -> Optional[int]:
-        match = re.search(r"(\d{1,3})[-\s]*(?:years?|year-old|yo|y/o|yr)\b", text.lower())
-        if match:
-            return int(match.group(1))
-        return None
-
-    def _extract_vitals(self, text: str) -> Dict[str, Any]:
-        vitals: Dict[str, Any] = {}
-        text_lower = text.lower()
 
-        hr = re.search(r"\bhr\s*(\d{2,3})\b", text_lower)
-        if hr:
-            vitals["hr"] = int(hr.group(1))
+KEYWORD_TERMS = (
+    "chest pain",
+    "shortness of breath",
+    "sob",
+    "dyspnea",
+    "fever",
+    "sepsis",
+    "infection",
+    "laceration",
+    "wound",
+    "fracture",
+    "wrist",
+    "arm",
+    "abdominal pain",
+    "trauma",
+)
 
-        rr = re.search(r"\brr\s*(\d{1,2})\b", text_lower)
-        if rr:
-            vitals["rr"] = int(rr.group(1))
+# Every value _extract_chief_complaint can return
+CHIEF_COMPLAINTS = (
+    "Chest Pain",
+    "Shortness of Breath",
+    "Altered Mental Status",
+    "Abdominal Pain",
+    "Fever",
+    "General",
+)
 
-        bp = re.search(r"\bbp\s*(\d{2,3})\s*/\s*(\d{2,3})\b", text_lower)
-        if bp:
-            vitals["sbp"] = int(bp.group(1))
-            vitals["dbp"] = int(bp.group(2))
 
-        temp = re.search(r"\b(?:t|temp|temperature)\s*([0-9]{2,3}(?:\.[0-9])?)", text_lower)
-        if temp:
-            vitals["temp_f"] = float(temp.group(1))
-
-        spo2 = re.search(r"\b(?:spo2|o2\s*sat)\s*(\d{2,3})%", text_lower)
-        if spo2:
-            vitals["spo2"] = int(spo2.group(1))
-
-        return vitals
+class ExtractionDetector:
+    def __init__(self) -> None:
+        pass
 
-    def _extract_chief_complaint(self, text: str) -> str:
-        text_lower = text.lower()
-        if "chest pain" in text_lower or "chest pressure" in text_lower:
+    def _extract_chief_complaint(self, terms: FrozenSet[str]) -> str:
+        if "chest pain" in terms or "chest pressure" in terms:
             return "Chest Pain"
-        if "shortness of breath" in text_lower or "sob" in text_lower or "dyspnea" in text_lower:
+        if "shortness of breath" in terms or "sob" in terms or "dyspnea" in terms:
             return "Shortness of Breath"
-        if "altered mental" in text_lower or "ams" in text_lower or "confus" in text_lower:
+        if "altered mental" in terms or "ams" in terms or "confus" in terms:
             return "Altered Mental Status"
-        if "abdominal pain" in text_lower:
+        if "abdominal pain" in terms:
             return "Abdominal Pain"
-        if "fever" in text_lower:
+        if "fever" in terms:
             return "Fever"
         return "General"
 
-    def _extract_keywords(self, text: str) -> List[str]:
-        keywords = []
-        text_lower = text.lower()
-        for term in [
-            "chest pain",
-            "shortness of breath",
-            "sob",
-            "dyspnea",
-            "fever",
-            "sepsis",
-            "infection",
-            "laceration",
-            "wound",
-            "fracture",
-            "wrist",
-            "arm",
-            "abdominal pain",
-            "trauma",
-        ]:
-            if term in text_lower:
-                keywords.append(term)
-        return keywords
+    def _extract_keywords(self, terms: FrozenSet[str]) -> List[str]:
+        return [term for term in KEYWORD_TERMS if term in terms]
 
     def extract(self, case_text: str) -> Dict[str, Any]:
+        hits = clinical_lexicon.find(case_text)
+        terms = frozenset(hit.term for hit in hits)
+        parsed = parse_vitals(case_text)
         return {
-            "age": self._extract_age(case_text),
-            "vitals": self._extract_vitals(case_text),
-            "chief_complaint": self._extract_chief_complaint(case_text),
-            "keywords": self._extract_keywords(case_text),
+            "age": parsed.age,
+            "vitals": parsed.vitals,
+            "vital_readings": [reading.as_dict() for reading in parsed.readings],
+            "chief_complaint": self._extract_chief_complaint(terms),
+            "keywords": self._extract_keywords(terms),
+            "term_hits": [hit.as_dict() for hit in hits],
             "raw_text": case_text,
         }
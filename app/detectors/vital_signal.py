@@ -2,49 +2,21 @@ import re
 from typing import Any, Dict, Optional
 
 from config import settings
-from rag.config import RAGConfigManager
-from rag.knowledge_base import KnowledgeBase
+from metrics import record_retrieval
+from rag.config import get_rag_config_manager
+from rag.knowledge_base import get_knowledge_base
+from vitals_parser import parse_vitals
 
 
-class VitalSignalDetector:
-    def __init__(self) -> None:
-        self.rag_config = RAGConfigManager()
-
-    def _extract_age(self, text: str) -> Optional[int]:
-        match = re.search(r"(\d{1,3})\s*(?:years?|yo|y/o|yr)\b", text.lower())
-        if match:
-            return int(match.group(1))
-        return None
-
-    def _extract_vitals(self, text: str) -> Dict[str, Any]:
-        vitals: Dict[str, Any] = {}
-        text_lower = text.lower()
-
-        hr = re.search(r"\bhr\s*(\d{2,3})\b", text_lower)
-        if hr:
-            vitals["hr"] = int(hr.group(1))
-
-        rr = re.search(r"\brr\s*(\d{1,2})\b", text_lower)
-        if rr:
-            vitals["rr"] = int(rr.group(1))
+_NUMBER_RE = re.compile(r"\d+\.?\d*")
 
-        bp = re.search(r"\bbp\s*(\d{2,3})\s*/\s*(\d{2,3})\b", text_lower)
-        if bp:
-            vitals["sbp"] = int(bp.group(1))
-            vitals["dbp"] = int(bp.group(2))
 
-        temp = re.search(r"\b(?:t|temp|temperature)\s*([0-9]{2,3}(?:\.[0-9])?)", text_lower)
-        if temp:
-            vitals["temp_f"] = float(temp.group(1))
-
-        spo2 = re.search(r"\b(?:spo2|o2\s*sat)\s*(\d{2,3})%", text_lower)
-        if spo2:
-            vitals["spo2"] = int(spo2.group(1))
-
-        return vitals
+class VitalSignalDetector:
+    def __init__(self) -> None:
+        self.rag_config = get_rag_config_manager()
 
     def _parse_range(self, value: str) -> Dict[str, Optional[float]]:
-        numbers = [float(n) for n in re.findall(r"\d+\.?\d*", value)]
+        numbers = [float(n) for n in _NUMBER_RE.findall(value)]
         if "<" in value and numbers:
             return {"min": None, "max": numbers[0]}
         if "up to" in value.lower() and numbers:
@@ -68,26 +40,31 @@ class VitalSignalDetector:
         return False
 
     async def assess(self, case_text: str, extracted: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        age = extracted.get("age") if extracted else self._extract_age(case_text)
-        vitals = extracted.get("vitals") if extracted else self._extract_vitals(case_text)
-
-        layer_config = self.rag_config.get_layer_config(4)
+        if extracted:
+            age, vitals = extracted.get("age"), extracted.get("vitals")
+        else:
+            parsed = parse_vitals(case_text)
+            age, vitals = parsed.age, parsed.vitals
+
+        rag_config = self.rag_config.snapshot()
+        layer_config = rag_config.layer(4)
         rag_enabled = bool(
             layer_config
-            and self.rag_config.config.global_settings.get("enable_rag_globally")
+            and rag_config.global_settings.get("enable_rag_globally")
             and layer_config.enabled
         )
 
         evidence = None
         if rag_enabled and age is not None:
-            kb = KnowledgeBase(
+            kb = get_knowledge_base(
                 {
                     "openrouter_api_key": settings.OPENROUTER_API_KEY,
                     "openrouter_base_url": settings.OPENROUTER_BASE_URL,
                     "use_vector_db": layer_config.use_vector_db,
                 }
             )
-            retrieval = await kb.retrieve_vital_norms(age)
+            retrieval = await kb.retrieve_vital_norms(age, top_k=layer_config.max_results)
+            record_retrieval(retrieval)
             evidence = retrieval.results[0] if retrieval.results else None
 
         abnormalities = {}
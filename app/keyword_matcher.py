@@ -0,0 +1,174 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+@dataclass(frozen=True)
+class TermHit:
+    term: str
+    start: int
+    end: int
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"term": self.term, "start": self.start, "end": self.end}
+
+
+class _Node:
+    __slots__ = ("children", "stems", "term")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        self.stems: List[Tuple[str, "_Node"]] = []
+        self.term: Optional[str] = None
+
+
+class KeywordMatcher:
+    """
+    Word-level trie over a term lexicon; one pass over the text's tokens finds every hit.
+
+    Terms match on whole words ("sob" does not match "sober"), a trailing "s"/"es"/"ies"
+    is accepted on any word ("injuries" matches "injury"), and a trailing "*" marks a
+    stem ("confus*" matches "confused").
+    Overlapping terms are all reported ("chest pain" also yields "chest").
+    """
+
+    def __init__(self, terms: Iterable[str]) -> None:
+        self._root = _Node()
+        self.terms: Tuple[str, ...] = ()
+        for spec in terms:
+            self._add(spec)
+
+    def _add(self, spec: str) -> None:
+        words = spec.lower().split()
+        stem = words[-1].endswith("*")
+        term = spec.lower().rstrip("*")
+        node = self._root
+        for index, word in enumerate(words):
+            if stem and index == len(words) - 1:
+                word = word.rstrip("*")
+                child = next((c for s, c in node.stems if s == word), None)
+                if child is None:
+                    child = _Node()
+                    node.stems.append((word, child))
+            else:
+                child = node.children.setdefault(word, _Node())
+            node = child
+        node.term = term
+        self.terms += (term,)
+
+    def _next_nodes(self, node: _Node, word: str) -> List[_Node]:
+        nodes = []
+        candidates = (
+            word,
+            word[:-1] if word.endswith("s") else None,
+            word[:-2] if word.endswith("es") else None,
+            word[:-3] + "y" if word.endswith("ies") else None,
+        )
+        for candidate in candidates:
+            child = node.children.get(candidate) if candidate else None
+            if child is not None and child not in nodes:
+                nodes.append(child)
+        for stem, child in node.stems:
+            if word.startswith(stem) and child not in nodes:
+                nodes.append(child)
+        return nodes
+
+    def find(self, text: str) -> List[TermHit]:
+        tokens = [(m.group(0), m.start(), m.end()) for m in _WORD_RE.finditer(text.lower())]
+        hits: List[TermHit] = []
+        for i, (_, start, _) in enumerate(tokens):
+            frontier = [self._root]
+            j = i
+            while frontier and j < len(tokens):
+                word, _, end = tokens[j]
+                next_frontier: List[_Node] = []
+                for node in frontier:
+                    for child in self._next_nodes(node, word):
+                        if child.term is not None:
+                            hits.append(TermHit(child.term, start, end))
+                        if child.children or child.stems:
+                            next_frontier.append(child)
+                frontier = next_frontier
+                j += 1
+        return hits
+
+    def terms_in(self, text: str) -> FrozenSet[str]:
+        return frozenset(hit.term for hit in self.find(text))
+
+
+CLINICAL_TERMS = (
+    # Cardiac
+    "chest",
+    "chest pain",
+    "chest pressure",
+    "palpitations",
+    "arrhythmia",
+    # Respiratory
+    "shortness of breath",
+    "sob",
+    "dyspnea",
+    "asthma",
+    "wheezing",
+    "hypoxia",
+    # Infection
+    "fever",
+    "sepsis",
+    "infection",
+    # Wounds / ortho / trauma
+    "laceration",
+    "wound",
+    "abscess",
+    "burn",
+    "fracture",
+    "wrist",
+    "arm",
+    "trauma",
+    "injury",
+    "severe bleeding",
+    "hemorrhage",
+    # GI / GU
+    "abdominal pain",
+    "vomiting",
+    "dehydration",
+    "dysuria",
+    "uti",
+    # Neuro
+    "altered mental",
+    "ams",
+    "confus*",
+    "stroke",
+    "cva",
+    "focal",
+    "headache",
+    "seizure",
+    "syncope",
+    "unresponsive",
+    # Shock / allergy
+    "anaphylaxis",
+    "shock",
+    "hypotension",
+    # Low acuity (fast-path ESI-5 candidates)
+    "sore throat",
+    "refill",
+    "rash",
+    "cold symptoms",
+    "congestion",
+    "suture removal",
+    "insect bite",
+    "ear pain",
+    # Disposition
+    "consult*",
+    "specialist",
+)
+
+clinical_lexicon = KeywordMatcher(CLINICAL_TERMS)
+
+
+def lexicon_terms(text: str, extracted: Optional[Dict[str, Any]] = None) -> FrozenSet[str]:
+    """Terms hit in `text`, reusing the extraction layer's `term_hits` when available."""
+    if extracted and extracted.get("term_hits") is not None:
+        return frozenset(hit["term"] for hit in extracted["term_hits"])
+    return clinical_lexicon.terms_in(text)
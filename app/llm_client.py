@@ -0,0 +1,352 @@
+import asyncio
+import importlib.util
+import json
+import re
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+import metrics
+from config import settings
+from llm_cache import LLMResponseCache, response_cache
+from model_health import equivalent_model, model_health
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # not installed, or the encoding files cannot be fetched offline
+    _ENCODING = None
+
+
+_shared_client: Optional[AsyncOpenAI] = None
+# Weak keys: a closed loop (tests, asyncio.run scripts) drops out with its semaphore
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def llm_base_url() -> str:
+    return settings.LLM_STUB_URL if settings.LLM_STUB_MODE else settings.OPENROUTER_BASE_URL
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """
+    Return the process-wide AsyncOpenAI client.
+    Every detector shares one pooled (HTTP/2 when available) connection pool to the provider.
+    """
+    global _shared_client
+    if _shared_client is None:
+        http_client = httpx.AsyncClient(
+            http2=settings.LLM_HTTP2 and http2_available(),
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            timeout=httpx.Timeout(
+                settings.LLM_REQUEST_TIMEOUT_SECONDS,
+                connect=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+            ),
+        )
+        _shared_client = AsyncOpenAI(
+            api_key=settings.OPENROUTER_API_KEY or "stub",
+            base_url=llm_base_url(),
+            http_client=http_client,
+            max_retries=settings.LLM_MAX_RETRIES,
+        )
+    return _shared_client
+
+
+def _concurrency_limit() -> asyncio.Semaphore:
+    # One semaphore per event loop (a uvicorn worker runs a single loop)
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+async def close_openai_client() -> None:
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.close()
+        _shared_client = None
+
+
+class RequestSpend:
+    """Provider spend of one request so far; every call made under track_request_spend() adds to it."""
+
+    def __init__(self) -> None:
+        self.usd = 0.0
+        self.calls = 0
+
+
+_request_spend: ContextVar[Optional[RequestSpend]] = ContextVar("request_spend", default=None)
+
+
+@contextmanager
+def track_request_spend() -> Iterator[RequestSpend]:
+    """
+    Accumulate the billed cost of the provider calls made in this context,
+    including tasks it spawns, so a request that fails halfway can still be
+    charged for the calls that already ran.
+    """
+    spend = RequestSpend()
+    token = _request_spend.set(spend)
+    try:
+        yield spend
+    finally:
+        _request_spend.reset(token)
+
+
+@dataclass
+class LLMCompletion:
+    """Normalized chat completion result shared by every detector layer."""
+
+    content: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    # Prompt tokens the provider served from its prompt cache (billed at the cached rate)
+    cached_prompt_tokens: int = 0
+    cached: bool = False
+    billed_cost_usd: float = 0.0
+    # The backup call of a hedged request answered first
+    hedged: bool = False
+
+    @property
+    def cost_usd(self) -> float:
+        """Cost actually incurred by this call (cache hits are free)."""
+        return 0.0 if self.cached else self.billed_cost_usd
+
+    @property
+    def cost_saved_usd(self) -> float:
+        return self.billed_cost_usd if self.cached else 0.0
+
+
+def estimate_cost_usd(prompt_tokens: int, completion_tokens: int, cached_prompt_tokens: int = 0) -> float:
+    cached_prompt_tokens = min(cached_prompt_tokens, prompt_tokens)
+    return (
+        ((prompt_tokens - cached_prompt_tokens) / 1000.0) * settings.COST_PER_1K_INPUT
+        + (cached_prompt_tokens / 1000.0) * settings.COST_PER_1K_CACHED_INPUT
+        + (completion_tokens / 1000.0) * settings.COST_PER_1K_OUTPUT
+    )
+
+
+def _cached_prompt_tokens(usage: Any) -> int:
+    """`usage.prompt_tokens_details.cached_tokens` (OpenAI / OpenRouter), 0 when not reported."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    if details is None:
+        return 0
+    cached = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", 0)
+    return int(cached or 0)
+
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken when installed, else a BPE-like estimate (~4 chars per word piece)."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return sum((len(piece) + 3) // 4 for piece in _WORD_RE.findall(text))
+
+
+def estimate_prompt_tokens(text: str) -> int:
+    return count_tokens(text) + 1
+
+
+def estimate_request_cost_usd(text: str, llm_calls: int) -> float:
+    """Upper-bound cost of `llm_calls` completions over `text` (prompt overhead + max output)."""
+    prompt_tokens = estimate_prompt_tokens(text) + settings.BUDGET_PROMPT_OVERHEAD_TOKENS
+    return llm_calls * estimate_cost_usd(prompt_tokens, settings.LLM_MAX_TOKENS)
+
+
+def _is_cacheable_content(content: str, response_format: Optional[Dict[str, Any]]) -> bool:
+    if not content:
+        return False
+    if response_format and response_format.get("type") == "json_object":
+        try:
+            json.loads(content)
+        except ValueError:
+            return False
+    return True
+
+
+async def create_chat_completion(
+    client: Any,
+    *,
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    max_tokens: int,
+    response_format: Optional[Dict[str, Any]] = None,
+    cache: Optional[LLMResponseCache] = response_cache,
+    timeout: Optional[float] = None,
+    hedge: bool = False,
+) -> LLMCompletion:
+    """
+    Call `client.chat.completions.create`, serving repeated low-temperature
+    requests from the response cache. Network calls are bounded by the shared
+    LLM_MAX_CONCURRENCY semaphore and a per-call timeout, and their latency and
+    outcome feed the per-model health stats.
+
+    With `hedge` (and ROUTER_HEDGING_ENABLED), a backup call to the model's
+    equivalent-tier alternative (or the same model) is fired once the primary
+    has been outstanding for the model's p95 latency; the first valid answer wins.
+    """
+    use_cache = cache is not None and temperature <= settings.LLM_CACHE_MAX_TEMPERATURE
+    key = None
+    if use_cache:
+        key = cache.make_key(model, messages, temperature, max_tokens, response_format)
+        hit = cache.get(key)
+        if hit is not None:
+            billed = estimate_cost_usd(
+                hit["prompt_tokens"], hit["completion_tokens"], hit.get("cached_prompt_tokens", 0)
+            )
+            cache.record_savings(billed)
+            return LLMCompletion(content=hit["content"], model=model, cached=True, billed_cost_usd=billed)
+
+    request: Dict[str, Any] = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    if response_format is not None:
+        request["response_format"] = response_format
+    request_timeout = timeout if timeout is not None else settings.LLM_REQUEST_TIMEOUT_SECONDS
+    if request_timeout:
+        request["timeout"] = request_timeout
+
+    if hedge and settings.ROUTER_HEDGING_ENABLED:
+        completion = await _hedged_completion(client, request, response_format)
+    else:
+        completion = await _complete(client, request, response_format)
+
+    if use_cache and _is_cacheable_content(completion.content, response_format):
+        cache.set(
+            key,
+            {
+                "content": completion.content,
+                "prompt_tokens": completion.prompt_tokens,
+                "completion_tokens": completion.completion_tokens,
+                "cached_prompt_tokens": completion.cached_prompt_tokens,
+            },
+        )
+    return completion
+
+
+async def _complete(
+    client: Any, request: Dict[str, Any], response_format: Optional[Dict[str, Any]]
+) -> LLMCompletion:
+    """
+    One provider call, recorded in model_health (errors and unparseable JSON count
+    as failures) and in the queue/network/parse phase metrics.
+    """
+    model = request["model"]
+    queued = time.perf_counter()
+    async with _concurrency_limit():
+        started = time.perf_counter()
+        metrics.llm_phase_duration.observe(started - queued, model, "queue")
+        try:
+            response = await client.chat.completions.create(**request)
+        except asyncio.CancelledError:
+            # Not a health signal by itself (a discarded speculation); _hedged_completion records hedge losers
+            metrics.llm_requests.inc(model, "cancelled")
+            raise
+        except Exception:
+            model_health.record(model, (time.perf_counter() - started) * 1000.0, ok=False)
+            metrics.llm_requests.inc(model, "error")
+            raise
+        received = time.perf_counter()
+        metrics.llm_phase_duration.observe(received - started, model, "network")
+
+    content = response.choices[0].message.content
+    valid = _is_cacheable_content(content, response_format)
+    model_health.record(model, (received - started) * 1000.0, ok=valid)
+    usage = response.usage
+    prompt_tokens = usage.prompt_tokens if usage else 0
+    completion_tokens = usage.completion_tokens if usage else 0
+    cached_prompt_tokens = _cached_prompt_tokens(usage) if usage else 0
+    completion = LLMCompletion(
+        content=content,
+        model=model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=usage.total_tokens if usage else 0,
+        cached_prompt_tokens=cached_prompt_tokens,
+        billed_cost_usd=estimate_cost_usd(prompt_tokens, completion_tokens, cached_prompt_tokens),
+    )
+    metrics.llm_phase_duration.observe(time.perf_counter() - received, model, "parse")
+    metrics.llm_requests.inc(model, "ok" if valid else "invalid")
+    metrics.llm_tokens.inc(model, "prompt", amount=prompt_tokens)
+    metrics.llm_tokens.inc(model, "cached_prompt", amount=cached_prompt_tokens)
+    metrics.llm_tokens.inc(model, "completion", amount=completion_tokens)
+    metrics.llm_cost.inc(model, amount=completion.billed_cost_usd)
+    spend = _request_spend.get()
+    if spend is not None:
+        spend.usd += completion.billed_cost_usd
+        spend.calls += 1
+    return completion
+
+
+def _usable(task: "asyncio.Task[LLMCompletion]", response_format: Optional[Dict[str, Any]]) -> bool:
+    return (
+        task.done()
+        and not task.cancelled()
+        and task.exception() is None
+        and _is_cacheable_content(task.result().content, response_format)
+    )
+
+
+async def _hedged_completion(
+    client: Any, request: Dict[str, Any], response_format: Optional[Dict[str, Any]]
+) -> LLMCompletion:
+    """
+    Race the primary call against a backup fired after the primary model's hedge
+    delay (or immediately when the primary fails first). The loser is cancelled.
+    If neither yields valid JSON, the primary's outcome is returned or raised.
+    A primary that loses to its backup is recorded in model_health as censored.
+    """
+    model = request["model"]
+    started = time.perf_counter()
+    primary = asyncio.ensure_future(_complete(client, request, response_format))
+    tasks = [primary]
+    try:
+        await asyncio.wait(tasks, timeout=model_health.hedge_delay_seconds(model))
+        if _usable(primary, response_format):
+            return primary.result()
+
+        backup_request = {**request, "model": equivalent_model(model) or model}
+        tasks.append(asyncio.ensure_future(_complete(client, backup_request, response_format)))
+        while True:
+            for task in tasks:
+                if _usable(task, response_format):
+                    completion = task.result()
+                    completion.hedged = task is not primary
+                    if completion.hedged and not primary.done():
+                        elapsed_ms = (time.perf_counter() - started) * 1000.0
+                        model_health.record(model, elapsed_ms, ok=True, censored=True)
+                    return completion
+            pending = [task for task in tasks if not task.done()]
+            if not pending:
+                break
+            await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        return primary.result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
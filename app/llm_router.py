@@ -1,10 +1,86 @@
-from typing import Any, Dict, Optional
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
 
 from config import settings
+from keyword_matcher import lexicon_terms
+from model_health import ModelHealthRegistry, equivalent_model, model_health
+
+
+# Complaints that, alone, with normal adult vitals and no resources, are ESI-5
+LOW_ACUITY_TERMS = frozenset(
+    {"sore throat", "refill", "rash", "cold symptoms", "congestion", "suture removal", "insect bite", "ear pain"}
+)
+
+# Words an ESI-5 note may contain besides its low-acuity complaint: demographics,
+# durations, vital-sign labels and filler. Any other word sends the case to the LLM.
+LOW_ACUITY_NOTE_WORDS = frozenset(
+    "patient pt yo y o yr year old male female man woman m f c with for of and a an the since x "
+    "requests request reports presents here day week hour today yesterday "
+    "hr bp rr spo2 sat temp t pulse bpm on ra room air".split()
+)
+LOW_ACUITY_WORDS = LOW_ACUITY_NOTE_WORDS | frozenset(word for term in LOW_ACUITY_TERMS for word in term.split())
+_WORD = re.compile(r"[a-z][a-z0-9]*")
+
+# Signs that may need ESI-1 (immediate life-saving intervention); never decided by rule
+ESI1_TERMS = frozenset({"unresponsive", "shock", "anaphylaxis", "severe bleeding", "hemorrhage", "seizure"})
+
+# (low, high) inclusive; outside these an adult's vitals are not "normal" for ESI-5
+NORMAL_ADULT_VITALS = {
+    "hr": (50, 100),
+    "rr": (10, 20),
+    "sbp": (90, 159),
+    "spo2": (95, 100),
+    "temp_f": (96.8, 100.3),
+}
+
+
+@dataclass
+class FastPathDecision:
+    """A rule-based ESI decision that makes the red-flag and final-decision LLM calls unnecessary."""
+
+    esi_level: int
+    confidence: float
+    rule: str
+    reason: str
+    flags: List[str] = field(default_factory=list)
+
+    def red_flag_result(self) -> Dict[str, Any]:
+        return {
+            "esi": self.esi_level,
+            "confidence": self.confidence,
+            "reason": self.reason,
+            "flags": self.flags,
+            "severity_score": 0.8 if self.esi_level <= 2 else 0.0,
+            "has_red_flags": self.esi_level <= 2,
+            "rag": {"enabled": False},
+            "model": None,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "cost_usd": 0.0,
+        }
+
+    def final_decision_result(self) -> Dict[str, Any]:
+        return {
+            "esi": self.esi_level,
+            "confidence": self.confidence,
+            "reason": self.reason,
+            "rule": self.rule,
+            "rag": {"enabled": False},
+            "model": None,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "cost_usd": 0.0,
+        }
 
 
 class LLMRouter:
-    """Route requests to different LLM models based on risk and uncertainty."""
+    """Route requests to different LLM models based on risk, uncertainty and current model health."""
+
+    def __init__(self, health: Optional[ModelHealthRegistry] = None) -> None:
+        self.health = health or model_health
 
     HIGH_RISK_TERMS = {
         "chest pain",
@@ -29,17 +105,7 @@ class LLMRouter:
     }
 
     def _contains_high_risk_terms(self, text: str, extracted: Optional[Dict[str, Any]] = None) -> bool:
-        text_lower = text.lower()
-        if any(term in text_lower for term in self.HIGH_RISK_TERMS):
-            return True
-        if extracted:
-            keywords = extracted.get("keywords", [])
-            if any(term in " ".join(keywords).lower() for term in self.HIGH_RISK_TERMS):
-                return True
-            chief = extracted.get("chief_complaint", "").lower()
-            if any(term in chief for term in self.HIGH_RISK_TERMS):
-                return True
-        return False
+        return not self.HIGH_RISK_TERMS.isdisjoint(lexicon_terms(text, extracted))
 
     def _vitals_critical(self, vitals: Optional[Dict[str, Any]]) -> bool:
         if not vitals:
@@ -57,19 +123,117 @@ class LLMRouter:
             or (temp_f is not None and temp_f >= 104)
         )
 
+    def fast_path(
+        self,
+        case_text: str,
+        extracted: Dict[str, Any],
+        resources: List[str],
+    ) -> Optional[FastPathDecision]:
+        """
+        Decide clear-cut cases without an LLM, or return None when a model is needed.
+
+        ESI-2: a critical vital (SpO2 < 90, SBP < 90, RR >= 30) read with high confidence.
+        ESI-5: an adult whose only complaint is low-acuity, with no resources and normal vitals;
+        every word of the note must be part of that complaint, the age or the vitals.
+        Anything that could be ESI-1 always goes to the LLM.
+        """
+        if not settings.FAST_PATH_ENABLED:
+            return None
+
+        terms = lexicon_terms(case_text, extracted)
+        vitals = extracted.get("vitals") or {}
+        confidence = {reading["name"]: reading["confidence"] for reading in extracted.get("vital_readings") or []}
+        if not ESI1_TERMS.isdisjoint(terms) or self._vitals_extreme(vitals):
+            return None
+
+        critical = []
+        if vitals.get("spo2") is not None and vitals["spo2"] < 90:
+            critical.append(("spo2", f"SpO2 {vitals['spo2']}%"))
+        if vitals.get("sbp") is not None and vitals["sbp"] < 90:
+            critical.append(("sbp", f"SBP {vitals['sbp']}"))
+        if vitals.get("rr") is not None and vitals["rr"] >= 30:
+            critical.append(("rr", f"RR {vitals['rr']}"))
+        if critical:
+            score = max(confidence.get(name, 0.0) for name, _ in critical)
+            if score < settings.FAST_PATH_ESI2_MIN_CONFIDENCE:
+                return None
+            flags = [label for _, label in critical]
+            return FastPathDecision(
+                esi_level=2,
+                confidence=score,
+                rule="critical_vitals",
+                reason=f"Critical vital signs ({', '.join(flags)})",
+                flags=flags,
+            )
+
+        age = extracted.get("age")
+        complaint = terms & LOW_ACUITY_TERMS
+        if (
+            complaint
+            and not (terms - LOW_ACUITY_TERMS)
+            and self._only_low_acuity_words(case_text)
+            and not resources
+            and age is not None
+            and 18 <= age < 65
+            and len(vitals) >= settings.FAST_PATH_MIN_NORMAL_VITALS
+            and all(
+                low <= vitals[name] <= high for name, (low, high) in NORMAL_ADULT_VITALS.items() if name in vitals
+            )
+        ):
+            score = min(confidence.get(name, 0.0) for name in ("age", *vitals))
+            if score < settings.FAST_PATH_ESI5_MIN_CONFIDENCE:
+                return None
+            return FastPathDecision(
+                esi_level=5,
+                confidence=score,
+                rule="low_acuity",
+                reason=f"Low-acuity complaint ({', '.join(sorted(complaint))}), normal vitals, no resources",
+            )
+        return None
+
+    def _only_low_acuity_words(self, case_text: str) -> bool:
+        for word in _WORD.findall(case_text.lower()):
+            if word not in LOW_ACUITY_WORDS and not (word.endswith("s") and word[:-1] in LOW_ACUITY_WORDS):
+                return False
+        return True
+
+    def _vitals_extreme(self, vitals: Dict[str, Any]) -> bool:
+        spo2 = vitals.get("spo2")
+        sbp = vitals.get("sbp")
+        rr = vitals.get("rr")
+        hr = vitals.get("hr")
+        return bool(
+            (spo2 is not None and spo2 < 80)
+            or (sbp is not None and sbp < 70)
+            or (rr is not None and (rr >= 40 or rr < 8))
+            or (hr is not None and (hr >= 150 or hr <= 40))
+        )
+
     def select_red_flag_model(self, case_text: str, extracted: Optional[Dict[str, Any]] = None) -> str:
         if not settings.ROUTER_ENABLED:
             return settings.LLM_MODEL
 
         vitals = extracted.get("vitals") if extracted else None
         if self._contains_high_risk_terms(case_text, extracted) or self._vitals_critical(vitals):
-            return settings.ROUTER_HIGH_MODEL
+            return self.healthy(settings.ROUTER_HIGH_MODEL)
 
-        return settings.ROUTER_DEFAULT_MODEL
+        return self.healthy(settings.ROUTER_DEFAULT_MODEL)
+
+    def healthy(self, model: str) -> str:
+        """`model`, or its equivalent-tier alternative while `model` is degraded and the alternative is not."""
+        if not self.health.is_degraded(model):
+            return model
+        alternative = equivalent_model(model)
+        if alternative and not self.health.is_degraded(alternative):
+            return alternative
+        return model
 
     def select_final_decision_model(self, case_text: str, context: Dict[str, Any]) -> str:
         if not settings.ROUTER_ENABLED:
             return settings.LLM_MODEL
+        return self.healthy(self._final_decision_tier_model(case_text, context))
+
+    def _final_decision_tier_model(self, case_text: str, context: Dict[str, Any]) -> str:
 
         esi_level = context.get("esi_level", 3)
         red_flags = context.get("red_flags", {})
@@ -0,0 +1,170 @@
+"""
+Local OpenAI-compatible stub for load-testing the shared LLM connection pool.
+
+Run with:  python llm_stub_server.py --port 8099 --latency-ms 150 --jitter-ms 50
+(add --model-latency gpt-4o=2000 / --model-error-rate gpt-4o=0.5 to degrade one model,
+--latency-distribution lognormal for a long-tailed provider),
+then start the API with LLM_STUB_MODE=true (LLM_STUB_URL defaults to http://127.0.0.1:8099/v1).
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from prompt_layout import message_text
+
+
+CANNED_RESPONSES = {
+    "red_flag": {
+        "has_red_flags": False,
+        "flags_detected": [],
+        "severity_score": 0.2,
+        "esi_level": 3,
+        "confidence": 0.8,
+        "reasoning": "Stub response",
+    },
+    "final_decision": {"esi_level": 3, "confidence": 0.8, "reasoning": "Stub response"},
+    "malicious": {
+        "is_malicious": False,
+        "can_sanitize": False,
+        "sanitized_text": "",
+        "confidence": 0.9,
+        "reasoning": "Stub response",
+    },
+    "resources": {"resources": ["CBC", "X-ray"], "resource_count": 2},
+}
+
+
+LATENCY_DISTRIBUTIONS = ("uniform", "normal", "lognormal", "exponential")
+
+
+def sample_latency_ms(base_ms: float, jitter_ms: float, distribution: str = "uniform") -> float:
+    """
+    One simulated provider latency. `base_ms` is the median (mean for exponential);
+    `jitter_ms` is the half-width (uniform) or standard deviation (normal). For
+    lognormal, jitter/base sets the spread, giving the long p99 tail real providers show.
+    """
+    if base_ms <= 0:
+        return 0.0
+    if distribution == "normal":
+        return max(0.0, random.gauss(base_ms, jitter_ms))
+    if distribution == "lognormal":
+        return random.lognormvariate(math.log(base_ms), jitter_ms / base_ms if jitter_ms else 0.0)
+    if distribution == "exponential":
+        return random.expovariate(1.0 / base_ms)
+    return max(0.0, base_ms + random.uniform(-jitter_ms, jitter_ms))
+
+
+def _detect_layer(messages: List[Dict[str, Any]]) -> str:
+    system = " ".join(message_text(m) for m in messages if m.get("role") == "system").lower()
+    if "security classifier" in system:
+        return "malicious"
+    # The final-decision prompt also mentions "red flags" (as a prior layer)
+    if "identify if this case has red flags" in system:
+        return "red_flag"
+    if "ed resources" in system:
+        return "resources"
+    return "final_decision"
+
+
+def create_stub_app(
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    model_latency_ms: Optional[Dict[str, float]] = None,
+    model_error_rate: Optional[Dict[str, float]] = None,
+    latency_distribution: str = "uniform",
+) -> FastAPI:
+    """`model_latency_ms` overrides the base latency per model; `model_error_rate` answers HTTP 500 that often."""
+    model_latency_ms = model_latency_ms or {}
+    model_error_rate = model_error_rate or {}
+    stub = FastAPI(title="LLM stub")
+    stub.state.requests = 0
+    stub.state.model_requests = {}
+    # Prompt prefixes seen so far, to report provider-style prompt cache hits
+    stub.state.prefixes = set()
+
+    async def chat_completions(request: Request) -> Any:
+        body = await request.json()
+        model = body.get("model", "stub")
+        stub.state.requests += 1
+        stub.state.model_requests[model] = stub.state.model_requests.get(model, 0) + 1
+        base = model_latency_ms.get(model, latency_ms)
+        delay = sample_latency_ms(base, jitter_ms, latency_distribution) / 1000.0
+        if delay:
+            await asyncio.sleep(delay)
+        if random.random() < model_error_rate.get(model, 0.0):
+            return JSONResponse({"error": {"message": f"Injected failure for {model}"}}, status_code=500)
+
+        messages = body.get("messages", [])
+        content = json.dumps(CANNED_RESPONSES[_detect_layer(messages)])
+        prompt_tokens = sum(len(message_text(m)) for m in messages) // 4
+        completion_tokens = len(content) // 4
+        # Everything before the final message is the cacheable prefix
+        prefix = json.dumps(messages[:-1], sort_keys=True)
+        cached_tokens = sum(len(message_text(m)) for m in messages[:-1]) // 4 if prefix in stub.state.prefixes else 0
+        stub.state.prefixes.add(prefix)
+        return {
+            "id": f"stub-{stub.state.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+        }
+
+    stub.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+    stub.add_api_route("/chat/completions", chat_completions, methods=["POST"])
+    return stub
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI-compatible LLM stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=MS")
+    parser.add_argument("--model-error-rate", action="append", default=[], metavar="MODEL=RATE")
+    args = parser.parse_args()
+
+    app = create_stub_app(
+        args.latency_ms,
+        args.jitter_ms,
+        model_latency_ms=_model_values(args.model_latency),
+        model_error_rate=_model_values(args.model_error_rate),
+        latency_distribution=args.latency_distribution,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+def _model_values(items: List[str]) -> Dict[str, float]:
+    values = {}
+    for item in items:
+        model, _, value = item.rpartition("=")
+        values[model] = float(value)
+    return values
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,20 @@
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Query, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from typing import Optional
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import json
 import re
+import time
 
 from pydantic import BaseModel, Field
 
-from auth import RateLimiter
+from auth import RateLimiter, Reservation
+from auth_admin import verify_admin_key
 from config import settings
+import metrics
 from detectors.red_flag import RedFlagDetector
 from detectors.extraction import ExtractionDetector
 from detectors.vital_signal import VitalSignalDetector
@@ -15,8 +22,16 @@ import asyncio
 from detectors.malicious_input import MaliciousInputDetector, LLMMaliciousInputDetector
 from detectors.resource_inference import ResourceInferenceDetector
 from detectors.handbook_verification import HandbookVerificationDetector
-from detectors.final_decision import FinalDecisionDetector
+from detectors.final_decision import FinalDecisionDetector, encode_context
+from llm_cache import response_cache
+from llm_client import close_openai_client, estimate_request_cost_usd, track_request_spend
 from llm_router import LLMRouter
+from model_health import model_health
+from offload import EventLoopLagMonitor, layer_executor
+from pipeline import LayerCallback, PipelineExecutor, PipelineLayer, Speculation, speculation_stats
+from rag.config import get_rag_config_manager
+from rag.evidence import get_evidence_cache
+from rag.knowledge_base import get_knowledge_base, shared_retrieval_scope
 from api.routes import admin_rag
 
 
@@ -28,7 +43,26 @@ class ClassifyRequest(BaseModel):
     )
 
 
-app = FastAPI(title=settings.API_TITLE, version=settings.API_VERSION)
+class BatchClassifyRequest(BaseModel):
+    cases: List[ClassifyRequest] = Field(..., min_length=1, description="Cases to classify")
+    concurrency: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Max cases processed at once (capped by BATCH_MAX_CONCURRENCY)",
+    )
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    await _warm_evidence_cache()
+    loop_lag_monitor.start()
+    yield
+    await loop_lag_monitor.stop()
+    layer_executor.shutdown()
+    await close_openai_client()
+
+
+app = FastAPI(title=settings.API_TITLE, version=settings.API_VERSION, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -38,6 +72,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Build the shared knowledge base (documents + lookup indexes) once at startup
+knowledge_base = get_knowledge_base()
+rag_config_manager = get_rag_config_manager()
+
 detector = RedFlagDetector()
 extraction_detector = ExtractionDetector()
 vital_detector = VitalSignalDetector()
@@ -48,45 +86,20 @@ router = LLMRouter()
 rate_limiter = RateLimiter()
 malicious_detector = MaliciousInputDetector()
 malicious_llm_detector = LLMMaliciousInputDetector()
+loop_lag_monitor = EventLoopLagMonitor(settings.EVENT_LOOP_LAG_INTERVAL_SECONDS)
 
 
-@app.post("/classify")
-async def classify(request: Request, payload: ClassifyRequest):
-    client_ip = request.client.host
-    allowed, message = rate_limiter.check_limit(client_ip)
-
-    if not allowed:
-        return JSONResponse({"error": message}, status_code=429)
-
-    rate_limiter.increment(client_ip)
-
-    malicious_check, malicious_llm_check = await asyncio.gather(
-        asyncio.to_thread(malicious_detector.analyze, payload.case_text),
-        malicious_llm_detector.analyze(payload.case_text),
-    )
-    sanitized_case_text = malicious_check.get("sanitized_text") or payload.case_text
-
-    if malicious_llm_check.get("enabled") and malicious_llm_check.get("is_malicious"):
-        if malicious_llm_check.get("can_sanitize") and malicious_llm_check.get("sanitized_text"):
-            sanitized_case_text = malicious_llm_check["sanitized_text"]
-        else:
-            return JSONResponse(
-                {
-                    "error": "Potential prompt injection detected. Please remove instruction-like content and resubmit.",
-                    "malicious_input": {**malicious_check, "llm": malicious_llm_check},
-                },
-                status_code=400,
-            )
+async def _warm_evidence_cache() -> None:
+    """Render every knowledge document and prebuild each layer's structured evidence."""
+    evidence_cache = get_evidence_cache()
+    evidence_cache.warm_documents(knowledge_base)
+    for layer in (detector, resource_detector, final_detector):
+        await layer.warm_evidence()
 
-    extracted = extraction_detector.extract(sanitized_case_text)
-    model_override = payload.model if payload.model and payload.model != "auto" else None
-    red_flag_model = (
-        model_override or router.select_red_flag_model(sanitized_case_text, extracted)
-    )
-    red_flag = await detector.classify(sanitized_case_text, extracted, model=red_flag_model)
-    vital = await vital_detector.assess(sanitized_case_text, extracted)
-    resources = await resource_detector.infer(sanitized_case_text, extracted)
 
+def _preliminary_esi(
+    red_flag: Dict[str, Any], vital: Dict[str, Any], resources: Dict[str, Any]
+) -> Tuple[int, str]:
     # Simple pipeline logic (temporary scoring passed into LLM final decision)
     if red_flag.get("has_red_flags"):
         preliminary_esi = 2
@@ -108,45 +121,262 @@ async def classify(request: Request, payload: ClassifyRequest):
         preliminary_esi = min(preliminary_esi, 2)
         preliminary_reason = "Critical vital signs"
 
-    final_context = {
-        "esi_level": preliminary_esi,
-        "preliminary_reason": preliminary_reason,
-        "extraction": extracted,
-        "red_flags": red_flag,
-        "vitals": vital,
-        "resources": resources,
-    }
+    return preliminary_esi, preliminary_reason
+
+
+def _parse_esi_level(raw: Any, default: int) -> int:
+    if isinstance(raw, int):
+        return raw
+    if isinstance(raw, str):
+        match = re.search(r"\d", raw)
+        return int(match.group()) if match else default
+    return default
+
 
-    final_model = (
-        model_override
-        or router.select_final_decision_model(sanitized_case_text, final_context)
+def _speculation_key_context(context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    `context` as the speculative final decision sees it. That call is made before
+    red flags return, on an empty red-flag result, so a real result without flags
+    and no more urgent than the preliminary ESI is treated as empty: its ESI,
+    confidence and reason never reach the final decision on a speculation hit.
+    """
+    red_flag = context.get("red_flags") or {}
+    quiet = (
+        not red_flag.get("has_red_flags")
+        and not red_flag.get("flags")
+        and _parse_esi_level(red_flag.get("esi", 5), 5) >= context["esi_level"]
     )
-    final_decision = await final_detector.decide(sanitized_case_text, final_context, model=final_model)
-    rate_limiter.add_cost(client_ip, red_flag.get("cost_usd", 0.0))
-
-    final_esi_level_raw = final_decision.get("esi", preliminary_esi)
-    if isinstance(final_esi_level_raw, int):
-        final_esi_level = final_esi_level_raw
-    elif isinstance(final_esi_level_raw, str):
-        match = re.search(r"\d", final_esi_level_raw)
-        final_esi_level = int(match.group()) if match else preliminary_esi
+    return {**context, "red_flags": {}} if quiet else context
+
+
+def _red_flag_fallback(exc: BaseException, model: str) -> Dict[str, Any]:
+    reason = "Red flag layer timed out" if isinstance(exc, asyncio.TimeoutError) else f"Classification error: {exc}"
+    return {
+        "esi": 3,
+        "confidence": 0.5,
+        "reason": reason,
+        "flags": [],
+        "severity_score": 0.0,
+        "has_red_flags": False,
+        "model": model,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "total_tokens": 0,
+        "cost_usd": 0.0,
+    }
+
+
+async def _classify_case(
+    case_text: str,
+    model: Optional[str] = None,
+    emit: Optional[LayerCallback] = None,
+) -> Tuple[int, Dict[str, Any]]:
+    """
+    Run the full layer pipeline for one case; returns (status_code, body) without client quota fields.
+    If `emit` is given it is awaited with (layer_name, layer_output) as soon as each layer finishes.
+    """
+    # Every layer of this request sees one RAG config snapshot, even if an admin edits it mid-flight
+    with rag_config_manager.pinned():
+        try:
+            status_code, body = await _run_case(case_text, model, emit)
+        except Exception:
+            metrics.classifications.inc("error", "none")
+            raise
+    mode = body.get("intermediate", {}).get("routing", {}).get("mode", "none")
+    metrics.classifications.inc("ok" if status_code == 200 else "rejected", mode)
+    return status_code, body
+
+
+async def _run_case(
+    case_text: str,
+    model: Optional[str],
+    emit: Optional[LayerCallback],
+) -> Tuple[int, Dict[str, Any]]:
+    started = time.perf_counter()
+    malicious_check = await layer_executor.run("malicious", malicious_detector.analyze, case_text)
+    sanitized_case_text = malicious_check["sanitized_text"] if malicious_check.get("is_malicious") else case_text
+    model_override = model if model and model != "auto" else None
+    malicious_seconds = time.perf_counter() - started
+    if malicious_check.get("is_malicious") and not sanitized_case_text.strip():
+        # Nothing but injected instructions: no clinical text left to triage
+        return 400, {
+            "error": "Potential prompt injection detected. Please remove instruction-like content and resubmit.",
+            "malicious_input": {
+                **malicious_check,
+                "llm": {"enabled": False, "is_malicious": False, "reasoning": "Skipped: nothing left after sanitizing"},
+            },
+        }
+    # The LLM injection check overlaps extraction and the fast-path rules instead of following them
+    llm_started = time.perf_counter()
+    malicious_llm_task = asyncio.create_task(malicious_llm_detector.analyze(case_text))
+    try:
+        extracted = await layer_executor.run("extraction", extraction_detector.extract, sanitized_case_text)
+        extraction_seconds = time.perf_counter() - llm_started
+        metrics.layer_duration.observe(extraction_seconds, "extraction", "ok")
+
+        # Clear-cut cases are decided by rule; an explicit model choice always goes to the LLM
+        fast_path = None
+        if model_override is None and not malicious_check.get("is_malicious"):
+            rule_resources = await layer_executor.run(
+                "resources", resource_detector.rule_based_resources, sanitized_case_text, extracted
+            )
+            fast_path = await layer_executor.run(
+                "router", router.fast_path, sanitized_case_text, extracted, rule_resources
+            )
+    except BaseException:
+        malicious_llm_task.cancel()
+        raise
+
+    if fast_path is not None:
+        # No model sees the text, so there is nothing for the LLM injection check to guard
+        malicious_llm_task.cancel()
+        malicious_llm_check = {
+            "enabled": False,
+            "is_malicious": False,
+            "confidence": 0.0,
+            "reasoning": "Skipped on the rule-based fast path",
+        }
     else:
-        final_esi_level = preliminary_esi
+        malicious_llm_check = await malicious_llm_task
+        malicious_seconds += time.perf_counter() - llm_started
+    metrics.layer_duration.observe(malicious_seconds, "malicious", "ok")
+    if emit is not None:
+        await emit("malicious_input", {**malicious_check, "llm": malicious_llm_check})
+
+    if malicious_llm_check.get("enabled") and malicious_llm_check.get("is_malicious"):
+        if malicious_llm_check.get("can_sanitize") and malicious_llm_check.get("sanitized_text"):
+            sanitized_case_text = malicious_llm_check["sanitized_text"]
+            extracted = await layer_executor.run("extraction", extraction_detector.extract, sanitized_case_text)
+        else:
+            return 400, {
+                "error": "Potential prompt injection detected. Please remove instruction-like content and resubmit.",
+                "malicious_input": {**malicious_check, "llm": malicious_llm_check},
+            }
+
+    if emit is not None:
+        await emit("extraction", extracted)
+    red_flag_model = None
+    if fast_path is None:
+        red_flag_model = model_override or router.select_red_flag_model(sanitized_case_text, extracted)
+
+    async def run_red_flag(_results: Dict[str, Any]) -> Dict[str, Any]:
+        if fast_path is not None:
+            return fast_path.red_flag_result()
+        return await detector.classify(sanitized_case_text, extracted, model=red_flag_model)
+
+    async def run_vitals(_results: Dict[str, Any]) -> Dict[str, Any]:
+        return await vital_detector.assess(sanitized_case_text, extracted)
+
+    async def run_resources(_results: Dict[str, Any]) -> Dict[str, Any]:
+        return await resource_detector.infer(sanitized_case_text, extracted, use_llm=fast_path is None)
+
+    async def run_preliminary(results: Dict[str, Any]) -> Dict[str, Any]:
+        preliminary_esi, preliminary_reason = _preliminary_esi(
+            results["red_flag"], results["vitals"], results["resources"]
+        )
+        return {
+            "esi_level": preliminary_esi,
+            "preliminary_reason": preliminary_reason,
+            # Spans are only needed for routing and display; keep them out of the final-decision prompt
+            "extraction": {
+                key: value for key, value in extracted.items() if key not in ("term_hits", "vital_readings")
+            },
+            "red_flags": results["red_flag"],
+            "vitals": results["vitals"],
+            "resources": results["resources"],
+        }
+
+    def final_decision_plan(context: Dict[str, Any]) -> Tuple[Tuple[str, str], Callable[[], Awaitable[Dict[str, Any]]]]:
+        """(speculation key, call) for a final decision over `context`; the key is the projected prompt context."""
+        final_model = (
+            model_override
+            or router.select_final_decision_model(sanitized_case_text, {**context, "extraction": extracted})
+        )
+
+        async def call() -> Dict[str, Any]:
+            final_decision = await final_detector.decide(sanitized_case_text, context, model=final_model)
+            final_decision.setdefault("model", final_model)
+            return final_decision
+
+        return (encode_context(_speculation_key_context(context)), final_model), call
+
+    speculative = settings.SPECULATIVE_FINAL_DECISION and fast_path is None
+    speculation = Speculation()
+
+    async def run_speculation(results: Dict[str, Any]) -> Dict[str, Any]:
+        # Assume no red flags (the common case) and start the final decision without waiting for them
+        if "red_flag" not in results:
+            predicted = await run_preliminary({**results, "red_flag": {}})
+            key, call = final_decision_plan(predicted)
+            speculation.start(key, call)
+        return speculation.report()
+
+    async def run_final_decision(results: Dict[str, Any]) -> Dict[str, Any]:
+        if fast_path is not None:
+            return fast_path.final_decision_result()
+        key, call = final_decision_plan(results["preliminary"])
+        final_decision = await (speculation.resolve(key, call) if speculative else call())
+        if speculation.discarded is not None:
+            speculation_stats.wasted_cost_usd += float(speculation.discarded.get("cost_usd", 0.0) or 0.0)
+        return final_decision
 
-    handbook = await handbook_detector.verify(final_esi_level, sanitized_case_text)
+    async def run_handbook(results: Dict[str, Any]) -> Dict[str, Any]:
+        preliminary_esi = results["preliminary"]["esi_level"]
+        final_esi_level = _parse_esi_level(results["final_decision"].get("esi", preliminary_esi), preliminary_esi)
+        return await handbook_detector.verify(final_esi_level, sanitized_case_text)
+
+    layers = [
+        PipelineLayer("red_flag", run_red_flag, fallback=lambda exc: _red_flag_fallback(exc, red_flag_model)),
+        PipelineLayer("vitals", run_vitals),
+        PipelineLayer("resources", run_resources),
+        PipelineLayer("preliminary", run_preliminary, depends_on=("red_flag", "vitals", "resources")),
+        PipelineLayer("final_decision", run_final_decision, depends_on=("preliminary",)),
+        PipelineLayer("handbook", run_handbook, depends_on=("final_decision",)),
+    ]
+    if speculative:
+        layers.append(PipelineLayer("final_decision_speculation", run_speculation, depends_on=("vitals", "resources")))
+    pipeline = PipelineExecutor(layers, default_timeout=settings.PIPELINE_LAYER_TIMEOUT_SECONDS or None)
+    try:
+        run = await pipeline.run(on_complete=emit)
+    finally:
+        speculation.cancel()
+    metrics.record_layer_timings(run.timings)
+    red_flag = run.results["red_flag"]
+    vital = run.results["vitals"]
+    resources = run.results["resources"]
+    final_context = run.results["preliminary"]
+    final_decision = run.results["final_decision"]
+    handbook = run.results["handbook"]
+    preliminary_esi = final_context["esi_level"]
+    preliminary_reason = final_context["preliminary_reason"]
+    final_model = final_decision.get("model")
+
+    final_esi_level = _parse_esi_level(final_decision.get("esi", preliminary_esi), preliminary_esi)
     final_context["handbook_verification"] = handbook
 
     layer_costs = {
         "malicious": float(malicious_llm_check.get("cost_usd", 0.0) or 0.0),
         "red_flag": float(red_flag.get("cost_usd", 0.0) or 0.0),
         "final_decision": float(final_decision.get("cost_usd", 0.0) or 0.0),
-        "vitals": 0.0,
+        "vitals": float(vital.get("cost_usd", 0.0) or 0.0),
         "resources": float(resources.get("cost_usd", 0.0) or 0.0),
-        "handbook": 0.0,
+        "handbook": float(handbook.get("cost_usd", 0.0) or 0.0),
+        "final_decision_speculation": (
+            float(speculation.discarded.get("cost_usd", 0.0) or 0.0) if speculation.discarded else 0.0
+        ),
     }
     total_cost = sum(layer_costs.values())
+    for layer_name, layer_cost in layer_costs.items():
+        metrics.layer_cost.inc(layer_name, amount=layer_cost)
+    # Layers that report token usage; every token total below sums the same set
+    llm_layers = (malicious_llm_check, red_flag, final_decision, resources)
+    cache_savings = sum(float(layer.get("cost_saved_usd", 0.0) or 0.0) for layer in llm_layers)
+    evidence_tokens_saved = sum(
+        int((layer.get("rag") or {}).get("tokens_saved", 0) or 0)
+        for layer in (red_flag, final_decision, resources)
+    )
 
-    return {
+    return 200, {
         "esi_level": final_esi_level,
         "confidence": final_decision.get("confidence", 0.6),
         "reason": final_decision.get("reason", preliminary_reason),
@@ -165,32 +395,212 @@ async def classify(request: Request, payload: ClassifyRequest):
             "handbook_verification": handbook,
             "final_decision": final_decision,
             "routing": {
-                "mode": "fixed" if model_override else "auto",
+                "mode": "fast_path" if fast_path else ("fixed" if model_override else "auto"),
+                "fast_path_rule": fast_path.rule if fast_path else None,
+                "speculation": speculation.outcome,
                 "red_flag_model": red_flag.get("model", red_flag_model),
                 "final_decision_model": final_decision.get("model", final_model),
+                "hedged": [name for name, layer in (("red_flag", red_flag), ("final_decision", final_decision))
+                           if layer.get("hedged")],
             },
             "layer_costs": layer_costs,
+            "timings": {
+                "layers": run.timings,
+                "pipeline_ms": run.total_ms,
+                "malicious_ms": round(malicious_seconds * 1000, 3),
+                "extraction_ms": round(extraction_seconds * 1000, 3),
+            },
         },
         "cost": {
-            "prompt_tokens": (
-                malicious_llm_check.get("prompt_tokens", 0)
-                + red_flag.get("prompt_tokens", 0)
-                + final_decision.get("prompt_tokens", 0)
-            ),
-            "completion_tokens": (
-                malicious_llm_check.get("completion_tokens", 0)
-                + red_flag.get("completion_tokens", 0)
-                + final_decision.get("completion_tokens", 0)
-            ),
-            "total_tokens": (
-                malicious_llm_check.get("total_tokens", 0)
-                + red_flag.get("total_tokens", 0)
-                + final_decision.get("total_tokens", 0)
-            ),
+            **{
+                field: sum(int(layer.get(field, 0) or 0) for layer in llm_layers)
+                for field in ("prompt_tokens", "cached_prompt_tokens", "completion_tokens", "total_tokens")
+            },
             "estimated_cost_usd": total_cost,
-            "budget_remaining_usd": rate_limiter.get_remaining_budget(client_ip),
+            "cache_savings_usd": cache_savings,
+            "evidence_tokens_saved": evidence_tokens_saved,
+        },
+    }
+
+
+@app.post("/classify")
+async def classify(request: Request, payload: ClassifyRequest):
+    client_ip = request.client.host
+    reservation, message = await rate_limiter.reserve_async(client_ip, _estimate_case_cost_usd(payload.case_text))
+
+    if reservation is None:
+        return JSONResponse({"error": message}, status_code=429)
+
+    with track_request_spend() as spend:
+        try:
+            status_code, body = await _classify_case(payload.case_text, payload.model)
+        except BaseException:
+            # Calls that already ran (injection check, red flags, ...) were billed
+            await rate_limiter.settle_async(reservation, spend.usd)
+            raise
+    if status_code != 200:
+        await rate_limiter.settle_async(reservation, spend.usd)
+        return JSONResponse(body, status_code=status_code)
+
+    return await _apply_client_quota(client_ip, reservation, body)
+
+
+def _estimate_case_cost_usd(case_text: str) -> float:
+    # red_flag + final_decision, plus the optional LLM malicious and resource layers
+    # and a speculative final decision that may be wasted
+    llm_calls = (
+        2 + int(bool(settings.OPENROUTER_API_KEY)) + int(settings.RESOURCE_LLM_ENABLED)
+        + int(settings.SPECULATIVE_FINAL_DECISION)
+    )
+    return estimate_request_cost_usd(case_text, llm_calls)
+
+
+async def _apply_client_quota(client_ip: str, reservation: Reservation, body: Dict[str, Any]) -> Dict[str, Any]:
+    await rate_limiter.settle_async(reservation, body["cost"]["estimated_cost_usd"])
+    body["queries_remaining"], body["cost"]["budget_remaining_usd"] = await rate_limiter.remaining_async(client_ip)
+    return body
+
+
+def _encode_stream_event(event: str, data: Any, stream_format: str) -> str:
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+    return json.dumps({"event": event, "data": jsonable_encoder(data)}, ensure_ascii=False) + "\n"
+
+
+@app.post("/classify/stream")
+async def classify_stream(
+    request: Request,
+    payload: ClassifyRequest,
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="Event encoding: ndjson or sse"),
+):
+    """
+    Streaming variant of /classify: emits each layer's output as an event as soon as it
+    finishes, then a final `result` (same body as /classify) or `error` event.
+    """
+    client_ip = request.client.host
+    reservation, message = await rate_limiter.reserve_async(client_ip, _estimate_case_cost_usd(payload.case_text))
+
+    if reservation is None:
+        return JSONResponse({"error": message}, status_code=429)
+
+    queue: "asyncio.Queue[Optional[Tuple[str, Any]]]" = asyncio.Queue()
+
+    async def emit(event: str, data: Any) -> None:
+        await queue.put((event, data))
+
+    async def produce() -> None:
+        with track_request_spend() as spend:
+            try:
+                status_code, body = await _classify_case(payload.case_text, payload.model, emit=emit)
+                if status_code == 200:
+                    await queue.put(("result", await _apply_client_quota(client_ip, reservation, body)))
+                else:
+                    await rate_limiter.settle_async(reservation, spend.usd)
+                    await queue.put(("error", {"status_code": status_code, **body}))
+            except Exception as exc:
+                await queue.put(("error", {"status_code": 500, "error": f"Classification failed: {exc}"}))
+            finally:
+                # No-op once settled; on errors or client disconnects, charge the calls that already ran
+                await rate_limiter.settle_async(reservation, spend.usd)
+                await queue.put(None)
+
+    async def events():
+        task = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield _encode_stream_event(item[0], item[1], format)
+        finally:
+            # Client went away before the pipeline finished
+            if not task.done():
+                task.cancel()
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/classify/batch")
+async def classify_batch(
+    payload: BatchClassifyRequest,
+    authenticated: bool = Depends(verify_admin_key),
+):
+    """
+    Classify many cases in one call (admin only, not subject to per-IP quotas).
+    Identical (case_text, model) pairs run once, and RAG context is shared across
+    cases with the same chief complaint.
+    """
+    if len(payload.cases) > settings.BATCH_MAX_CASES:
+        return JSONResponse(
+            {"error": f"Batch too large ({settings.BATCH_MAX_CASES} cases max)"},
+            status_code=413,
+        )
+
+    concurrency = min(payload.concurrency or settings.BATCH_DEFAULT_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY)
+    gate = asyncio.Semaphore(concurrency)
+
+    async def run_case(case: ClassifyRequest) -> Dict[str, Any]:
+        async with gate:
+            start = time.perf_counter()
+            try:
+                status_code, body = await _classify_case(case.case_text, case.model)
+            except Exception as exc:
+                status_code, body = 500, {"error": f"Classification failed: {exc}"}
+            return {
+                "status_code": status_code,
+                "body": body,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+            }
+
+    started = time.perf_counter()
+    unique: Dict[Tuple[str, Optional[str]], "asyncio.Task[Dict[str, Any]]"] = {}
+    first_index: Dict[Tuple[str, Optional[str]], int] = {}
+    with shared_retrieval_scope():
+        for index, case in enumerate(payload.cases):
+            key = (case.case_text, case.model)
+            if key not in unique:
+                unique[key] = asyncio.create_task(run_case(case))
+                first_index[key] = index
+        await asyncio.gather(*unique.values())
+
+    results = []
+    for index, case in enumerate(payload.cases):
+        key = (case.case_text, case.model)
+        outcome = unique[key].result()
+        entry: Dict[str, Any] = {"index": index, "status_code": outcome["status_code"]}
+        if first_index[key] != index:
+            entry["duplicate_of"] = first_index[key]
+        if outcome["status_code"] == 200:
+            entry["result"] = outcome["body"]
+        else:
+            entry["error"] = outcome["body"].get("error")
+        results.append(entry)
+
+    outcomes = [task.result() for task in unique.values()]
+    succeeded = [o["body"] for o in outcomes if o["status_code"] == 200]
+    case_ms = sorted(o["elapsed_ms"] for o in outcomes)
+    return {
+        "results": results,
+        "summary": {
+            "cases": len(payload.cases),
+            "unique_cases": len(unique),
+            "duplicates": len(payload.cases) - len(unique),
+            "failed": len(outcomes) - len(succeeded),
+            "concurrency": concurrency,
+        },
+        "cost": {
+            key: sum(body["cost"][key] for body in succeeded)
+            for key in (
+                "prompt_tokens", "cached_prompt_tokens", "completion_tokens", "total_tokens",
+                "estimated_cost_usd", "cache_savings_usd", "evidence_tokens_saved",
+            )
+        },
+        "timing": {
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+            "case_p50_ms": case_ms[len(case_ms) // 2] if case_ms else 0.0,
+            "case_max_ms": case_ms[-1] if case_ms else 0.0,
         },
-        "queries_remaining": rate_limiter.get_remaining(client_ip),
     }
 
 
@@ -208,9 +618,60 @@ async def info():
         "model": settings.LLM_MODEL,
         "rate_limit": settings.RATE_LIMIT_PER_DAY,
         "free_tier_daily_budget_usd": settings.FREE_TIER_DAILY_BUDGET_USD,
+        "llm_cache": response_cache.stats() if response_cache else {"enabled": False},
+        "evidence_cache": get_evidence_cache().stats(),
+        "speculation": speculation_stats.as_dict(),
+        "model_health": model_health.snapshot(),
+        "offload": layer_executor.stats(),
+        "event_loop_lag": loop_lag_monitor.stats(),
     }
 
 
+def _collect_component_metrics() -> List[metrics.MetricFamily]:
+    families = metrics.cache_family(
+        "triage_llm_response_cache_lookups", "LLM response cache lookups",
+        response_cache.stats() if response_cache else None,
+    )
+    families += metrics.cache_family(
+        "triage_evidence_cache_lookups", "Packed-evidence cache lookups", get_evidence_cache().stats()
+    )
+    speculation = speculation_stats.as_dict()
+    families.append(
+        (
+            "triage_speculations",
+            "counter",
+            "Speculative final decisions by outcome",
+            [("_total", {"outcome": outcome}, speculation[outcome]) for outcome in ("hits", "wasted", "skipped")],
+        )
+    )
+    health = model_health.snapshot()
+    families.append(
+        (
+            "triage_model_p95_latency_seconds",
+            "gauge",
+            "Rolling p95 provider latency per model",
+            [("", {"model": model}, (stats["p95_ms"] or 0.0) / 1000.0) for model, stats in health.items()],
+        )
+    )
+    families.append(
+        (
+            "triage_model_error_ratio",
+            "gauge",
+            "Rolling provider error rate per model",
+            [("", {"model": model}, stats["error_rate"]) for model, stats in health.items()],
+        )
+    )
+    return families
+
+
+metrics.registry.register_collector("components", _collect_component_metrics)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(metrics.registry.render(), media_type=metrics.OPENMETRICS_CONTENT_TYPE)
+
+
 # Include admin RAG configuration routes
 app.include_router(admin_rag.router, tags=["admin"])
 
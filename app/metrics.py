@@ -0,0 +1,200 @@
+"""
+In-process metrics exported on /metrics in OpenMetrics text format.
+
+Counters and histograms are plain dicts keyed by label values, updated under one
+lock (a few dict operations per observation), so instrumenting the request path
+costs microseconds. Values that other components already keep (LLM response
+cache, evidence cache, speculation, model health) are read at scrape time by
+registered collectors instead of being duplicated here.
+"""
+
+import bisect
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Seconds; layers and LLM calls span ~1 ms (rules, cache hits) to tens of seconds (slow providers)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+# (name, type, help, [(sample suffix, labels, value)])
+MetricFamily = Tuple[str, str, str, List[Tuple[str, Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], lock: threading.Lock) -> None:
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._lock = lock
+
+    def _labels(self, values: Labels) -> Dict[str, str]:
+        return dict(zip(self.label_names, values))
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args: Any) -> None:
+        super().__init__(*args)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def family(self) -> MetricFamily:
+        samples = [("_total", self._labels(labels), value) for labels, value in sorted(self._values.items())]
+        return self.name, self.type_name, self.help, samples
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, *args: Any, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(*args)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self._values: Dict[Labels, List[Any]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def count(self, *labels: str) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def family(self) -> MetricFamily:
+        samples = []
+        for labels, (counts, total) in sorted(self._values.items()):
+            base = self._labels(labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append(("_bucket", {**base, "le": _format_value(bound)}, cumulative))
+            samples.append(("_count", base, cumulative))
+            samples.append(("_sum", base, total))
+        return self.name, self.type_name, self.help, samples
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: List[_Metric] = []
+        self._collectors: Dict[str, Callable[[], Iterable[MetricFamily]]] = {}
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help_text, labels, self._lock)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        metric = Histogram(name, help_text, labels, self._lock, buckets=buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, name: str, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        """`collector()` is called on every scrape and returns extra metric families (re-registering replaces)."""
+        self._collectors[name] = collector
+
+    def reset(self) -> None:
+        with self._lock:
+            for metric in self._metrics:
+                metric._values.clear()
+
+    def render(self) -> str:
+        families = [metric.family() for metric in self._metrics]
+        for collector in self._collectors.values():
+            families.extend(collector())
+        lines = []
+        for name, type_name, help_text, samples in families:
+            lines.append(f"# TYPE {name} {type_name}")
+            lines.append(f"# HELP {name} {_escape(help_text)}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+layer_duration = registry.histogram(
+    "triage_layer_duration_seconds", "Wall time of each pipeline layer", ("layer", "status")
+)
+layer_cost = registry.counter("triage_layer_cost_usd", "Estimated LLM spend per layer", ("layer",))
+classifications = registry.counter(
+    "triage_classifications", "Classified cases by outcome and routing mode", ("outcome", "mode")
+)
+llm_phase_duration = registry.histogram(
+    "triage_llm_phase_duration_seconds",
+    "LLM call time split into queue (concurrency limit), network (provider round trip) and parse",
+    ("model", "phase"),
+)
+llm_requests = registry.counter("triage_llm_requests", "Provider calls by outcome", ("model", "outcome"))
+llm_tokens = registry.counter(
+    "triage_llm_tokens", "Tokens billed by model (kind: prompt, cached_prompt, completion)", ("model", "kind")
+)
+llm_cost = registry.counter("triage_llm_cost_usd", "Estimated provider spend by model", ("model",))
+rag_retrievals = registry.counter("triage_rag_retrievals", "Knowledge-base retrievals by collection", ("collection",))
+rag_documents = registry.counter(
+    "triage_rag_documents", "Documents returned by knowledge-base retrievals", ("collection",)
+)
+
+
+def record_retrieval(retrieval: Any) -> None:
+    """Count one knowledge-base retrieval (a RetrievalResult)."""
+    rag_retrievals.inc(retrieval.collection)
+    rag_documents.inc(retrieval.collection, amount=len(retrieval.results))
+
+
+def record_layer_timings(timings: Dict[str, Dict[str, Any]]) -> None:
+    """Observe every layer of a PipelineRun (`{name: {"duration_ms", "status"}}`)."""
+    for name, timing in timings.items():
+        layer_duration.observe(timing["duration_ms"] / 1000.0, name, timing["status"])
+
+
+def cache_family(name: str, help_text: str, stats: Optional[Dict[str, Any]]) -> List[MetricFamily]:
+    """hits/misses counters for a cache exposing `stats()` with those keys."""
+    if not stats:
+        return []
+    return [
+        (
+            name,
+            "counter",
+            help_text,
+            [
+                ("_total", {"result": "hit"}, stats.get("hits", 0)),
+                ("_total", {"result": "miss"}, stats.get("misses", 0)),
+            ],
+        )
+    ]
@@ -0,0 +1,169 @@
+"""
+Rolling per-model latency and error statistics.
+
+create_chat_completion records every provider call here; LLMRouter uses the
+numbers to steer away from degraded models, and hedged requests use each
+model's p95 latency as the delay before firing a backup call.
+
+A primary call cancelled because its hedge answered first is recorded as
+censored: it took at least as long as the time it ran, and its real latency is
+unknown. For the degradation check, censored samples count as slower than any
+call that finished. If the cancelled time were recorded as the latency, a model
+that always loses its hedge would look as fast as its backup.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from config import settings
+
+
+# Upper bounds (ms) of the histogram buckets reported by snapshot()
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+Sample = Tuple[float, float, bool, bool]
+
+
+class LatencyHistogram:
+    """The last `max_samples` calls within `window_seconds`: (timestamp, latency_ms, ok, censored)."""
+
+    def __init__(self, max_samples: int, window_seconds: float) -> None:
+        self.window_seconds = window_seconds
+        self._samples: Deque[Sample] = deque(maxlen=max_samples)
+
+    def record(self, latency_ms: float, ok: bool, now: Optional[float] = None, censored: bool = False) -> None:
+        self._samples.append((now if now is not None else time.monotonic(), latency_ms, ok, censored))
+
+    def _recent(self, now: Optional[float] = None) -> List[Sample]:
+        cutoff = (now if now is not None else time.monotonic()) - self.window_seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        return list(self._samples)
+
+    def count(self) -> int:
+        return len(self._recent())
+
+    def percentile(self, pct: float, include_censored: bool = True) -> Optional[float]:
+        """
+        Latency percentile over successful calls; None without samples. Censored
+        calls count as infinitely slow unless `include_censored` is false.
+        """
+        latencies = sorted(
+            float("inf") if censored else latency
+            for _, latency, ok, censored in self._recent()
+            if ok and (include_censored or not censored)
+        )
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(pct / 100.0 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def error_rate(self) -> float:
+        samples = self._recent()
+        if not samples:
+            return 0.0
+        return sum(1 for _, _, ok, _ in samples if not ok) / len(samples)
+
+    def censored_count(self) -> int:
+        return sum(1 for _, _, _, censored in self._recent() if censored)
+
+    def buckets(self) -> Dict[str, int]:
+        counts = {f"le_{bound}": 0 for bound in LATENCY_BUCKETS_MS}
+        counts["inf"] = 0
+        for _, latency, _, censored in self._recent():
+            for bound in LATENCY_BUCKETS_MS:
+                if not censored and latency <= bound:
+                    counts[f"le_{bound}"] += 1
+                    break
+            else:
+                counts["inf"] += 1
+        return counts
+
+
+class ModelHealthRegistry:
+    def __init__(self) -> None:
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.RLock()
+
+    def _histogram(self, model: str) -> LatencyHistogram:
+        histogram = self._histograms.get(model)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(
+                    model,
+                    LatencyHistogram(settings.ROUTER_HEALTH_WINDOW, settings.ROUTER_HEALTH_WINDOW_SECONDS),
+                )
+        return histogram
+
+    def record(self, model: str, latency_ms: float, ok: bool, censored: bool = False) -> None:
+        with self._lock:
+            self._histogram(model).record(latency_ms, ok, censored=censored)
+
+    def p95_ms(self, model: str) -> Optional[float]:
+        return self._histogram(model).percentile(95)
+
+    def is_degraded(self, model: str) -> bool:
+        histogram = self._histogram(model)
+        if histogram.count() < settings.ROUTER_HEALTH_MIN_SAMPLES:
+            return False
+        if histogram.error_rate() >= settings.ROUTER_DEGRADED_ERROR_RATE:
+            return True
+        p95 = histogram.percentile(95)
+        return p95 is not None and p95 >= settings.ROUTER_DEGRADED_P95_MS
+
+    def hedge_delay_seconds(self, model: str) -> float:
+        """Wait this long for `model` before firing a backup call: the p95 of its finished calls once known."""
+        histogram = self._histogram(model)
+        p95 = None
+        if histogram.count() >= settings.ROUTER_HEALTH_MIN_SAMPLES:
+            p95 = histogram.percentile(95, include_censored=False)
+        delay_ms = p95 if p95 is not None else settings.ROUTER_HEDGE_DEFAULT_DELAY_MS
+        return max(delay_ms, settings.ROUTER_HEDGE_MIN_DELAY_MS) / 1000.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        report = {}
+        for model, histogram in list(self._histograms.items()):
+            p50 = histogram.percentile(50)
+            p95 = histogram.percentile(95)
+            report[model] = {
+                "count": histogram.count(),
+                # None when the percentile falls on a call cancelled before it finished
+                "p50_ms": _rounded_ms(p50),
+                "p95_ms": _rounded_ms(p95),
+                "censored": histogram.censored_count(),
+                "error_rate": round(histogram.error_rate(), 4),
+                "degraded": self.is_degraded(model),
+                "buckets": histogram.buckets(),
+            }
+        return report
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+
+def _rounded_ms(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None and value != float("inf") else None
+
+
+model_health = ModelHealthRegistry()
+
+
+def equivalent_model(model: str) -> Optional[str]:
+    """The configured same-tier alternative for `model` (either direction), if any."""
+    pairs = (
+        (settings.ROUTER_DEFAULT_MODEL, settings.ROUTER_DEFAULT_FALLBACK_MODEL),
+        (settings.ROUTER_MID_MODEL, settings.ROUTER_MID_FALLBACK_MODEL),
+        (settings.ROUTER_HIGH_MODEL, settings.ROUTER_HIGH_FALLBACK_MODEL),
+    )
+    for primary, fallback in pairs:
+        if not fallback:
+            continue
+        if model == primary:
+            return fallback
+        if model == fallback:
+            return primary
+    return None
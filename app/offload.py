@@ -0,0 +1,196 @@
+"""
+Per-layer executor policy for the deterministic (CPU-bound) layers.
+
+Regex extraction, the injection scan and rule-based resources are fast on a
+triage note but take milliseconds on long pasted notes, and running them on the
+event loop stalls every other request on the worker. Each layer has a policy:
+
+    inline   run on the event loop (cheapest for short texts)
+    thread   run in the shared thread pool (releases the loop; the GIL still serializes pure-Python work)
+    process  run in a process pool (true parallelism; pays pickling and IPC)
+    auto     pick by input size: OFFLOAD_THREAD_MIN_CHARS / OFFLOAD_PROCESS_MIN_CHARS
+
+Pools are sized per uvicorn worker (WEB_CONCURRENCY) so all workers on a host
+together use about one process per core. EventLoopLagMonitor measures how late
+the loop wakes a periodic timer, the direct symptom of inline work blocking it.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import multiprocessing
+import os
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import metrics
+from config import settings
+
+
+EXECUTOR_MODES = ("inline", "thread", "process", "auto")
+
+# Layers whose work may run in another process: a bound method of a class with a
+# no-argument constructor and no per-process state the parent relies on. The
+# router is excluded because its routing reads this process's model health stats.
+PROCESS_SAFE_LAYERS = frozenset({"extraction", "malicious", "resources"})
+
+offload_calls = metrics.registry.counter(
+    "triage_offload_calls", "Deterministic layer calls by executor mode", ("layer", "mode")
+)
+event_loop_lag = metrics.registry.histogram(
+    "triage_event_loop_lag_seconds",
+    "How late the event loop ran a periodic timer (time other work held the loop)",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+def thread_pool_size() -> int:
+    if settings.OFFLOAD_THREAD_WORKERS > 0:
+        return settings.OFFLOAD_THREAD_WORKERS
+    # The ThreadPoolExecutor default, shared out between the uvicorn workers on the host
+    return max(2, min(32, (os.cpu_count() or 1) + 4) // max(1, settings.WEB_CONCURRENCY))
+
+
+def process_pool_size() -> int:
+    if settings.OFFLOAD_PROCESS_WORKERS > 0:
+        return settings.OFFLOAD_PROCESS_WORKERS
+    return max(1, (os.cpu_count() or 1) // max(1, settings.WEB_CONCURRENCY))
+
+
+_worker_instances: Dict[Tuple[str, str], Any] = {}
+
+
+def _call_in_worker(module: str, qualname: str, method: str, args: Tuple[Any, ...]) -> Any:
+    """Process-pool entry point: one detector instance per class per worker process."""
+    instance = _worker_instances.get((module, qualname))
+    if instance is None:
+        import importlib
+
+        owner: Any = importlib.import_module(module)
+        for part in qualname.split("."):
+            owner = getattr(owner, part)
+        instance = _worker_instances[(module, qualname)] = owner()
+    return getattr(instance, method)(*args)
+
+
+class LayerExecutor:
+    def __init__(self, policies: Optional[Dict[str, str]] = None) -> None:
+        self.policies = dict(settings.OFFLOAD_LAYER_POLICY if policies is None else policies)
+        self._threads: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._processes: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+    def mode(self, layer: str, size: int) -> str:
+        """Executor mode for `layer` on an input of `size` characters."""
+        policy = self.policies.get(layer, "inline")
+        if policy == "auto":
+            if settings.OFFLOAD_PROCESS_MIN_CHARS and size >= settings.OFFLOAD_PROCESS_MIN_CHARS:
+                policy = "process"
+            elif size >= settings.OFFLOAD_THREAD_MIN_CHARS:
+                policy = "thread"
+            else:
+                policy = "inline"
+        if policy == "process" and layer not in PROCESS_SAFE_LAYERS:
+            policy = "thread"
+        return policy
+
+    def _thread_pool(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = concurrent.futures.ThreadPoolExecutor(
+                max_workers=thread_pool_size(), thread_name_prefix="layer"
+            )
+        return self._threads
+
+    def _process_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._processes is None:
+            # spawn: forking a process that runs an event loop and client threads is unsafe
+            self._processes = concurrent.futures.ProcessPoolExecutor(
+                max_workers=process_pool_size(), mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._processes
+
+    async def run(self, layer: str, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run `func(*args)` under `layer`'s policy. The input size is the length of
+        the first argument (the case text). Process mode needs `func` to be a bound
+        method of a class constructible without arguments; otherwise it uses a thread.
+        """
+        size = len(args[0]) if args and isinstance(args[0], str) else 0
+        mode = self.mode(layer, size)
+        owner = getattr(func, "__self__", None)
+        if mode == "process" and owner is None:
+            mode = "thread"
+        offload_calls.inc(layer, mode)
+
+        if mode == "inline":
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        if mode == "thread":
+            return await loop.run_in_executor(self._thread_pool(), functools.partial(func, *args))
+        cls = type(owner)
+        call = functools.partial(_call_in_worker, cls.__module__, cls.__qualname__, func.__name__, args)
+        return await loop.run_in_executor(self._process_pool(), call)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "policies": self.policies,
+            "thread_min_chars": settings.OFFLOAD_THREAD_MIN_CHARS,
+            "process_min_chars": settings.OFFLOAD_PROCESS_MIN_CHARS,
+            "thread_workers": thread_pool_size(),
+            "process_workers": process_pool_size(),
+            "process_pool_started": self._processes is not None,
+        }
+
+    def shutdown(self) -> None:
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+            self._threads = None
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+            self._processes = None
+
+
+class EventLoopLagMonitor:
+    """Sleeps `interval` seconds in a loop and records how much later than requested it woke."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.last_lag_s = 0.0
+        self.max_lag_s = 0.0
+        self.samples = 0
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, time.perf_counter() - expected))
+
+    def record(self, lag_s: float) -> None:
+        self.last_lag_s = lag_s
+        self.max_lag_s = max(self.max_lag_s, lag_s)
+        self.samples += 1
+        event_loop_lag.observe(lag_s)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_s": self.interval,
+            "samples": self.samples,
+            "last_lag_ms": round(self.last_lag_s * 1000, 3),
+            "max_lag_ms": round(self.max_lag_s * 1000, 3),
+        }
+
+
+layer_executor = LayerExecutor()
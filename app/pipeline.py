@@ -0,0 +1,224 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+LayerFunc = Callable[[Dict[str, Any]], Awaitable[Any]]
+LayerCallback = Callable[[str, Any], Awaitable[None]]
+
+
+class PipelineError(Exception):
+    """Raised when a layer fails (or times out) and has no fallback."""
+
+    def __init__(self, layer: str, cause: BaseException) -> None:
+        super().__init__(f"Layer '{layer}' failed: {cause!r}")
+        self.layer = layer
+        self.cause = cause
+
+
+@dataclass
+class PipelineLayer:
+    """A single node in the layer dependency graph.
+
+    `run` receives the shared results dict (pipeline inputs plus the outputs of
+    every finished layer, keyed by layer name) and returns this layer's output.
+    """
+
+    name: str
+    run: LayerFunc
+    depends_on: Tuple[str, ...] = ()
+    timeout: Optional[float] = None
+    fallback: Optional[Callable[[BaseException], Any]] = None
+
+
+@dataclass
+class PipelineRun:
+    results: Dict[str, Any]
+    timings: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    total_ms: float = 0.0
+
+
+class PipelineExecutor:
+    """Run layers as soon as their dependencies finish.
+
+    Independent layers run concurrently. Each layer may carry its own timeout;
+    on error or timeout the layer's fallback value is used if it has one,
+    otherwise every still-running layer is cancelled and PipelineError is raised.
+    """
+
+    def __init__(self, layers: Sequence[PipelineLayer], default_timeout: Optional[float] = None) -> None:
+        self.layers = {layer.name: layer for layer in layers}
+        if len(self.layers) != len(layers):
+            raise ValueError("Duplicate layer names in pipeline")
+        self.default_timeout = default_timeout
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order: List[str] = []
+        state: Dict[str, int] = {}
+
+        def visit(name: str, path: Tuple[str, ...]) -> None:
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"Dependency cycle in pipeline: {' -> '.join(path + (name,))}")
+            state[name] = 1
+            for dep in self.layers[name].depends_on:
+                if dep not in self.layers:
+                    raise ValueError(f"Layer '{name}' depends on unknown layer '{dep}'")
+                visit(dep, path + (name,))
+            state[name] = 2
+            order.append(name)
+
+        for name in self.layers:
+            visit(name, ())
+        return order
+
+    async def _run_layer(
+        self,
+        layer: PipelineLayer,
+        tasks: Dict[str, "asyncio.Task[Any]"],
+        results: Dict[str, Any],
+        timings: Dict[str, Dict[str, Any]],
+        started: float,
+        on_complete: Optional[LayerCallback],
+    ) -> Any:
+        if layer.depends_on:
+            await asyncio.gather(*(tasks[dep] for dep in layer.depends_on))
+
+        start = time.perf_counter()
+        timeout = layer.timeout if layer.timeout is not None else self.default_timeout
+        status = "ok"
+        try:
+            value = await asyncio.wait_for(layer.run(results), timeout)
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        except Exception as exc:
+            status = "timeout" if isinstance(exc, asyncio.TimeoutError) else "error"
+            if layer.fallback is None:
+                raise PipelineError(layer.name, exc) from exc
+            value = layer.fallback(exc)
+        finally:
+            end = time.perf_counter()
+            timings[layer.name] = {
+                "start_ms": round((start - started) * 1000, 3),
+                "duration_ms": round((end - start) * 1000, 3),
+                "status": status,
+            }
+
+        results[layer.name] = value
+        if on_complete is not None:
+            await on_complete(layer.name, value)
+        return value
+
+    async def run(
+        self,
+        inputs: Optional[Dict[str, Any]] = None,
+        on_complete: Optional[LayerCallback] = None,
+    ) -> PipelineRun:
+        """Execute the graph; `on_complete(name, value)` is awaited as each layer finishes."""
+        results: Dict[str, Any] = dict(inputs or {})
+        timings: Dict[str, Dict[str, Any]] = {}
+        tasks: Dict[str, "asyncio.Task[Any]"] = {}
+        started = time.perf_counter()
+
+        for name in self.order:
+            tasks[name] = asyncio.create_task(
+                self._run_layer(self.layers[name], tasks, results, timings, started, on_complete)
+            )
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return PipelineRun(
+            results=results,
+            timings=timings,
+            total_ms=round((time.perf_counter() - started) * 1000, 3),
+        )
+
+
+@dataclass
+class SpeculationStats:
+    """Process-wide counters for speculative work (see Speculation)."""
+
+    launched: int = 0
+    hits: int = 0
+    wasted: int = 0
+    skipped: int = 0
+    wasted_ms: float = 0.0
+    wasted_cost_usd: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "launched": self.launched,
+            "hits": self.hits,
+            "wasted": self.wasted,
+            "skipped": self.skipped,
+            "waste_rate": round(self.wasted / self.launched, 4) if self.launched else 0.0,
+            "wasted_ms": round(self.wasted_ms, 3),
+            "wasted_cost_usd": self.wasted_cost_usd,
+        }
+
+
+speculation_stats = SpeculationStats()
+
+
+class Speculation:
+    """Start work on predicted inputs before the real inputs are known.
+
+    `start(key, factory)` launches the work for a predicted key. `resolve(key, factory)`
+    returns the speculative result when the real key matches; otherwise the speculative
+    task is cancelled (or its finished result discarded) and `factory` runs again.
+    """
+
+    def __init__(self, stats: Optional[SpeculationStats] = None) -> None:
+        self.stats = stats if stats is not None else speculation_stats
+        self.key: Optional[Hashable] = None
+        self.task: Optional["asyncio.Future[Any]"] = None
+        self.outcome = "not_started"
+        self.discarded: Any = None
+        self._started = 0.0
+
+    def start(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> None:
+        if self.task is not None:
+            raise RuntimeError("Speculation already started")
+        self.key = key
+        self._started = time.perf_counter()
+        self.task = asyncio.ensure_future(factory())
+        self.outcome = "pending"
+        self.stats.launched += 1
+
+    async def resolve(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        if self.task is None:
+            self.outcome = "skipped"
+            self.stats.skipped += 1
+            return await factory()
+        if key == self.key:
+            self.outcome = "hit"
+            self.stats.hits += 1
+            return await self.task
+
+        self.outcome = "wasted"
+        self.stats.wasted += 1
+        self.stats.wasted_ms += (time.perf_counter() - self._started) * 1000
+        if self.task.done() and not self.task.cancelled() and self.task.exception() is None:
+            self.discarded = self.task.result()
+        else:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        return await factory()
+
+    def cancel(self) -> None:
+        """Drop unfinished speculative work (e.g. when the pipeline fails)."""
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+    def report(self) -> Dict[str, Any]:
+        return {"outcome": self.outcome, "predicted": self.key}
@@ -1,27 +1,53 @@
 """
 Admin configuration for RAG layers and system settings.
 Allows runtime enable/disable of RAG for each layer.
+
+One RAGConfigManager per config file is shared by the whole process (see
+get_rag_config_manager). Configs are immutable snapshots: edits build a new
+snapshot, write it atomically and swap the reference. Other processes (uvicorn
+workers) pick the change up from the file's signature on their next read.
 """
 
-from typing import Dict, Any, List
-from dataclasses import dataclass, asdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import MappingProxyType
+from typing import Dict, Any, Iterator, List, Mapping, Optional, Tuple
+from dataclasses import dataclass, asdict, replace
 import json
 import os
+import tempfile
+import threading
+import time
+
+from config import settings
 
 
-@dataclass
+@dataclass(frozen=True)
 class RAGLayerConfig:
     """Configuration for a single RAG layer"""
     layer_name: str
     enabled: bool
-    knowledge_sources: List[str]  # e.g., ["esi_handbook", "acs_protocols"]
+    knowledge_sources: Tuple[str, ...]  # e.g., ("esi_handbook", "acs_protocols")
     confidence_threshold: float = 0.7
     max_results: int = 3
     use_vector_db: bool = False
     description: str = ""
+    max_context_tokens: int = 600  # evidence token budget for this layer's prompt
+    evidence_format: str = "bullets"  # "bullets" or "json" (minified)
+
 
+LAYER_FIELDS = {
+    1: "layer_1_sanity_check",
+    2: "layer_2_extraction",
+    3: "layer_3_red_flag_detection",
+    4: "layer_4_vital_signal_assessment",
+    5: "layer_5_resource_inference",
+    6: "layer_6_handbook_verification",
+    7: "layer_7_final_decision",
+}
 
-@dataclass
+
+@dataclass(frozen=True)
 class RAGSystemConfig:
     """Full RAG system configuration"""
     layer_1_sanity_check: RAGLayerConfig
@@ -32,15 +58,107 @@ class RAGSystemConfig:
     layer_6_handbook_verification: RAGLayerConfig
     layer_7_final_decision: RAGLayerConfig
     
-    global_settings: Dict[str, Any]  # Budget, timeouts, etc
+    global_settings: Mapping[str, Any]  # Budget, timeouts, etc
+
+    def layer(self, layer_number: int) -> Optional[RAGLayerConfig]:
+        field_name = LAYER_FIELDS.get(layer_number)
+        return getattr(self, field_name) if field_name else None
+
+    def with_layer(self, layer_number: int, **changes: Any) -> "RAGSystemConfig":
+        field_name = LAYER_FIELDS[layer_number]
+        return replace(self, **{field_name: replace(getattr(self, field_name), **changes)})
+
+    def with_global_settings(self, **changes: Any) -> "RAGSystemConfig":
+        return replace(self, global_settings=MappingProxyType({**self.global_settings, **changes}))
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        for field_name in LAYER_FIELDS.values():
+            layer = asdict(getattr(self, field_name))
+            layer["knowledge_sources"] = list(layer["knowledge_sources"])
+            data[field_name] = layer
+        data["global_settings"] = dict(self.global_settings)
+        return data
 
 
 class RAGConfigManager:
-    """Manage RAG configuration with file persistence"""
+    """Manage RAG configuration with file persistence and hot reload"""
     
-    def __init__(self, config_path: str = "/app/config/rag_config.json"):
-        self.config_path = config_path
-        self.config = self._load_config()
+    def __init__(self, config_path: Optional[str] = None, reload_interval: Optional[float] = None):
+        self.config_path = config_path or settings.RAG_CONFIG_PATH
+        self.reload_interval = (
+            settings.RAG_CONFIG_RELOAD_INTERVAL_SECONDS if reload_interval is None else reload_interval
+        )
+        self._lock = threading.Lock()
+        self._pinned: ContextVar[Optional[RAGSystemConfig]] = ContextVar(f"rag_config_{id(self)}", default=None)
+        self._signature = self._file_signature()
+        self._config = self._load_config()
+        self._next_check = time.monotonic() + self.reload_interval
+        self.version = 1
+
+    @property
+    def config(self) -> RAGSystemConfig:
+        return self.snapshot()
+
+    def snapshot(self) -> RAGSystemConfig:
+        """
+        Current immutable config. Inside `pinned()` this is the snapshot taken on entry;
+        otherwise the file is re-checked at most once per reload interval.
+        """
+        pinned = self._pinned.get()
+        if pinned is not None:
+            return pinned
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.reload_interval
+            self.reload_if_changed()
+        return self._config
+
+    @contextmanager
+    def pinned(self) -> Iterator[RAGSystemConfig]:
+        """Serve one snapshot for the duration of a request, including tasks it spawns."""
+        token = self._pinned.set(self.snapshot())
+        try:
+            yield self._pinned.get()
+        finally:
+            self._pinned.reset(token)
+
+    def _file_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        # Atomic replace changes the inode, so same-tick rewrites are still detected
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def reload_if_changed(self) -> bool:
+        signature = self._file_signature()
+        if signature == self._signature:
+            return False
+        with self._lock:
+            if signature == self._signature:
+                return False
+            try:
+                config = self._load_config()
+            except (OSError, ValueError) as e:
+                print(f"Error reloading RAG config, keeping previous version: {e}")
+                self._signature = signature
+                return False
+            self._signature = signature
+            self._swap(config)
+        return True
+
+    def _swap(self, config: RAGSystemConfig) -> None:
+        self._config = config
+        self.version += 1
+
+    def _commit(self, config: RAGSystemConfig) -> bool:
+        with self._lock:
+            if not self._write_config(config):
+                return False
+            self._signature = self._file_signature()
+            self._swap(config)
+        return True
     
     def _load_config(self) -> RAGSystemConfig:
         """Load configuration from file or create defaults"""
@@ -57,13 +175,13 @@ class RAGConfigManager:
             layer_1_sanity_check=RAGLayerConfig(
                 layer_name="Sanity Check",
                 enabled=False,  # No RAG needed
-                knowledge_sources=[],
+                knowledge_sources=(),
                 description="Input validation - no RAG needed"
             ),
             layer_2_extraction=RAGLayerConfig(
                 layer_name="Extraction",
                 enabled=True,
-                knowledge_sources=["medical_ontology"],
+                knowledge_sources=("medical_ontology",),
                 confidence_threshold=0.8,
                 max_results=1,
                 description="Normalize medical terminology and extract structured data"
@@ -71,15 +189,16 @@ class RAGConfigManager:
             layer_3_red_flag_detection=RAGLayerConfig(
                 layer_name="Red Flag Detection",
                 enabled=True,
-                knowledge_sources=["esi_handbook", "acs_protocols", "sepsis_criteria", "differential_diagnosis"],
+                knowledge_sources=("esi_handbook", "acs_protocols", "sepsis_criteria", "differential_diagnosis"),
                 confidence_threshold=0.85,
                 max_results=5,
-                description="Detect ESI-2 criteria using handbook and clinical guidelines"
+                description="Detect ESI-2 criteria using handbook and clinical guidelines",
+                max_context_tokens=800,
             ),
             layer_4_vital_signal_assessment=RAGLayerConfig(
                 layer_name="Vital Signal Assessment",
                 enabled=True,
-                knowledge_sources=["vital_ranges"],
+                knowledge_sources=("vital_ranges",),
                 confidence_threshold=0.9,
                 max_results=1,
                 description="Age-aware vital sign interpretation using clinical norms"
@@ -87,7 +206,7 @@ class RAGConfigManager:
             layer_5_resource_inference=RAGLayerConfig(
                 layer_name="Resource Inference",
                 enabled=True,
-                knowledge_sources=["esi_handbook", "acs_protocols", "lab_indications"],
+                knowledge_sources=("esi_handbook", "acs_protocols", "lab_indications"),
                 confidence_threshold=0.8,
                 max_results=10,
                 description="Infer required resources using clinical protocols"
@@ -95,7 +214,7 @@ class RAGConfigManager:
             layer_6_handbook_verification=RAGLayerConfig(
                 layer_name="Handbook Verification",
                 enabled=True,
-                knowledge_sources=["esi_handbook"],
+                knowledge_sources=("esi_handbook",),
                 confidence_threshold=0.85,
                 max_results=5,
                 description="Verify ESI decision against official handbook"
@@ -103,12 +222,13 @@ class RAGConfigManager:
             layer_7_final_decision=RAGLayerConfig(
                 layer_name="Final Decision",
                 enabled=True,
-                knowledge_sources=["esi_handbook"],
+                knowledge_sources=("esi_handbook",),
                 confidence_threshold=0.75,
                 max_results=2,
-                description="Format final ESI decision with handbook reasoning"
+                description="Format final ESI decision with handbook reasoning",
+                max_context_tokens=400,
             ),
-            global_settings={
+            global_settings=MappingProxyType({
                 "enable_rag_globally": True,
                 "log_rag_usage": True,
                 "track_rag_accuracy": True,
@@ -116,7 +236,7 @@ class RAGConfigManager:
                 "vector_db_enabled": False,
                 "cost_tracking_enabled": True,
                 "debug_mode": False
-            }
+            })
         )
     
     def _parse_config(self, data: Dict) -> RAGSystemConfig:
@@ -125,11 +245,13 @@ class RAGConfigManager:
             return RAGLayerConfig(
                 layer_name=layer_data.get("layer_name"),
                 enabled=layer_data.get("enabled", True),
-                knowledge_sources=layer_data.get("knowledge_sources", []),
+                knowledge_sources=tuple(layer_data.get("knowledge_sources", [])),
                 confidence_threshold=layer_data.get("confidence_threshold", 0.7),
                 max_results=layer_data.get("max_results", 3),
                 use_vector_db=layer_data.get("use_vector_db", False),
-                description=layer_data.get("description", "")
+                description=layer_data.get("description", ""),
+                max_context_tokens=layer_data.get("max_context_tokens", 600),
+                evidence_format=layer_data.get("evidence_format", "bullets"),
             )
         
         return RAGSystemConfig(
@@ -140,164 +262,153 @@ class RAGConfigManager:
             layer_5_resource_inference=parse_layer(data.get("layer_5_resource_inference", {})),
             layer_6_handbook_verification=parse_layer(data.get("layer_6_handbook_verification", {})),
             layer_7_final_decision=parse_layer(data.get("layer_7_final_decision", {})),
-            global_settings=data.get("global_settings", {})
+            global_settings=MappingProxyType(dict(data.get("global_settings", {})))
         )
     
-    def save_config(self) -> bool:
-        """Save current configuration to file"""
+    def _write_config(self, config: RAGSystemConfig) -> bool:
+        """Write via temp file + rename so other workers never read a partial file"""
         try:
-            config_dict = {
-                "layer_1_sanity_check": asdict(self.config.layer_1_sanity_check),
-                "layer_2_extraction": asdict(self.config.layer_2_extraction),
-                "layer_3_red_flag_detection": asdict(self.config.layer_3_red_flag_detection),
-                "layer_4_vital_signal_assessment": asdict(self.config.layer_4_vital_signal_assessment),
-                "layer_5_resource_inference": asdict(self.config.layer_5_resource_inference),
-                "layer_6_handbook_verification": asdict(self.config.layer_6_handbook_verification),
-                "layer_7_final_decision": asdict(self.config.layer_7_final_decision),
-                "global_settings": self.config.global_settings
-            }
-            
-            os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
-            with open(self.config_path, 'w') as f:
-                json.dump(config_dict, f, indent=2)
+            directory = os.path.dirname(self.config_path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".rag_config.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(config.to_dict(), f, indent=2)
+                os.replace(tmp_path, self.config_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
             return True
         except Exception as e:
             print(f"Error saving config: {e}")
             return False
+
+    def save_config(self) -> bool:
+        """Save current configuration to file"""
+        return self._commit(self._config)
     
     def enable_layer_rag(self, layer_number: int) -> bool:
         """Enable RAG for a specific layer"""
-        if not self.config.global_settings.get("enable_rag_globally"):
+        config = self.snapshot()
+        if not config.global_settings.get("enable_rag_globally"):
             return False
-        
-        layer_attr = f"layer_{layer_number}_*"
-        layers = {
-            1: self.config.layer_1_sanity_check,
-            2: self.config.layer_2_extraction,
-            3: self.config.layer_3_red_flag_detection,
-            4: self.config.layer_4_vital_signal_assessment,
-            5: self.config.layer_5_resource_inference,
-            6: self.config.layer_6_handbook_verification,
-            7: self.config.layer_7_final_decision,
-        }
-        
-        if layer_number in layers:
-            layers[layer_number].enabled = True
-            return self.save_config()
-        return False
+        if config.layer(layer_number) is None:
+            return False
+        return self._commit(config.with_layer(layer_number, enabled=True))
     
     def disable_layer_rag(self, layer_number: int) -> bool:
         """Disable RAG for a specific layer"""
-        layers = {
-            1: self.config.layer_1_sanity_check,
-            2: self.config.layer_2_extraction,
-            3: self.config.layer_3_red_flag_detection,
-            4: self.config.layer_4_vital_signal_assessment,
-            5: self.config.layer_5_resource_inference,
-            6: self.config.layer_6_handbook_verification,
-            7: self.config.layer_7_final_decision,
-        }
-        
-        if layer_number in layers:
-            layers[layer_number].enabled = False
-            return self.save_config()
-        return False
+        config = self.snapshot()
+        if config.layer(layer_number) is None:
+            return False
+        return self._commit(config.with_layer(layer_number, enabled=False))
     
-    def get_layer_config(self, layer_number: int) -> RAGLayerConfig:
+    def get_layer_config(self, layer_number: int) -> Optional[RAGLayerConfig]:
         """Get configuration for a specific layer"""
-        layers = {
-            1: self.config.layer_1_sanity_check,
-            2: self.config.layer_2_extraction,
-            3: self.config.layer_3_red_flag_detection,
-            4: self.config.layer_4_vital_signal_assessment,
-            5: self.config.layer_5_resource_inference,
-            6: self.config.layer_6_handbook_verification,
-            7: self.config.layer_7_final_decision,
-        }
-        return layers.get(layer_number)
+        return self.snapshot().layer(layer_number)
     
     def update_knowledge_sources(self, layer_number: int, sources: List[str]) -> bool:
         """Update knowledge sources for a layer"""
-        layer = self.get_layer_config(layer_number)
-        if layer:
-            layer.knowledge_sources = sources
-            return self.save_config()
-        return False
+        config = self.snapshot()
+        if config.layer(layer_number) is None:
+            return False
+        return self._commit(config.with_layer(layer_number, knowledge_sources=tuple(sources)))
     
     def set_confidence_threshold(self, layer_number: int, threshold: float) -> bool:
         """Update confidence threshold for a layer"""
         if 0.0 <= threshold <= 1.0:
-            layer = self.get_layer_config(layer_number)
-            if layer:
-                layer.confidence_threshold = threshold
-                return self.save_config()
+            config = self.snapshot()
+            if config.layer(layer_number) is not None:
+                return self._commit(config.with_layer(layer_number, confidence_threshold=threshold))
         return False
     
     def toggle_global_rag(self, enabled: bool) -> bool:
         """Enable/disable RAG globally"""
-        self.config.global_settings["enable_rag_globally"] = enabled
-        return self.save_config()
+        return self._commit(self.snapshot().with_global_settings(enable_rag_globally=enabled))
+
+    def reset_to_defaults(self) -> bool:
+        """Replace the whole configuration with the built-in defaults"""
+        return self._commit(self._create_default_config())
     
     def get_config_summary(self) -> Dict[str, Any]:
         """Get summary of current configuration"""
+        config = self.snapshot()
         return {
-            "global_rag_enabled": self.config.global_settings.get("enable_rag_globally"),
+            "config_version": self.version,
+            "global_rag_enabled": config.global_settings.get("enable_rag_globally"),
             "layers": {
                 "layer_1": {
                     "name": "Sanity Check",
-                    "rag_enabled": self.config.layer_1_sanity_check.enabled,
-                    "knowledge_sources": self.config.layer_1_sanity_check.knowledge_sources,
-                    "confidence_threshold": self.config.layer_1_sanity_check.confidence_threshold,
-                    "max_results": self.config.layer_1_sanity_check.max_results,
-                    "description": self.config.layer_1_sanity_check.description,
+                    "rag_enabled": config.layer_1_sanity_check.enabled,
+                    "knowledge_sources": config.layer_1_sanity_check.knowledge_sources,
+                    "confidence_threshold": config.layer_1_sanity_check.confidence_threshold,
+                    "max_results": config.layer_1_sanity_check.max_results,
+                    "description": config.layer_1_sanity_check.description,
                 },
                 "layer_2": {
                     "name": "Extraction",
-                    "rag_enabled": self.config.layer_2_extraction.enabled,
-                    "knowledge_sources": self.config.layer_2_extraction.knowledge_sources,
-                    "confidence_threshold": self.config.layer_2_extraction.confidence_threshold,
-                    "max_results": self.config.layer_2_extraction.max_results,
-                    "description": self.config.layer_2_extraction.description,
+                    "rag_enabled": config.layer_2_extraction.enabled,
+                    "knowledge_sources": config.layer_2_extraction.knowledge_sources,
+                    "confidence_threshold": config.layer_2_extraction.confidence_threshold,
+                    "max_results": config.layer_2_extraction.max_results,
+                    "description": config.layer_2_extraction.description,
                 },
                 "layer_3": {
                     "name": "Red Flag Detection",
-                    "rag_enabled": self.config.layer_3_red_flag_detection.enabled,
-                    "knowledge_sources": self.config.layer_3_red_flag_detection.knowledge_sources,
-                    "confidence_threshold": self.config.layer_3_red_flag_detection.confidence_threshold,
-                    "max_results": self.config.layer_3_red_flag_detection.max_results,
-                    "description": self.config.layer_3_red_flag_detection.description,
+                    "rag_enabled": config.layer_3_red_flag_detection.enabled,
+                    "knowledge_sources": config.layer_3_red_flag_detection.knowledge_sources,
+                    "confidence_threshold": config.layer_3_red_flag_detection.confidence_threshold,
+                    "max_results": config.layer_3_red_flag_detection.max_results,
+                    "description": config.layer_3_red_flag_detection.description,
                 },
                 "layer_4": {
                     "name": "Vital Signal Assessment",
-                    "rag_enabled": self.config.layer_4_vital_signal_assessment.enabled,
-                    "knowledge_sources": self.config.layer_4_vital_signal_assessment.knowledge_sources,
-                    "confidence_threshold": self.config.layer_4_vital_signal_assessment.confidence_threshold,
-                    "max_results": self.config.layer_4_vital_signal_assessment.max_results,
-                    "description": self.config.layer_4_vital_signal_assessment.description,
+                    "rag_enabled": config.layer_4_vital_signal_assessment.enabled,
+                    "knowledge_sources": config.layer_4_vital_signal_assessment.knowledge_sources,
+                    "confidence_threshold": config.layer_4_vital_signal_assessment.confidence_threshold,
+                    "max_results": config.layer_4_vital_signal_assessment.max_results,
+                    "description": config.layer_4_vital_signal_assessment.description,
                 },
                 "layer_5": {
                     "name": "Resource Inference",
-                    "rag_enabled": self.config.layer_5_resource_inference.enabled,
-                    "knowledge_sources": self.config.layer_5_resource_inference.knowledge_sources,
-                    "confidence_threshold": self.config.layer_5_resource_inference.confidence_threshold,
-                    "max_results": self.config.layer_5_resource_inference.max_results,
-                    "description": self.config.layer_5_resource_inference.description,
+                    "rag_enabled": config.layer_5_resource_inference.enabled,
+                    "knowledge_sources": config.layer_5_resource_inference.knowledge_sources,
+                    "confidence_threshold": config.layer_5_resource_inference.confidence_threshold,
+                    "max_results": config.layer_5_resource_inference.max_results,
+                    "description": config.layer_5_resource_inference.description,
                 },
                 "layer_6": {
                     "name": "Handbook Verification",
-                    "rag_enabled": self.config.layer_6_handbook_verification.enabled,
-                    "knowledge_sources": self.config.layer_6_handbook_verification.knowledge_sources,
-                    "confidence_threshold": self.config.layer_6_handbook_verification.confidence_threshold,
-                    "max_results": self.config.layer_6_handbook_verification.max_results,
-                    "description": self.config.layer_6_handbook_verification.description,
+                    "rag_enabled": config.layer_6_handbook_verification.enabled,
+                    "knowledge_sources": config.layer_6_handbook_verification.knowledge_sources,
+                    "confidence_threshold": config.layer_6_handbook_verification.confidence_threshold,
+                    "max_results": config.layer_6_handbook_verification.max_results,
+                    "description": config.layer_6_handbook_verification.description,
                 },
                 "layer_7": {
                     "name": "Final Decision",
-                    "rag_enabled": self.config.layer_7_final_decision.enabled,
-                    "knowledge_sources": self.config.layer_7_final_decision.knowledge_sources,
-                    "confidence_threshold": self.config.layer_7_final_decision.confidence_threshold,
-                    "max_results": self.config.layer_7_final_decision.max_results,
-                    "description": self.config.layer_7_final_decision.description,
+                    "rag_enabled": config.layer_7_final_decision.enabled,
+                    "knowledge_sources": config.layer_7_final_decision.knowledge_sources,
+                    "confidence_threshold": config.layer_7_final_decision.confidence_threshold,
+                    "max_results": config.layer_7_final_decision.max_results,
+                    "description": config.layer_7_final_decision.description,
                 },
             }
         }
+
+
+_managers: Dict[str, RAGConfigManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_rag_config_manager(config_path: Optional[str] = None) -> RAGConfigManager:
+    """Return the process-wide config service for `config_path` (defaults to settings.RAG_CONFIG_PATH)."""
+    path = os.path.abspath(config_path or settings.RAG_CONFIG_PATH)
+    manager = _managers.get(path)
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.get(path)
+            if manager is None:
+                manager = RAGConfigManager(path)
+                _managers[path] = manager
+    return manager
@@ -0,0 +1,242 @@
+"""
+Token-budgeted rendering of retrieval results for LLM prompts.
+
+KnowledgeBase.format_for_llm pretty-prints every result as indented JSON. The
+packer renders each result compactly (bullet text or minified JSON), ranks
+results across all retrievals and keeps as many as fit in the layer's token
+budget, reporting how many tokens that saved against the pretty-printed form.
+
+Knowledge documents are immutable, so structured retrievals always render the same
+way: EvidenceCache memoizes rendered blocks per document and packed evidence per
+(queries, token budget, format), and is warmed at startup.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import settings
+from llm_client import count_tokens
+from metrics import record_retrieval
+from rag.knowledge_base import KnowledgeBase, RetrievalResult, format_retrieval
+
+
+EVIDENCE_FORMATS = ("bullets", "json")
+# Internal bookkeeping fields that carry no clinical information
+_SKIP_FIELDS = {"id"}
+
+
+@dataclass
+class PackedEvidence:
+    text: str
+    tokens: int
+    baseline_tokens: int
+    included: int
+    dropped: int
+    # Collections that contributed at least one result
+    sources: List[str] = field(default_factory=list)
+    # Every retrieval that was packed, whether or not it fit
+    collections: List[str] = field(default_factory=list)
+    queries: List[str] = field(default_factory=list)
+    num_results: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.baseline_tokens - self.tokens)
+
+
+def _scalar(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)
+
+
+def _inline(value: Any) -> str:
+    if isinstance(value, dict):
+        return ", ".join(f"{key}: {_inline(item)}" for key, item in value.items() if item not in (None, "", [], {}))
+    if isinstance(value, (list, tuple)):
+        separator = " | " if any(isinstance(item, dict) for item in value) else ", "
+        return separator.join(_inline(item) for item in value)
+    return _scalar(value)
+
+
+def render_result(result: Dict[str, Any], fmt: str = "bullets") -> str:
+    """Render one retrieval result compactly."""
+    fields = {key: value for key, value in result.items() if key not in _SKIP_FIELDS and value not in (None, "", [], {})}
+    if fmt == "json":
+        return json.dumps(fields, separators=(",", ":"), ensure_ascii=False)
+    return "\n".join(f"- {key}: {_inline(value)}" for key, value in fields.items())
+
+
+Renderer = Callable[[Dict[str, Any], str], Tuple[str, int]]
+
+
+def _render_uncached(result: Dict[str, Any], fmt: str) -> Tuple[str, int]:
+    block = render_result(result, fmt)
+    return block, count_tokens(block)
+
+
+def pack_evidence(
+    retrievals: Sequence[RetrievalResult],
+    token_budget: int,
+    fmt: str = "bullets",
+    render: Renderer = _render_uncached,
+) -> PackedEvidence:
+    """
+    Keep the highest-value results that fit in `token_budget` tokens.
+
+    Results are taken rank by rank across retrievals (every source's best result
+    before any source's second), breaking ties by confidence, so one verbose
+    collection cannot crowd out the others.
+    """
+    if fmt not in EVIDENCE_FORMATS:
+        raise ValueError(f"Unknown evidence format: {fmt}")
+
+    candidates: List[Tuple[int, float, int, int]] = []
+    for r_index, retrieval in enumerate(retrievals):
+        for rank, score in enumerate(retrieval.confidence_scores[: len(retrieval.results)]):
+            candidates.append((rank, -score, r_index, rank))
+    candidates.sort()
+
+    headers = {i: f"[{retrieval.collection.upper()}: {retrieval.query}]" for i, retrieval in enumerate(retrievals)}
+    chosen: Dict[int, List[Tuple[int, str]]] = {}
+    used = 0
+    dropped = 0
+    for _, _, r_index, rank in candidates:
+        block, block_tokens = render(retrievals[r_index].results[rank], fmt)
+        cost = block_tokens + 1
+        if r_index not in chosen:
+            cost += count_tokens(headers[r_index]) + 1
+        if used + cost > token_budget:
+            dropped += 1
+            continue
+        used += cost
+        chosen.setdefault(r_index, []).append((rank, block))
+
+    sections = []
+    for r_index in sorted(chosen):
+        blocks = [block for _, block in sorted(chosen[r_index])]
+        sections.append("\n".join([headers[r_index], *blocks]))
+    text = "\n".join(sections)
+
+    return PackedEvidence(
+        text=text,
+        tokens=count_tokens(text),
+        baseline_tokens=count_tokens("\n".join(format_retrieval(item) for item in retrievals if item.results)),
+        included=len(candidates) - dropped,
+        dropped=dropped,
+        sources=[retrievals[i].collection for i in sorted(chosen)],
+        collections=[item.collection for item in retrievals],
+        queries=[item.query for item in retrievals],
+        num_results=sum(item.num_results for item in retrievals),
+    )
+
+
+# (KnowledgeBase method name, positional args, sorted keyword args)
+EvidenceQuery = Tuple[str, Tuple[Any, ...], Tuple[Tuple[str, Any], ...]]
+
+
+def evidence_query(method: str, *args: Any, **kwargs: Any) -> EvidenceQuery:
+    """Hashable description of one `KnowledgeBase.retrieve_*` call."""
+    return (method, args, tuple(sorted(kwargs.items())))
+
+
+class EvidenceCache:
+    """
+    Packed evidence keyed by (knowledge base, queries, token budget, format).
+
+    Queries with free text (`query_text`) depend on the case, so they are packed on
+    every call; their documents still reuse the per-document render memo.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None) -> None:
+        self.max_entries = max_entries if max_entries is not None else settings.EVIDENCE_CACHE_MAX_ENTRIES
+        self._packed: "OrderedDict[Tuple[Any, ...], PackedEvidence]" = OrderedDict()
+        # id(document) -> (document, block, tokens); holding the document keeps its id valid
+        self._blocks: Dict[Tuple[int, str], Tuple[Dict[str, Any], str, int]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _render(self, result: Dict[str, Any], fmt: str) -> Tuple[str, int]:
+        key = (id(result), fmt)
+        entry = self._blocks.get(key)
+        if entry is None or entry[0] is not result:
+            block, tokens = _render_uncached(result, fmt)
+            entry = (result, block, tokens)
+            with self._lock:
+                self._blocks[key] = entry
+        return entry[1], entry[2]
+
+    async def get(
+        self,
+        kb: KnowledgeBase,
+        queries: Sequence[EvidenceQuery],
+        token_budget: int,
+        fmt: str = "bullets",
+    ) -> PackedEvidence:
+        queries = tuple(queries)
+        cacheable = not any(dict(kwargs).get("query_text") for _, _, kwargs in queries)
+        key = (id(kb), queries, token_budget, fmt)
+        if cacheable:
+            packed = self._packed.get(key)
+            if packed is not None:
+                with self._lock:
+                    self.hits += 1
+                    if key in self._packed:
+                        self._packed.move_to_end(key)
+                return packed
+
+        retrievals = [await getattr(kb, method)(*args, **dict(kwargs)) for method, args, kwargs in queries]
+        for retrieval in retrievals:
+            record_retrieval(retrieval)
+        packed = pack_evidence(retrievals, token_budget, fmt, render=self._render)
+        if cacheable:
+            with self._lock:
+                self.misses += 1
+                self._packed[key] = packed
+                while len(self._packed) > self.max_entries:
+                    self._packed.popitem(last=False)
+        return packed
+
+    def warm_documents(self, kb: KnowledgeBase, formats: Iterable[str] = EVIDENCE_FORMATS) -> int:
+        """Render every knowledge document (ESI levels, age groups, complaints, ...) up front."""
+        rendered = 0
+        for fmt in formats:
+            for docs in kb.knowledge_docs.values():
+                for doc in docs:
+                    self._render(doc, fmt)
+                    rendered += 1
+        return rendered
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._packed),
+            "rendered_blocks": len(self._blocks),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._packed.clear()
+            self._blocks.clear()
+            self.hits = self.misses = 0
+
+
+_shared_cache: Optional[EvidenceCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_evidence_cache() -> EvidenceCache:
+    """Return the process-wide evidence cache shared by every detector."""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = EvidenceCache()
+    return _shared_cache
@@ -3,11 +3,19 @@ Knowledge base and RAG system for medical triage.
 Retrieves clinical evidence from vector DB to augment LLM reasoning.
 """
 
+import asyncio
 import json
 import os
-from typing import List, Dict, Any, Optional
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, List, Mapping, Optional, Tuple
 from dataclasses import dataclass
 
+from rag.search import InvertedIndex, flatten_text
+
 # For vector similarity (will integrate with Pinecone/Weaviate in production)
 try:
     import pinecone
@@ -15,6 +23,13 @@ try:
 except ImportError:
     PINECONE_AVAILABLE = False
 
+# Local in-process vector index (NumPy); used when Pinecone is not available
+try:
+    from rag.vector_index import build_knowledge_index
+    VECTOR_INDEX_AVAILABLE = True
+except ImportError:
+    VECTOR_INDEX_AVAILABLE = False
+
 
 @dataclass
 class RetrievalResult:
@@ -26,6 +41,19 @@ class RetrievalResult:
     confidence_scores: List[float]
 
 
+def format_retrieval(retrieval_result: RetrievalResult) -> str:
+    """Format retrieval results for LLM context: a markdown header and indented JSON per result"""
+    formatted = f"\n# Clinical Evidence: {retrieval_result.collection.upper()}\n"
+    formatted += f"**Query**: {retrieval_result.query}\n"
+    formatted += f"**Results**: {retrieval_result.num_results} documents found\n\n"
+
+    for i, result in enumerate(retrieval_result.results, 1):
+        formatted += f"## Result {i} (Confidence: {retrieval_result.confidence_scores[i-1]:.1%})\n"
+        formatted += json.dumps(result, indent=2) + "\n\n"
+
+    return formatted
+
+
 class KnowledgeBase:
     """
     Central RAG system for medical triage.
@@ -47,8 +75,94 @@ class KnowledgeBase:
         else:
             self.index = None
         
-        # Load knowledge documents
-        self.knowledge_docs = self._load_knowledge_documents()
+        # Load knowledge documents once; collections are immutable tuples
+        self.knowledge_docs: Mapping[str, Tuple[Dict, ...]] = MappingProxyType(
+            {name: tuple(docs) for name, docs in self._load_knowledge_documents().items()}
+        )
+        self._build_lookup_indexes()
+        self.search_index = InvertedIndex(self.knowledge_docs)
+
+        # Offline dense retrieval when a vector DB is requested but no hosted index exists
+        self.vector_index = None
+        if self.use_vector_db and self.index is None and VECTOR_INDEX_AVAILABLE:
+            self.vector_index = build_knowledge_index(
+                self.knowledge_docs,
+                flatten_text,
+                method=config.get("vector_index_method", "brute"),
+            )
+
+    @staticmethod
+    def _normalize_key(value: str) -> str:
+        """Lowercase and drop parenthetical qualifiers, e.g. 'Troponin (high-sensitivity)' -> 'troponin'"""
+        return re.sub(r"\s*\(.*?\)", "", value).strip().lower()
+
+    def _build_lookup_indexes(self) -> None:
+        """Precompute O(1) lookup tables for the structured retrieve_* queries"""
+        by_level: Dict[int, List[Dict]] = {}
+        for doc in self.knowledge_docs["esi_handbook"]:
+            if "level" in doc:
+                by_level.setdefault(doc["level"], []).append(doc)
+
+        by_age_group: Dict[str, List[Dict]] = {}
+        for doc in self.knowledge_docs["vital_ranges"]:
+            by_age_group.setdefault(doc.get("age_group", "").lower(), []).append(doc)
+
+        by_test: Dict[str, List[Dict]] = {}
+        for doc in self.knowledge_docs["lab_indications"]:
+            by_test.setdefault(self._normalize_key(doc.get("test", "")), []).append(doc)
+
+        by_complaint: Dict[str, List[Dict]] = {}
+        for doc in self.knowledge_docs["differential_diagnosis"]:
+            by_complaint.setdefault(doc.get("chief_complaint", "").lower(), []).append(doc)
+
+        def freeze(index: Dict[Any, List[Dict]]) -> Mapping[Any, Tuple[Dict, ...]]:
+            return MappingProxyType({key: tuple(docs) for key, docs in index.items()})
+
+        # Documents are held by the immutable collections, so object identity is a stable key
+        self._doc_keys: Dict[int, Tuple[str, int]] = {
+            id(doc): (collection, position)
+            for collection, docs in self.knowledge_docs.items()
+            for position, doc in enumerate(docs)
+        }
+
+        self.esi_by_level = freeze(by_level)
+        self.vitals_by_age_group = freeze(by_age_group)
+        self.labs_by_test = freeze(by_test)
+        self.differentials_by_complaint = freeze(by_complaint)
+
+    @staticmethod
+    def _lookup(index: Mapping[str, Tuple[Dict, ...]], key: str) -> List[Dict]:
+        """Exact key hit first; fall back to substring match over the (small) key set"""
+        hit = index.get(key)
+        if hit is not None:
+            return list(hit)
+        results: List[Dict] = []
+        for name, docs in index.items():
+            if key in name:
+                results.extend(docs)
+        return results
+        
+    def _select(
+        self,
+        collection: str,
+        results: List[Dict],
+        scores: List[float],
+        query: Optional[str],
+        top_k: Optional[int],
+    ) -> Tuple[List[Dict], List[float]]:
+        """
+        Apply free-text similarity ranking (local vector index only) and the top-k cut.
+        Structured matches are re-ranked by similarity; a structured miss stays empty
+        (use search() to query a collection by free text).
+        """
+        if query and results and self.vector_index is not None:
+            keys = [self._doc_keys[id(doc)] for doc in results]
+            hits = self.vector_index.search(query, top_k=len(results), group=collection, keys=keys)
+            results = [self.knowledge_docs[c][p] for c, p in (hit.key for hit in hits)]
+            scores = [round(max(hit.score, 0.0), 4) for hit in hits]
+        if top_k is not None:
+            results, scores = results[:top_k], scores[:top_k]
+        return results, scores
         
     def _load_knowledge_documents(self) -> Dict[str, List[Dict]]:
         """Load medical knowledge from embedded documents"""
@@ -365,27 +479,98 @@ class KnowledgeBase:
             }
         ]
     
-    async def retrieve_esi_criteria(self, esi_level: int, condition: Optional[str] = None) -> RetrievalResult:
+    async def retrieve_esi_criteria(
+        self,
+        esi_level: int,
+        condition: Optional[str] = None,
+        query_text: Optional[str] = None,
+        top_k: int = 3,
+    ) -> RetrievalResult:
         """Retrieve ESI criteria for a specific level and optional condition"""
         query = f"ESI-{esi_level} criteria{f' for {condition}' if condition else ''}"
         
-        results = [doc for doc in self.knowledge_docs["esi_handbook"]
-                  if doc.get("level") == esi_level or (condition and condition.lower() in str(doc).lower())]
+        level_docs = self.esi_by_level.get(esi_level, ())
+        if not condition:
+            results = list(level_docs)
+            scores = [1.0] * len(results)
+        else:
+            # Level matches are structural; condition relevance comes from BM25 (normalized to the top hit)
+            handbook = self.knowledge_docs["esi_handbook"]
+            hits = self.search_index.search(condition, collection="esi_handbook", mode="and")
+            top_score = hits[0].score if hits else 0.0
+            relevance = {
+                handbook[hit.position]["id"]: (hit.score / top_score if top_score else 0.0) for hit in hits
+            }
+            ranked: List[Tuple[float, Dict]] = [
+                (0.5 + 0.5 * relevance.pop(doc["id"], 0.0), doc) for doc in level_docs
+            ]
+            ranked.extend(
+                (relevance[handbook[hit.position]["id"]], handbook[hit.position])
+                for hit in hits
+                if handbook[hit.position]["id"] in relevance
+            )
+            ranked.sort(key=lambda item: -item[0])
+            results = [doc for _, doc in ranked]
+            scores = [round(score, 4) for score, _ in ranked]
+
+        num_results = len(results)
+        results, scores = self._select("esi_handbook", results, scores, query_text, top_k)
         
         return RetrievalResult(
             query=query,
             collection="esi_handbook",
-            results=results[:3],
-            num_results=len(results),
-            confidence_scores=[0.95] * len(results[:3])
+            results=results,
+            num_results=num_results,
+            confidence_scores=scores
+        )
+
+    async def search(
+        self,
+        query: str,
+        collection: Optional[str] = None,
+        mode: str = "or",
+        top_k: int = 3,
+    ) -> RetrievalResult:
+        """
+        Free-text search across collections.
+        Uses cosine similarity from the local vector index when enabled, BM25 otherwise.
+        num_results counts every match (positive similarity, or a BM25 hit) before the top-k cut.
+        """
+        if self.vector_index is not None:
+            hits = self.vector_index.search(query, top_k=len(self.vector_index.keys), group=collection)
+            hits = [hit for hit in hits if hit.score > 0]
+            selected = hits[:top_k]
+            return RetrievalResult(
+                query=query,
+                collection=collection or "all",
+                results=[self.knowledge_docs[c][p] for c, p in (hit.key for hit in selected)],
+                num_results=len(hits),
+                confidence_scores=[round(hit.score, 4) for hit in selected]
+            )
+
+        hits = self.search_index.search(query, collection=collection, mode=mode)
+        top_score = hits[0].score if hits else 0.0
+        selected = hits[:top_k]
+        return RetrievalResult(
+            query=query,
+            collection=collection or "all",
+            results=[self.knowledge_docs[hit.collection][hit.position] for hit in selected],
+            num_results=len(hits),
+            confidence_scores=[round(hit.score / top_score, 4) if top_score else 0.0 for hit in selected]
         )
     
-    async def retrieve_vital_norms(self, age: int, population: str = "general") -> RetrievalResult:
+    async def retrieve_vital_norms(
+        self,
+        age: int,
+        population: str = "general",
+        top_k: Optional[int] = None,
+    ) -> RetrievalResult:
         """Retrieve age-specific vital sign normal ranges"""
         age_group = self._get_age_group(age, population)
         
-        results = [doc for doc in self.knowledge_docs["vital_ranges"]
-                  if age_group.lower() in doc.get("age_group", "").lower()]
+        results = self._lookup(self.vitals_by_age_group, age_group.lower())
+        num_results = len(results)
+        results, scores = self._select("vital_ranges", results, [0.98] * num_results, None, top_k)
         
         query = f"Normal vital signs for {age_group}"
         
@@ -393,60 +578,88 @@ class KnowledgeBase:
             query=query,
             collection="vital_ranges",
             results=results,
-            num_results=len(results),
-            confidence_scores=[0.98] * len(results)
+            num_results=num_results,
+            confidence_scores=scores
         )
     
-    async def retrieve_lab_indications(self, test_name: str) -> RetrievalResult:
+    async def retrieve_lab_indications(
+        self,
+        test_name: str,
+        query_text: Optional[str] = None,
+        top_k: Optional[int] = None,
+    ) -> RetrievalResult:
         """Retrieve lab test indications and interpretation"""
-        results = [doc for doc in self.knowledge_docs["lab_indications"]
-                  if test_name.lower() in doc.get("test", "").lower()]
+        results = self._lookup(self.labs_by_test, self._normalize_key(test_name))
+        num_results = len(results)
+        results, scores = self._select("lab_indications", results, [0.92] * num_results, query_text, top_k)
         
         return RetrievalResult(
             query=f"Indications and interpretation for {test_name}",
             collection="lab_indications",
             results=results,
-            num_results=len(results),
-            confidence_scores=[0.92] * len(results)
+            num_results=num_results,
+            confidence_scores=scores
         )
     
-    async def retrieve_differential_diagnoses(self, chief_complaint: str) -> RetrievalResult:
+    async def retrieve_differential_diagnoses(
+        self,
+        chief_complaint: str,
+        query_text: Optional[str] = None,
+        top_k: Optional[int] = None,
+    ) -> RetrievalResult:
         """Retrieve differential diagnosis list for chief complaint"""
-        results = [doc for doc in self.knowledge_docs["differential_diagnosis"]
-                  if chief_complaint.lower() in doc.get("chief_complaint", "").lower()]
+        results = self._lookup(self.differentials_by_complaint, chief_complaint.lower())
+        num_results = len(results)
+        results, scores = self._select(
+            "differential_diagnosis", results, [0.88] * num_results, query_text, top_k
+        )
         
         return RetrievalResult(
             query=f"Differential diagnosis for {chief_complaint}",
             collection="differential_diagnosis",
             results=results,
-            num_results=len(results),
-            confidence_scores=[0.88] * len(results)
+            num_results=num_results,
+            confidence_scores=scores
         )
 
-    async def retrieve_acs_protocols(self, condition: Optional[str] = None) -> RetrievalResult:
+    async def retrieve_acs_protocols(
+        self,
+        condition: Optional[str] = None,
+        query_text: Optional[str] = None,
+        top_k: int = 3,
+    ) -> RetrievalResult:
         """Retrieve ACS protocols and risk scores"""
-        results = self.knowledge_docs["acs_protocols"]
+        results = list(self.knowledge_docs["acs_protocols"])
+        num_results = len(results)
+        results, scores = self._select("acs_protocols", results, [0.9] * num_results, query_text, top_k)
         query = f"ACS protocols{f' for {condition}' if condition else ''}"
 
         return RetrievalResult(
             query=query,
             collection="acs_protocols",
-            results=results[:3],
-            num_results=len(results),
-            confidence_scores=[0.9] * len(results[:3])
+            results=results,
+            num_results=num_results,
+            confidence_scores=scores
         )
 
-    async def retrieve_sepsis_criteria(self, condition: Optional[str] = None) -> RetrievalResult:
+    async def retrieve_sepsis_criteria(
+        self,
+        condition: Optional[str] = None,
+        query_text: Optional[str] = None,
+        top_k: int = 3,
+    ) -> RetrievalResult:
         """Retrieve sepsis criteria and workup guidelines"""
-        results = self.knowledge_docs["sepsis_criteria"]
+        results = list(self.knowledge_docs["sepsis_criteria"])
+        num_results = len(results)
+        results, scores = self._select("sepsis_criteria", results, [0.9] * num_results, query_text, top_k)
         query = f"Sepsis criteria{f' for {condition}' if condition else ''}"
 
         return RetrievalResult(
             query=query,
             collection="sepsis_criteria",
-            results=results[:3],
-            num_results=len(results),
-            confidence_scores=[0.9] * len(results[:3])
+            results=results,
+            num_results=num_results,
+            confidence_scores=scores
         )
     
     def _get_age_group(self, age: int, population: str) -> str:
@@ -473,12 +686,55 @@ class KnowledgeBase:
     
     async def format_for_llm(self, retrieval_result: RetrievalResult) -> str:
         """Format retrieval results for LLM context"""
-        formatted = f"\n# Clinical Evidence: {retrieval_result.collection.upper()}\n"
-        formatted += f"**Query**: {retrieval_result.query}\n"
-        formatted += f"**Results**: {retrieval_result.num_results} documents found\n\n"
-        
-        for i, result in enumerate(retrieval_result.results, 1):
-            formatted += f"## Result {i} (Confidence: {retrieval_result.confidence_scores[i-1]:.1%})\n"
-            formatted += json.dumps(result, indent=2) + "\n\n"
-        
-        return formatted
+        return format_retrieval(retrieval_result)
+
+
+_shared_instances: Dict[bool, KnowledgeBase] = {}
+_shared_lock = threading.Lock()
+
+
+def get_knowledge_base(config: Optional[Dict[str, Any]] = None) -> KnowledgeBase:
+    """
+    Return the process-wide KnowledgeBase.
+    Documents and lookup indexes are built once per vector-DB mode and shared by every detector.
+    """
+    config = config or {}
+    use_vector_db = bool(config.get("use_vector_db", False))
+    kb = _shared_instances.get(use_vector_db)
+    if kb is None:
+        with _shared_lock:
+            kb = _shared_instances.get(use_vector_db)
+            if kb is None:
+                kb = KnowledgeBase({**config, "use_vector_db": use_vector_db})
+                _shared_instances[use_vector_db] = kb
+    return kb
+
+
+_retrieval_scope: ContextVar[Optional[Dict[Hashable, "asyncio.Future[Any]"]]] = ContextVar(
+    "retrieval_scope", default=None
+)
+
+
+@contextmanager
+def shared_retrieval_scope() -> Iterator[None]:
+    """
+    Share retrieval/formatting work between all tasks started inside this block
+    (e.g. every case of a batch request). Outside a scope nothing is shared.
+    """
+    token = _retrieval_scope.set({})
+    try:
+        yield
+    finally:
+        _retrieval_scope.reset(token)
+
+
+async def scoped_retrieval(key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+    """Run `factory` once per key within the active scope; concurrent callers await the same result"""
+    scope = _retrieval_scope.get()
+    if scope is None:
+        return await factory()
+    future = scope.get(key)
+    if future is None:
+        future = asyncio.ensure_future(factory())
+        scope[key] = future
+    return await asyncio.shield(future)
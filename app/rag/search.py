@@ -0,0 +1,101 @@
+"""
+Token-level inverted index over the knowledge collections.
+Built once per KnowledgeBase; supports AND/OR term queries ranked with BM25.
+"""
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens"""
+    return TOKEN_RE.findall(text.lower())
+
+
+def flatten_text(value: Any) -> str:
+    """Concatenate every string/number value in a (nested) document"""
+    if isinstance(value, dict):
+        return " ".join(flatten_text(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return " ".join(flatten_text(v) for v in value)
+    if value is None or isinstance(value, bool):
+        return ""
+    return str(value)
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    collection: str
+    position: int
+    score: float
+
+
+class InvertedIndex:
+    """BM25-ranked inverted index keyed by (collection, position in collection)"""
+
+    def __init__(self, collections: Dict[str, Sequence[Dict[str, Any]]], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[Tuple[str, int]] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, Dict[int, int]] = {}
+
+        for collection, docs in collections.items():
+            for position, doc in enumerate(docs):
+                doc_id = len(self.doc_ids)
+                tokens = tokenize(flatten_text(doc))
+                self.doc_ids.append((collection, position))
+                self.doc_lengths.append(len(tokens))
+                for token, tf in Counter(tokens).items():
+                    self.postings.setdefault(token, {})[doc_id] = tf
+
+        total = len(self.doc_ids)
+        self.avg_length = (sum(self.doc_lengths) / total) if total else 0.0
+        self.idf: Dict[str, float] = {
+            token: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for token, docs in self.postings.items()
+        }
+
+    def _candidates(self, terms: Sequence[str], mode: str) -> Iterable[int]:
+        sets = [set(self.postings.get(term, ())) for term in terms]
+        if not sets:
+            return set()
+        if mode == "and":
+            sets.sort(key=len)
+            return set.intersection(*sets)
+        return set.union(*sets)
+
+    def _score(self, doc_id: int, terms: Sequence[str]) -> float:
+        length_norm = 1 - self.b + self.b * (self.doc_lengths[doc_id] / self.avg_length if self.avg_length else 1.0)
+        score = 0.0
+        for term in terms:
+            tf = self.postings.get(term, {}).get(doc_id)
+            if tf:
+                score += self.idf[term] * (tf * (self.k1 + 1)) / (tf + self.k1 * length_norm)
+        return score
+
+    def search(
+        self,
+        query: str,
+        collection: Optional[str] = None,
+        mode: str = "and",
+        top_k: Optional[int] = None,
+    ) -> List[SearchHit]:
+        """Return hits ranked by BM25 score (highest first)"""
+        if mode not in {"and", "or"}:
+            raise ValueError("mode must be 'and' or 'or'")
+        terms = list(dict.fromkeys(tokenize(query)))
+        hits = []
+        for doc_id in self._candidates(terms, mode):
+            doc_collection, position = self.doc_ids[doc_id]
+            if collection and doc_collection != collection:
+                continue
+            hits.append(SearchHit(doc_collection, position, self._score(doc_id, terms)))
+        hits.sort(key=lambda hit: (-hit.score, hit.collection, hit.position))
+        return hits[:top_k] if top_k is not None else hits
@@ -0,0 +1,189 @@
+"""
+In-process dense vector retrieval for the knowledge base.
+Works fully offline: embeddings come from a local hashing embedder and
+search runs over NumPy arrays (exact brute force or IVF approximate search).
+"""
+
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+from rag.search import tokenize
+
+
+class Embedder(Protocol):
+    """Anything that maps texts to L2-normalized float32 vectors of a fixed size"""
+
+    dim: int
+
+    def fit(self, texts: Sequence[str]) -> "Embedder":
+        ...
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+
+class HashingEmbedder:
+    """
+    Hashed TF-IDF over word tokens and character n-grams.
+    Needs no model download; `fit` only learns IDF weights from the corpus.
+    """
+
+    def __init__(self, dim: int = 512, ngram_range: Tuple[int, int] = (3, 4), use_words: bool = True):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.use_words = use_words
+        self.idf = np.ones(dim, dtype=np.float32)
+
+    def _features(self, text: str) -> List[str]:
+        features: List[str] = []
+        low, high = self.ngram_range
+        for token in tokenize(text):
+            if self.use_words:
+                features.append(f"w:{token}")
+            padded = f"<{token}>"
+            for n in range(low, high + 1):
+                features.extend(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+        return features
+
+    def _counts(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            bucket = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if bucket & 0x80000000 else -1.0
+            vector[bucket % self.dim] += sign
+        return vector
+
+    def fit(self, texts: Sequence[str]) -> "HashingEmbedder":
+        if texts:
+            doc_freq = np.zeros(self.dim, dtype=np.float32)
+            for text in texts:
+                doc_freq += self._counts(text) != 0
+            self.idf = (np.log((1 + len(texts)) / (1 + doc_freq)) + 1).astype(np.float32)
+        return self
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = self._counts(text)
+            matrix[row] = np.sign(counts) * np.log1p(np.abs(counts)) * self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+@dataclass(frozen=True)
+class VectorHit:
+    key: Any
+    score: float
+
+
+class VectorIndex:
+    """
+    Cosine-similarity index over unit vectors.
+    method="brute" scores every vector; method="ivf" clusters vectors with
+    k-means and only scores the `n_probe` closest clusters.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Embedder] = None,
+        method: str = "brute",
+        n_lists: int = 8,
+        n_probe: int = 2,
+        seed: int = 0,
+    ):
+        if method not in {"brute", "ivf"}:
+            raise ValueError("method must be 'brute' or 'ivf'")
+        self.embedder = embedder or HashingEmbedder()
+        self.method = method
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.seed = seed
+        self.keys: List[Any] = []
+        self.groups: List[Optional[str]] = []
+        self.vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self.group_rows: Dict[Optional[str], np.ndarray] = {}
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[np.ndarray] = []
+
+    def build(self, items: Sequence[Tuple[Any, str, Optional[str]]]) -> "VectorIndex":
+        """Index (key, text, group) triples; replaces any previous contents"""
+        texts = [text for _, text, _ in items]
+        self.embedder.fit(texts)
+        self.keys = [key for key, _, _ in items]
+        self.groups = [group for _, _, group in items]
+        self.vectors = self.embedder.embed(texts)
+        self.group_rows = {
+            group: np.array([i for i, g in enumerate(self.groups) if g == group], dtype=np.int64)
+            for group in set(self.groups)
+        }
+        if self.method == "ivf" and len(self.keys) > self.n_lists:
+            self._train_ivf()
+        else:
+            self.centroids = None
+            self.lists = []
+        return self
+
+    def _train_ivf(self, iterations: int = 10) -> None:
+        rng = np.random.default_rng(self.seed)
+        centroids = self.vectors[rng.choice(len(self.vectors), self.n_lists, replace=False)].copy()
+        assignment = np.zeros(len(self.vectors), dtype=np.int64)
+        for _ in range(iterations):
+            assignment = np.argmax(self.vectors @ centroids.T, axis=1)
+            for cluster in range(self.n_lists):
+                members = self.vectors[assignment == cluster]
+                if len(members):
+                    mean = members.mean(axis=0)
+                    norm = np.linalg.norm(mean)
+                    centroids[cluster] = mean / norm if norm else mean
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assignment == cluster) for cluster in range(self.n_lists)]
+
+    def _candidate_rows(self, query_vector: np.ndarray) -> np.ndarray:
+        if self.centroids is None:
+            return np.arange(len(self.keys))
+        probe = np.argsort(-(self.centroids @ query_vector))[: self.n_probe]
+        return np.concatenate([self.lists[cluster] for cluster in probe])
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 3,
+        group: Optional[str] = None,
+        keys: Optional[Sequence[Any]] = None,
+    ) -> List[VectorHit]:
+        """Top-k hits by cosine similarity, optionally restricted to a key subset or a group"""
+        if not self.keys or top_k <= 0:
+            return []
+        query_vector = self.embedder.embed([query])[0]
+        if keys is not None:
+            wanted = set(keys)
+            rows = np.array([i for i, key in enumerate(self.keys) if key in wanted], dtype=np.int64)
+        elif group is not None:
+            # Collections are small, so a filtered search is always exact
+            rows = self.group_rows.get(group, np.zeros(0, dtype=np.int64))
+        else:
+            rows = self._candidate_rows(query_vector)
+        if len(rows) == 0:
+            return []
+        scores = self.vectors[rows] @ query_vector
+        order = np.argsort(-scores)[:top_k]
+        return [VectorHit(self.keys[rows[i]], float(scores[i])) for i in order]
+
+
+def build_knowledge_index(
+    collections: Dict[str, Sequence[Dict[str, Any]]],
+    text_of,
+    method: str = "brute",
+    embedder: Optional[Embedder] = None,
+) -> VectorIndex:
+    """Index every document as key=(collection, position), grouped by collection"""
+    items = [
+        ((collection, position), text_of(doc), collection)
+        for collection, docs in collections.items()
+        for position, doc in enumerate(docs)
+    ]
+    return VectorIndex(embedder=embedder, method=method).build(items)
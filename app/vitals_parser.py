@@ -0,0 +1,113 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# One alternation, compiled once; the first reading of each field wins.
+# Order matters where labels share a prefix ("pulse ox" before "pulse"). A single leading
+# lookbehind replaces a \b per branch, which lets the regex engine skip ahead far faster.
+_VITALS_RE = re.compile(
+    r"""
+    (?<![a-z0-9])
+    (?:(?P<spo2>(?:spo2|sp02|o2\s*sat(?:uration)?|sat(?:uration)?s?|pulse\s*ox)\s*[:=]?\s*
+        (?P<spo2_value>\d{2,3})\s*(?P<spo2_unit>%)?)
+    |(?P<bp>(?:bp|blood\s*pressure)\s*[:=]?\s*
+        (?P<sbp_value>\d{2,3})\s*/\s*(?P<dbp_value>\d{2,3})(?:\s*(?P<bp_unit>mm\s*hg))?)
+    |(?P<hr>(?:hr|heart\s*rate|pulse)\s*[:=]?\s*(?P<hr_value>\d{2,3})\b)
+    |(?P<rr>(?:rr|resp(?:iratory)?(?:\s*rate)?)\s*[:=]?\s*(?P<rr_value>\d{1,2})\b)
+    |(?P<temp>(?:t|temp|temperature)\s*[:=]?\s*
+        (?P<temp_value>\d{2,3}(?:\.\d+)?)(?:\s*°?\s*(?P<temp_unit>[cf])\b)?)
+    |(?P<age>(?P<age_value>\d{1,3})[-\s]*(?:years?|year-old|yo|y/o|yr)\b))
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+_PLAUSIBLE: Dict[str, Tuple[float, float]] = {
+    "hr": (20, 250),
+    "rr": (4, 60),
+    "sbp": (50, 260),
+    "dbp": (20, 160),
+    "temp_f": (90.0, 110.0),
+    "spo2": (50, 100),
+    "age": (0, 120),
+}
+
+
+@dataclass(frozen=True)
+class VitalReading:
+    name: str
+    value: float
+    start: int
+    end: int
+    confidence: float
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "value": self.value,
+            "start": self.start,
+            "end": self.end,
+            "confidence": self.confidence,
+        }
+
+
+@dataclass
+class ParsedVitals:
+    age: Optional[int] = None
+    vitals: Dict[str, Any] = field(default_factory=dict)
+    readings: List[VitalReading] = field(default_factory=list)
+
+
+def _plausible(name: str, value: float) -> bool:
+    low, high = _PLAUSIBLE[name]
+    return low <= value <= high
+
+
+def _to_fahrenheit(value: float, unit: Optional[str]) -> Tuple[float, float]:
+    """Return (temp_f, confidence); bare values under 45 are read as Celsius."""
+    if unit:
+        if unit.lower() == "c":
+            return round(value * 9 / 5 + 32, 1), 1.0
+        return value, 1.0
+    if value < 45:
+        return round(value * 9 / 5 + 32, 1), 0.7
+    return value, 0.9
+
+
+def parse_vitals(text: str) -> ParsedVitals:
+    """Single scan for age and vital signs (hr, rr, sbp/dbp, temp_f, spo2) with spans and confidence."""
+    parsed = ParsedVitals()
+
+    def record(name: str, value: float, match: "re.Match[str]", confidence: float) -> None:
+        if name in parsed.vitals or (name == "age" and parsed.age is not None):
+            return
+        if not _plausible(name, value):
+            return
+        parsed.readings.append(VitalReading(name, value, match.start(), match.end(), confidence))
+        if name == "age":
+            parsed.age = int(value)
+        else:
+            parsed.vitals[name] = value
+
+    for match in _VITALS_RE.finditer(text):
+        # The outer alternative closes last, so lastgroup names it
+        kind = match.lastgroup
+        if kind == "spo2":
+            record("spo2", int(match.group("spo2_value")), match, 1.0 if match.group("spo2_unit") else 0.8)
+        elif kind == "bp":
+            sbp, dbp = int(match.group("sbp_value")), int(match.group("dbp_value"))
+            if sbp > dbp and "sbp" not in parsed.vitals:
+                confidence = 1.0 if match.group("bp_unit") else 0.95
+                record("sbp", sbp, match, confidence)
+                record("dbp", dbp, match, confidence)
+        elif kind == "hr":
+            record("hr", int(match.group("hr_value")), match, 0.95)
+        elif kind == "rr":
+            record("rr", int(match.group("rr_value")), match, 0.95)
+        elif kind == "temp":
+            temp_f, confidence = _to_fahrenheit(float(match.group("temp_value")), match.group("temp_unit"))
+            record("temp_f", temp_f, match, confidence)
+        elif kind == "age":
+            record("age", int(match.group("age_value")), match, 0.9)
+
+    return parsed
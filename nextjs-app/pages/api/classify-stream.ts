@@ -0,0 +1,52 @@
+import type { NextApiRequest, NextApiResponse } from "next";
+
+const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
+
+export const config = {
+  api: { responseLimit: false },
+};
+
+export default async function handler(req: NextApiRequest, res: NextApiResponse) {
+  if (req.method !== "POST") {
+    return res.status(405).json({ error: "Method not allowed" });
+  }
+
+  const { case_text, model } = req.body || {};
+
+  if (!case_text) {
+    return res.status(400).json({ error: "case_text is required" });
+  }
+
+  try {
+    const response = await fetch(`${API_URL}/classify/stream`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ case_text, model }),
+    });
+
+    if (!response.ok || !response.body) {
+      const data = await response.json().catch(() => ({ error: "API error" }));
+      return res.status(response.status).json(data);
+    }
+
+    res.writeHead(200, {
+      "Content-Type": "application/x-ndjson",
+      "Cache-Control": "no-cache",
+    });
+
+    // Forward each chunk as soon as the backend emits it
+    const reader = response.body.getReader();
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      res.write(Buffer.from(value));
+    }
+    res.end();
+  } catch (err: any) {
+    if (res.headersSent) {
+      res.end();
+      return;
+    }
+    return res.status(500).json({ error: err?.message || "API error" });
+  }
+}
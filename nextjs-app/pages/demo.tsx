@@ -103,6 +103,27 @@ const SAMPLE_CASES: SampleCase[] = [
   },
 ];
 
+const STREAM_LAYER_KEYS: Record<string, string> = {
+  malicious_input: "malicious_input",
+  extraction: "extraction",
+  vitals: "vitals",
+  resources: "resources",
+  final_decision: "final_decision",
+  handbook: "handbook_verification",
+};
+
+function applyLayerEvent(prev: any, event: string, data: any) {
+  const intermediate = { ...(prev?.intermediate || {}) };
+  if (event === "red_flag") {
+    intermediate.red_flag_layer = data;
+    intermediate.red_flags = data?.flags || [];
+    intermediate.has_red_flags = data?.has_red_flags || false;
+  } else if (STREAM_LAYER_KEYS[event]) {
+    intermediate[STREAM_LAYER_KEYS[event]] = data;
+  }
+  return { ...(prev || {}), partial: true, intermediate };
+}
+
 export default function DemoPage() {
   const [caseText, setCaseText] = useState("");
   const [selectedSample, setSelectedSample] = useState<SampleCase | null>(null);
@@ -181,20 +202,40 @@ export default function DemoPage() {
     setLoading(true);
 
     try {
-      const response = await fetch("/api/classify", {
+      const response = await fetch("/api/classify-stream", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ case_text: caseText, model: modelChoice }),
       });
 
-      const data = await response.json();
-
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
+        const data = await response.json();
         setError(data.error || "Classification failed.");
         return;
       }
 
-      setResult(data);
+      // NDJSON: one {event, data} object per line, rendered as each layer finishes
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = "";
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split("\n");
+        buffered = lines.pop() || "";
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const { event, data } = JSON.parse(line);
+          if (event === "error") {
+            setError(data.error || "Classification failed.");
+          } else if (event === "result") {
+            setResult(data);
+          } else {
+            setResult((prev: any) => applyLayerEvent(prev, event, data));
+          }
+        }
+      }
     } catch (err: any) {
       setError(err?.message || "Network error.");
     } finally {
@@ -445,9 +486,11 @@ export default function DemoPage() {
         >
           <div style={{ display: "flex", justifyContent: "space-between", flexWrap: "wrap" }}>
             <div>
-              <h2 style={{ marginTop: 0 }}>Result: ESI-{result.esi_level}</h2>
+              <h2 style={{ marginTop: 0 }}>
+                Result: {result.partial ? "pending..." : `ESI-${result.esi_level}`}
+              </h2>
               <p style={{ margin: "0.25rem 0" }}>
-                Confidence: {(result.confidence * 100).toFixed(1)}%
+                Confidence: {result.partial ? "n/a" : `${(result.confidence * 100).toFixed(1)}%`}
               </p>
               <p style={{ color: "#475569", marginTop: 0 }}>{result.reason}</p>
             </div>
@@ -0,0 +1,252 @@
+"""
+End-to-end offline benchmark of POST /classify.
+
+Starts the OpenAI-compatible stub (llm_stub_server.py) in a subprocess, so its CPU
+and memory stay out of the numbers, then drives the API in-process over ASGI with
+a fixed concurrency, cycling through a case corpus. Reports throughput, end-to-end
+and per-layer latency percentiles, CPU time per request and RSS growth as JSON,
+tagged with the current git commit so runs can be diffed across commits.
+
+    python scripts/bench_classify.py --requests 500 --concurrency 32 \\
+        --latency-ms 150 --jitter-ms 60 --latency-distribution lognormal --output bench.json
+    python scripts/bench_classify.py --baseline bench.json   # adds before/after deltas
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "app"))
+
+DEFAULT_CORPUS = ROOT / "tests" / "fixtures" / "final_decision_cases.jsonl"
+PRE_PIPELINE_LAYERS = ("malicious", "extraction")
+
+
+def _configure_env(port: int) -> None:
+    os.environ.setdefault("RAG_CONFIG_PATH", str(ROOT / "config" / "rag_config.json"))
+    os.environ["LLM_STUB_MODE"] = "true"
+    os.environ["LLM_STUB_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+    os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+    # The benchmark client is one IP; quotas would reject it after a few requests
+    os.environ["RATE_LIMIT_PER_DAY"] = str(10**9)
+    os.environ["FREE_TIER_DAILY_BUDGET_USD"] = "1e9"
+
+
+def _start_stub(args: argparse.Namespace) -> subprocess.Popen:
+    command = [
+        sys.executable,
+        str(ROOT / "app" / "llm_stub_server.py"),
+        "--port", str(args.port),
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--latency-distribution", args.latency_distribution,
+    ]
+    stub = subprocess.Popen(command, cwd=ROOT / "app")
+    deadline = time.monotonic() + 15
+    import httpx
+
+    while time.monotonic() < deadline:
+        try:
+            httpx.post(f"http://127.0.0.1:{args.port}/v1/chat/completions", json={"messages": []}, timeout=1)
+            return stub
+        except httpx.TransportError:
+            time.sleep(0.1)
+    stub.kill()
+    raise RuntimeError(f"LLM stub did not start on port {args.port}")
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _summary(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    return {
+        "p50": round(_percentile(values, 50), 3),
+        "p95": round(_percentile(values, 95), 3),
+        "p99": round(_percentile(values, 99), 3),
+        "mean": round(sum(values) / len(values), 3),
+        "count": len(values),
+    }
+
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux /proc), falling back to the peak from getrusage."""
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as handle:
+            pages = int(handle.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def load_corpus(path: Path) -> List[str]:
+    with path.open("r", encoding="utf-8") as handle:
+        cases = [json.loads(line)["case_text"] for line in handle if line.strip()]
+    if not cases:
+        raise ValueError(f"No cases in {path}")
+    return cases
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(cases: List[str], requests: int, concurrency: int, warmup: int) -> Dict[str, Any]:
+    import httpx
+
+    import main
+    from llm_client import close_openai_client
+
+    await main._warm_evidence_cache()
+    transport = httpx.ASGITransport(app=main.app)
+    gate = asyncio.Semaphore(concurrency)
+    end_to_end: List[float] = []
+    layers: Dict[str, List[float]] = {}
+    statuses: Dict[str, int] = {}
+
+    async def one(client: httpx.AsyncClient, index: int, record: bool) -> None:
+        async with gate:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/classify", json={"case_text": cases[index % len(cases)]})
+                status = str(response.status_code)
+            except Exception as exc:
+                response, status = None, type(exc).__name__
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        if not record:
+            return
+        statuses[status] = statuses.get(status, 0) + 1
+        if response is None or response.status_code != 200:
+            return
+        end_to_end.append(elapsed_ms)
+        timings = response.json()["intermediate"]["timings"]
+        for name in PRE_PIPELINE_LAYERS:
+            layers.setdefault(name, []).append(timings[f"{name}_ms"])
+        for name, timing in timings["layers"].items():
+            layers.setdefault(name, []).append(timing["duration_ms"])
+        layers.setdefault("pipeline", []).append(timings["pipeline_ms"])
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        await asyncio.gather(*(one(client, index, record=False) for index in range(warmup)))
+
+        rss_before = _rss_mb()
+        cpu_before = _cpu_seconds()
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, index, record=True) for index in range(requests)))
+        elapsed = time.perf_counter() - started
+        cpu_used = _cpu_seconds() - cpu_before
+        rss_after = _rss_mb()
+    await close_openai_client()
+
+    return {
+        "requests": requests,
+        "status_codes": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "req_per_s": round(requests / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": _summary(end_to_end),
+        "layers_ms": {name: _summary(values) for name, values in sorted(layers.items())},
+        "cpu_ms_per_request": round(cpu_used * 1000 / requests, 3) if requests else 0.0,
+        "cpu_utilization": round(cpu_used / elapsed, 3) if elapsed else 0.0,
+        "memory_mb": {
+            "rss_before": round(rss_before, 2),
+            "rss_after": round(rss_after, 2),
+            "growth": round(rss_after - rss_before, 2),
+        },
+    }
+
+
+def compare(baseline: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+    """Before/after and percent change for the headline numbers of two result blocks."""
+
+    def delta(before: Optional[float], after: Optional[float]) -> Dict[str, Any]:
+        change = round(100.0 * (after - before) / before, 1) if before and after is not None else None
+        return {"before": before, "after": after, "change_pct": change}
+
+    def p95(block: Dict[str, Any], layer: str) -> Optional[float]:
+        return (block["layers_ms"].get(layer) or {}).get("p95")
+
+    latency = {pct: delta((baseline["latency_ms"] or {}).get(pct), (results["latency_ms"] or {}).get(pct))
+               for pct in ("p50", "p95", "p99")}
+    layers = sorted(set(baseline["layers_ms"]) | set(results["layers_ms"]))
+    return {
+        "baseline_commit": baseline.get("commit"),
+        "req_per_s": delta(baseline["req_per_s"], results["req_per_s"]),
+        "latency_ms": latency,
+        "layer_p95_ms": {layer: delta(p95(baseline, layer), p95(results, layer)) for layer in layers},
+        "cpu_ms_per_request": delta(baseline["cpu_ms_per_request"], results["cpu_ms_per_request"]),
+        "memory_growth_mb": delta(baseline["memory_mb"]["growth"], results["memory_mb"]["growth"]),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline end-to-end /classify benchmark against the LLM stub")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS, help="JSONL with a case_text field per line")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=30.0)
+    parser.add_argument("--latency-distribution", default="uniform", help="uniform, normal, lognormal or exponential")
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path, help="Earlier --output report to compare against")
+    args = parser.parse_args()
+
+    _configure_env(args.port)
+    stub = _start_stub(args)
+    try:
+        results = asyncio.run(run(load_corpus(args.corpus), args.requests, args.concurrency, args.warmup))
+    finally:
+        stub.terminate()
+        stub.wait(timeout=10)
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            "corpus": str(args.corpus),
+            "cases": len(load_corpus(args.corpus)),
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "stub_latency_ms": args.latency_ms,
+            "stub_jitter_ms": args.jitter_ms,
+            "stub_latency_distribution": args.latency_distribution,
+            "llm_cache_enabled": os.environ.get("LLM_CACHE_ENABLED"),
+        },
+        "results": results,
+    }
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        report["comparison"] = compare({**baseline["results"], "commit": baseline.get("commit")}, results)
+    rendered = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(rendered + "\n", encoding="utf-8")
+    print(rendered)
+
+
+if __name__ == "__main__":
+    main()
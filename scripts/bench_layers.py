@@ -0,0 +1,223 @@
+"""
+Micro-benchmarks for the deterministic layers that run on the event loop per request.
+
+Each benchmark is timed on a short triage note and on long (10 KB and 50 KB)
+nursing-note style texts. Reports ops/sec (best of several repeats) and, from
+tracemalloc, allocations per call: peak bytes and the number of memory blocks
+allocated and not yet freed while the call runs.
+
+    python scripts/bench_layers.py                       # print the report
+    python scripts/bench_layers.py --check               # exit 1 on a threshold breach
+    python scripts/bench_layers.py --output layers.json
+
+Thresholds (tests/fixtures/layer_bench_thresholds.json) are floors/ceilings set
+well clear of normal machine-to-machine variance, so they trip on hot-path
+regressions (an extra pass over the text, a quadratic loop, a copy per call)
+rather than on a noisy CI runner. tests/test_layer_performance.py runs the same
+check with fewer iterations.
+"""
+
+import argparse
+import json
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "app"))
+
+THRESHOLDS_PATH = ROOT / "tests" / "fixtures" / "layer_bench_thresholds.json"
+
+SHORT_NOTE = (
+    "58-year-old male with crushing chest pain radiating to left arm, diaphoretic, "
+    "history of hypertension. HR 112, BP 150/95, RR 22, SpO2 95% on RA, T 98.9F."
+)
+# Realistic nursing-note sentences; clinical terms and vitals recur through the text
+NOTE_SENTENCES = (
+    "Patient resting in bed, family at bedside, reports pain 6/10 and denies nausea.",
+    "IV site clean and dry, fluids running at 100 mL/h, tolerating sips of water.",
+    "Reassessed at 14:20: HR 98, BP 138/84, RR 18, SpO2 97% on 2L NC, T 99.4F.",
+    "States shortness of breath improved after nebulizer, mild wheezing on exam.",
+    "Laceration to right forearm cleaned and dressed, no active bleeding noted.",
+    "Ambulated to bathroom with assistance, steady gait, no dizziness reported.",
+    "Complains of intermittent abdominal pain, one episode of vomiting overnight.",
+    "Family asks about discharge timing; awaiting troponin and CBC results.",
+)
+LONG_SIZES_KB = (10, 50)
+
+
+def long_note(size_kb: int) -> str:
+    parts: List[str] = []
+    length = 0
+    index = 0
+    while length < size_kb * 1024:
+        sentence = NOTE_SENTENCES[index % len(NOTE_SENTENCES)]
+        parts.append(sentence)
+        length += len(sentence) + 1
+        index += 1
+    # The triage summary comes last, so every scanner reads the whole note
+    return " ".join(parts) + " " + SHORT_NOTE
+
+
+def texts() -> Dict[str, str]:
+    return {"short": SHORT_NOTE, **{f"{size}kb": long_note(size) for size in LONG_SIZES_KB}}
+
+
+def run_sync(coroutine: Any) -> Any:
+    """Drive a coroutine that never suspends (in-memory KnowledgeBase lookups) without an event loop."""
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coroutine.close()
+    raise RuntimeError("coroutine suspended; it needs an event loop")
+
+
+def benchmarks() -> Dict[str, Tuple[Callable[[str], Any], bool]]:
+    """name -> (call(text), whether it scales with the case text)."""
+    from detectors.extraction import ExtractionDetector
+    from detectors.malicious_input import MaliciousInputDetector
+    from detectors.resource_inference import ResourceInferenceDetector
+    from llm_router import LLMRouter
+    from rag.knowledge_base import get_knowledge_base
+
+    extraction = ExtractionDetector()
+    malicious = MaliciousInputDetector()
+    resources = ResourceInferenceDetector()
+    router = LLMRouter()
+    kb = get_knowledge_base()
+    extracted_by_text: Dict[str, Dict[str, Any]] = {}
+
+    def extracted(text: str) -> Dict[str, Any]:
+        if text not in extracted_by_text:
+            extracted_by_text[text] = extraction.extract(text)
+        return extracted_by_text[text]
+
+    def final_context(text: str) -> Dict[str, Any]:
+        return {
+            "esi_level": 3,
+            "extraction": extracted(text),
+            "red_flags": {"has_red_flags": False, "confidence": 0.8},
+            "vitals": {"critical": False},
+            "resources": {"resource_count": 2},
+        }
+
+    return {
+        "extraction.extract": (extraction.extract, True),
+        "malicious.analyze": (malicious.analyze, True),
+        "resources.rule_based_resources": (lambda text: resources.rule_based_resources(text, extracted(text)), True),
+        "router.select_red_flag_model": (lambda text: router.select_red_flag_model(text, extracted(text)), True),
+        "router.select_final_decision_model": (
+            lambda text: router.select_final_decision_model(text, final_context(text)),
+            True,
+        ),
+        "kb.retrieve_esi_criteria": (lambda _text: run_sync(kb.retrieve_esi_criteria(2, "chest pain")), False),
+        "kb.retrieve_vital_norms": (lambda _text: run_sync(kb.retrieve_vital_norms(58)), False),
+        "kb.retrieve_differential_diagnoses": (
+            lambda _text: run_sync(kb.retrieve_differential_diagnoses("Chest Pain")),
+            False,
+        ),
+        "kb.retrieve_acs_protocols": (lambda _text: run_sync(kb.retrieve_acs_protocols("chest pain")), False),
+    }
+
+
+def ops_per_sec(func: Callable[[str], Any], text: str, budget_s: float, repeat: int) -> float:
+    # Calibrate so each repeat takes roughly budget_s / repeat
+    number, elapsed = 1, 0.0
+    while True:
+        elapsed = timeit.timeit(lambda: func(text), number=number)
+        if elapsed >= budget_s / repeat / 4 or number >= 1_000_000:
+            break
+        number *= 4
+    number = max(1, int(number * (budget_s / repeat) / max(elapsed, 1e-9)))
+    best = min(timeit.repeat(lambda: func(text), number=number, repeat=repeat))
+    return number / best
+
+
+def allocations(func: Callable[[str], Any], text: str) -> Dict[str, float]:
+    """Peak traced bytes and blocks still allocated at the end of one (warm) call."""
+    func(text)
+    tracemalloc.start()
+    try:
+        before_bytes, _ = tracemalloc.get_traced_memory()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        result = func(text)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del result
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "lineno") if stat.count_diff > 0)
+    return {"peak_kb": round((peak - before_bytes) / 1024, 2), "blocks": blocks}
+
+
+def run(
+    names: Optional[Iterable[str]] = None, budget_s: float = 0.5, repeat: int = 5
+) -> Dict[str, Dict[str, Dict[str, float]]]:
+    cases = texts()
+    selected = benchmarks()
+    if names:
+        selected = {name: selected[name] for name in names}
+    report: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for name, (func, scales) in selected.items():
+        report[name] = {}
+        for label, text in cases.items():
+            if not scales and label != "short":
+                continue
+            report[name][label] = {
+                "ops_per_s": round(ops_per_sec(func, text, budget_s, repeat), 1),
+                **allocations(func, text),
+            }
+    return report
+
+
+def check(report: Dict[str, Dict[str, Dict[str, float]]], thresholds: Dict[str, Any]) -> List[str]:
+    """Threshold breaches as messages; each threshold is {min_ops_per_s, max_peak_kb} per text size."""
+    failures = []
+    for name, sizes in thresholds.items():
+        for label, limits in sizes.items():
+            measured = report.get(name, {}).get(label)
+            if measured is None:
+                continue
+            if measured["ops_per_s"] < limits.get("min_ops_per_s", 0):
+                failures.append(
+                    f"{name} [{label}]: {measured['ops_per_s']} ops/s < {limits['min_ops_per_s']}"
+                )
+            if "max_peak_kb" in limits and measured["peak_kb"] > limits["max_peak_kb"]:
+                failures.append(f"{name} [{label}]: peak {measured['peak_kb']} KB > {limits['max_peak_kb']}")
+    return failures
+
+
+def load_thresholds(path: Path = THRESHOLDS_PATH) -> Dict[str, Any]:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the deterministic triage layers")
+    parser.add_argument("--benchmark", action="append", help="Run only this benchmark (repeatable)")
+    parser.add_argument("--budget-s", type=float, default=0.5, help="Timing budget per benchmark and text")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check", action="store_true", help="Exit 1 if a regression threshold is breached")
+    parser.add_argument("--thresholds", type=Path, default=THRESHOLDS_PATH)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    report = run(args.benchmark, args.budget_s, args.repeat)
+    rendered = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(rendered + "\n", encoding="utf-8")
+    print(rendered)
+
+    if args.check:
+        failures = check(report, load_thresholds(args.thresholds))
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
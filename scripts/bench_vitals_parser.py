@@ -0,0 +1,81 @@
+import argparse
+import json
+import re
+import sys
+import timeit
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from vitals_parser import parse_vitals
+
+
+SHORT_NOTE = "32-year-old female with chest pain. Vital signs: HR 110, RR 22, BP 140/90, T 99.1F, SpO2 94%"
+NURSING_FILLER = (
+    "Patient resting in bed, family at bedside. Reports pain 6/10, denies nausea. "
+    "IV site clean and dry, fluids running at 100 mL/h. Ambulated to bathroom with assistance. "
+)
+
+
+def legacy_extract(text: str) -> Dict[str, Any]:
+    """The per-field re.search implementation previously duplicated in extraction and vital_signal."""
+    vitals: Dict[str, Any] = {}
+    text_lower = text.lower()
+    age: Optional[int] = None
+    match = re.search(r"(\d{1,3})[-\s]*(?:years?|year-old|yo|y/o|yr)\b", text_lower)
+    if match:
+        age = int(match.group(1))
+    hr = re.search(r"\bhr\s*(\d{2,3})\b", text_lower)
+    if hr:
+        vitals["hr"] = int(hr.group(1))
+    rr = re.search(r"\brr\s*(\d{1,2})\b", text_lower)
+    if rr:
+        vitals["rr"] = int(rr.group(1))
+    bp = re.search(r"\bbp\s*(\d{2,3})\s*/\s*(\d{2,3})\b", text_lower)
+    if bp:
+        vitals["sbp"] = int(bp.group(1))
+        vitals["dbp"] = int(bp.group(2))
+    temp = re.search(r"\b(?:t|temp|temperature)\s*([0-9]{2,3}(?:\.[0-9])?)", text_lower)
+    if temp:
+        vitals["temp_f"] = float(temp.group(1))
+    spo2 = re.search(r"\b(?:spo2|o2\s*sat)\s*(\d{2,3})%", text_lower)
+    if spo2:
+        vitals["spo2"] = int(spo2.group(1))
+    return {"age": age, "vitals": vitals}
+
+
+def _nursing_note(size_kb: int) -> str:
+    # Vitals land at the end so both parsers must scan the whole note
+    filler = NURSING_FILLER * (size_kb * 1024 // len(NURSING_FILLER) + 1)
+    return filler[: size_kb * 1024] + " " + SHORT_NOTE
+
+
+def _ops_per_sec(func, text: str, number: int) -> float:
+    best = min(timeit.repeat(lambda: func(text), number=number, repeat=5))
+    return number / best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the unified vitals parser with the legacy per-field regexes")
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--sizes-kb", type=int, nargs="*", default=[4, 16, 64])
+    args = parser.parse_args()
+
+    texts = {"short": SHORT_NOTE, **{f"{size}kb": _nursing_note(size) for size in args.sizes_kb}}
+    report = {}
+    for name, text in texts.items():
+        number = max(10, args.number // max(1, len(text) // 1024))
+        legacy = _ops_per_sec(legacy_extract, text, number)
+        unified = _ops_per_sec(parse_vitals, text, number)
+        report[name] = {
+            "chars": len(text),
+            "legacy_ops_per_s": round(legacy, 1),
+            "unified_ops_per_s": round(unified, 1),
+            "speedup": round(unified / legacy, 2),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Regression harness for the compact final-decision context.
+
+Runs every fixture case through the pipeline, then sends the final-decision
+layer the same context twice: once serialized the old way
+(json.dumps({"case_text", "context"})) and once through the schema projection.
+Reports prompt-token reduction and ESI agreement between the two.
+
+Offline (default) the LLM is the local stub, so agreement is trivially 100% and
+only the token numbers are meaningful. Pass --live with OPENROUTER_API_KEY set
+to measure agreement against the real model.
+
+    python scripts/final_context_regression.py --output context_regression.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "app"))
+
+DEFAULT_FIXTURES = ROOT / "tests" / "fixtures" / "final_decision_cases.jsonl"
+
+
+def _configure_env(live: bool, stub_port: int) -> None:
+    os.environ.setdefault("RAG_CONFIG_PATH", str(ROOT / "config" / "rag_config.json"))
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    if not live:
+        os.environ["LLM_STUB_MODE"] = "true"
+        os.environ["LLM_STUB_URL"] = f"http://127.0.0.1:{stub_port}/v1"
+        os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+
+
+def _start_stub(port: int) -> None:
+    import uvicorn
+
+    from llm_stub_server import create_stub_app
+
+    config = uvicorn.Config(create_stub_app(), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+
+def load_fixtures(path: Path) -> List[Dict[str, Any]]:
+    with path.open("r", encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+async def run(fixtures: List[Dict[str, Any]]) -> Dict[str, Any]:
+    import main
+    from detectors.final_decision import FinalDecisionDetector
+    from llm_client import close_openai_client, count_tokens
+
+    class LegacyFinalDecisionDetector(FinalDecisionDetector):
+        def _case_message(self, case_text: str, context: Dict[str, Any]) -> str:
+            return json.dumps({"case_text": case_text, "context": context}, ensure_ascii=False, default=str)
+
+    compact = main.final_detector
+    legacy = LegacyFinalDecisionDetector()
+
+    cases = []
+    for fixture in fixtures:
+        captured: Dict[str, Any] = {}
+
+        async def capture(name: str, value: Any) -> None:
+            if name == "preliminary":
+                captured["context"] = json.loads(json.dumps(value, default=str))
+
+        await main._classify_case(fixture["case_text"], emit=capture)
+        context = captured["context"]
+        text = fixture["case_text"]
+
+        legacy_tokens = count_tokens(legacy._case_message(text, context))
+        compact_tokens = count_tokens(compact._case_message(text, context))
+        legacy_result, compact_result = await asyncio.gather(
+            legacy.decide(text, context), compact.decide(text, context)
+        )
+        cases.append(
+            {
+                "id": fixture.get("id"),
+                "expected_esi": fixture.get("expected_esi"),
+                "legacy_esi": main._parse_esi_level(legacy_result.get("esi"), context["esi_level"]),
+                "compact_esi": main._parse_esi_level(compact_result.get("esi"), context["esi_level"]),
+                "legacy_context_tokens": legacy_tokens,
+                "compact_context_tokens": compact_tokens,
+                "legacy_prompt_tokens": legacy_result.get("prompt_tokens", 0),
+                "compact_prompt_tokens": compact_result.get("prompt_tokens", 0),
+            }
+        )
+    await close_openai_client()
+
+    total = len(cases)
+    legacy_sum = sum(case["legacy_context_tokens"] for case in cases)
+    compact_sum = sum(case["compact_context_tokens"] for case in cases)
+    agree = sum(case["legacy_esi"] == case["compact_esi"] for case in cases)
+    labelled = [case for case in cases if case["expected_esi"] is not None]
+    return {
+        "cases": cases,
+        "summary": {
+            "cases": total,
+            "llm": "stub" if os.environ.get("LLM_STUB_MODE") == "true" else "live",
+            "legacy_context_tokens": legacy_sum,
+            "compact_context_tokens": compact_sum,
+            "tokens_saved_per_call": round((legacy_sum - compact_sum) / total, 1) if total else 0.0,
+            "token_reduction_pct": round(100.0 * (legacy_sum - compact_sum) / legacy_sum, 1) if legacy_sum else 0.0,
+            "esi_agreement": round(agree / total, 4) if total else 0.0,
+            "legacy_accuracy": round(
+                sum(case["legacy_esi"] == case["expected_esi"] for case in labelled) / len(labelled), 4
+            ) if labelled else None,
+            "compact_accuracy": round(
+                sum(case["compact_esi"] == case["expected_esi"] for case in labelled) / len(labelled), 4
+            ) if labelled else None,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compact final-decision context regression")
+    parser.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES)
+    parser.add_argument("--live", action="store_true", help="Use the configured provider instead of the stub")
+    parser.add_argument("--stub-port", type=int, default=8099)
+    parser.add_argument("--min-reduction-pct", type=float, default=30.0)
+    parser.add_argument("--min-agreement", type=float, default=0.9)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    _configure_env(args.live, args.stub_port)
+    if not args.live:
+        _start_stub(args.stub_port)
+
+    report = asyncio.run(run(load_fixtures(args.fixtures)))
+    rendered = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(rendered + "\n", encoding="utf-8")
+    print(json.dumps(report["summary"], indent=2))
+
+    summary = report["summary"]
+    if summary["token_reduction_pct"] < args.min_reduction_pct or summary["esi_agreement"] < args.min_agreement:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+os.environ.setdefault("LLM_STUB_MODE", "true")
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+
+
+def _start_stub(port: int, latency_ms: float, jitter_ms: float) -> None:
+    import uvicorn
+
+    from llm_stub_server import create_stub_app
+
+    config = uvicorn.Config(
+        create_stub_app(latency_ms, jitter_ms), host="127.0.0.1", port=port, log_level="warning"
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_load(requests: int, concurrency: int) -> Dict[str, Any]:
+    from llm_client import close_openai_client, create_chat_completion, get_openai_client
+
+    client = get_openai_client()
+    gate = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with gate:
+            start = time.perf_counter()
+            try:
+                await create_chat_completion(
+                    client,
+                    model="stub",
+                    messages=[{"role": "user", "content": f"load test case {i}"}],
+                    temperature=0.0,
+                    max_tokens=50,
+                    response_format={"type": "json_object"},
+                    cache=None,
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    await close_openai_client()
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "req_per_s": round(requests / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(statistics.median(latencies), 2) if latencies else None,
+            "p95": round(_percentile(latencies, 95), 2) if latencies else None,
+            "p99": round(_percentile(latencies, 99), 2) if latencies else None,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the shared LLM client pool against the local stub")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("LLM_STUB_URL", f"http://127.0.0.1:{args.port}/v1")
+    _start_stub(args.port, args.latency_ms, args.jitter_ms)
+    report = asyncio.run(run_load(args.requests, args.concurrency))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
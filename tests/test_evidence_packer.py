@@ -0,0 +1,96 @@
+import json
+import sys
+from pathlib import Path
+import unittest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from llm_client import count_tokens
+from rag.evidence import EvidenceCache, evidence_query, pack_evidence, render_result
+from rag.knowledge_base import get_knowledge_base
+
+
+class TestEvidencePacker(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        kb = get_knowledge_base()
+        self.retrievals = [
+            await kb.retrieve_esi_criteria(2, "Chest Pain"),
+            await kb.retrieve_esi_criteria(3),
+            await kb.retrieve_sepsis_criteria("Fever"),
+        ]
+        self.retrievals = [item for item in self.retrievals if item.results]
+
+    def test_compact_rendering_saves_tokens(self):
+        packed = pack_evidence(self.retrievals, token_budget=100000)
+
+        self.assertEqual(packed.dropped, 0)
+        self.assertGreater(packed.tokens_saved, 0)
+        self.assertEqual(packed.tokens, count_tokens(packed.text))
+        self.assertNotIn("\n  ", packed.text)
+
+    def test_budget_is_respected_and_sources_kept(self):
+        packed = pack_evidence(self.retrievals, token_budget=250)
+
+        self.assertLessEqual(packed.tokens, 250)
+        self.assertGreater(packed.dropped, 0)
+        # Best result of each source goes in before any source's second result
+        self.assertEqual(packed.sources, [item.collection for item in self.retrievals])
+
+    def test_json_format_is_minified(self):
+        result = self.retrievals[0].results[0]
+        rendered = render_result(result, "json")
+        self.assertNotIn("id", json.loads(rendered))
+        self.assertNotIn("\n", rendered)
+
+        with self.assertRaises(ValueError):
+            pack_evidence(self.retrievals, 100, "yaml")
+
+    def test_empty_budget_yields_no_evidence(self):
+        packed = pack_evidence(self.retrievals, token_budget=0)
+        self.assertEqual(packed.text, "")
+        self.assertEqual(packed.sources, [])
+
+
+class TestEvidenceCache(unittest.IsolatedAsyncioTestCase):
+    async def test_structured_queries_are_memoized(self):
+        kb = get_knowledge_base()
+        cache = EvidenceCache(max_entries=2)
+        queries = (
+            evidence_query("retrieve_esi_criteria", 2, "Chest Pain", top_k=3),
+            evidence_query("retrieve_differential_diagnoses", "Chest Pain", top_k=3),
+        )
+
+        first = await cache.get(kb, queries, 400, "bullets")
+        second = await cache.get(kb, list(queries), 400, "bullets")
+        self.assertIs(first, second)
+        self.assertEqual(first.collections, ["esi_handbook", "differential_diagnosis"])
+
+        uncached = pack_evidence(
+            [await kb.retrieve_esi_criteria(2, "Chest Pain", top_k=3),
+             await kb.retrieve_differential_diagnoses("Chest Pain", top_k=3)],
+            400,
+        )
+        self.assertEqual(first.text, uncached.text)
+        self.assertEqual(first.tokens_saved, uncached.tokens_saved)
+
+        # Budget and format are part of the key; the oldest entry is evicted past max_entries
+        await cache.get(kb, queries, 200, "bullets")
+        await cache.get(kb, queries, 400, "json")
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    async def test_free_text_queries_bypass_cache(self):
+        kb = get_knowledge_base()
+        cache = EvidenceCache()
+        rendered = cache.warm_documents(kb, formats=("bullets",))
+        self.assertEqual(rendered, sum(len(docs) for docs in kb.knowledge_docs.values()))
+
+        queries = (evidence_query("retrieve_esi_criteria", 2, query_text="crushing chest pain"),)
+        await cache.get(kb, queries, 400)
+        await cache.get(kb, queries, 400)
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertEqual(cache.stats()["rendered_blocks"], rendered)
+
+
+if __name__ == "__main__":
+    unittest.main()
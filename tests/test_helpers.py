@@ -1,3 +1,6 @@
+import asyncio
+
+
 class FakeUsage:
     def __init__(self, prompt_tokens=10, completion_tokens=5, total_tokens=15):
         self.prompt_tokens = prompt_tokens
@@ -22,10 +25,25 @@ class FakeResponse:
 
 
 class FakeChat:
-    def __init__(self, content: str):
+    def __init__(self, content: str, delay: float = 0.0):
         self._content = content
+        self._delay = delay
+        self.calls = []
+        self.cancelled = 0
+        # Event-loop time at which each call started and each uncancelled call finished
+        self.started = []
+        self.finished = []
 
-    async def create(self, **_kwargs):
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        self.started.append(asyncio.get_running_loop().time())
+        if self._delay:
+            try:
+                await asyncio.sleep(self._delay)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+        self.finished.append(asyncio.get_running_loop().time())
         return FakeResponse(self._content)
 
 
@@ -35,5 +53,68 @@ class FakeCompletions:
 
 
 class FakeAsyncOpenAI:
-    def __init__(self, content: str):
-        self.chat = type("ChatHolder", (), {"completions": FakeChat(content)})()
+    def __init__(self, content: str, delay: float = 0.0):
+        self.chat = type("ChatHolder", (), {"completions": FakeChat(content, delay)})()
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis-py calls used by RedisRateLimitBackend (values come back as bytes)."""
+
+    def __init__(self):
+        self.store = {}
+        self.ttls = {}
+
+    def mget(self, keys):
+        return [self.store.get(key) for key in keys]
+
+    def incrby(self, key, amount):
+        value = int(self.store.get(key, b"0")) + amount
+        self.store[key] = str(value).encode()
+        return value
+
+    def incrbyfloat(self, key, amount):
+        value = float(self.store.get(key, b"0")) + amount
+        self.store[key] = repr(value).encode()
+        return self.store[key]
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+        return True
+
+    def pipeline(self, transaction=True):
+        return FakeRedisPipeline(self)
+
+
+class UnavailableRedis(FakeRedis):
+    """A Redis client whose server is down: every command fails to connect."""
+
+    def __init__(self):
+        super().__init__()
+        self.attempts = 0
+
+    def mget(self, keys):
+        self.attempts += 1
+        raise ConnectionError("Connection refused")
+
+    def incrby(self, key, amount):
+        self.attempts += 1
+        raise ConnectionError("Connection refused")
+
+    incrbyfloat = incrby
+
+
+class FakeRedisPipeline:
+    def __init__(self, redis):
+        self._redis = redis
+        self._calls = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self._calls.append((name, args))
+            return self
+        return queue
+
+    def execute(self):
+        results = [getattr(self._redis, name)(*args) for name, args in self._calls]
+        self._calls = []
+        return results
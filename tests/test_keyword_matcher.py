@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+import unittest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from detectors.extraction import ExtractionDetector
+from keyword_matcher import KeywordMatcher, clinical_lexicon, lexicon_terms
+from llm_router import LLMRouter
+
+
+class TestKeywordMatcher(unittest.TestCase):
+    def test_word_boundaries(self):
+        terms = clinical_lexicon.terms_in("Sober patient, warm extremities, dreams of routine care")
+        self.assertNotIn("sob", terms)
+        self.assertNotIn("arm", terms)
+        self.assertNotIn("ams", terms)
+        self.assertNotIn("uti", terms)
+
+    def test_spans_overlaps_plurals_and_stems(self):
+        text = "Chest pains and SOB; patient confused, arms bruised"
+        hits = clinical_lexicon.find(text)
+        by_term = {hit.term: hit for hit in hits}
+
+        self.assertEqual(text[by_term["chest pain"].start:by_term["chest pain"].end], "Chest pains")
+        self.assertIn("chest", by_term)
+        self.assertEqual(text[by_term["sob"].start:by_term["sob"].end], "SOB")
+        self.assertIn("confus", by_term)
+        self.assertIn("arm", by_term)
+
+    def test_ies_plural(self):
+        hits = clinical_lexicon.find("Multiple injuries after a fall")
+        self.assertEqual([(hit.term, hit.start, hit.end) for hit in hits], [("injury", 9, 17)])
+
+    def test_multiword_prefix_does_not_match_alone(self):
+        matcher = KeywordMatcher(["shortness of breath"])
+        self.assertEqual(matcher.find("shortness of time"), [])
+        self.assertEqual(len(matcher.find("acute shortness of breath")), 1)
+
+    def test_layers_share_extraction_hits(self):
+        extracted = ExtractionDetector().extract("45-year-old, sober, with wrist laceration")
+        self.assertEqual(extracted["chief_complaint"], "General")
+        self.assertEqual(extracted["keywords"], ["laceration", "wrist"])
+        self.assertEqual(lexicon_terms("ignored", extracted), frozenset({"laceration", "wrist"}))
+        self.assertFalse(LLMRouter()._contains_high_risk_terms("sober", extracted))
+        self.assertTrue(LLMRouter()._contains_high_risk_terms("acute SOB"))
+
+
+if __name__ == "__main__":
+    unittest.main()
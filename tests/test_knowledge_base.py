@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+import unittest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from rag.knowledge_base import get_knowledge_base
+
+
+class TestKnowledgeBase(unittest.IsolatedAsyncioTestCase):
+    def test_shared_instance(self):
+        self.assertIs(get_knowledge_base(), get_knowledge_base({"use_vector_db": False}))
+        with self.assertRaises(TypeError):
+            get_knowledge_base().labs_by_test["new"] = ()
+
+    async def test_indexed_lookups(self):
+        kb = get_knowledge_base()
+
+        labs = await kb.retrieve_lab_indications("Troponin")
+        self.assertEqual(labs.results[0]["test"], "Troponin (high-sensitivity)")
+
+        vitals = await kb.retrieve_vital_norms(30)
+        self.assertEqual(vitals.results[0]["age_group"], "Adult 18-65 years")
+
+        differentials = await kb.retrieve_differential_diagnoses("Chest Pain")
+        self.assertEqual(differentials.num_results, 1)
+
+        criteria = await kb.retrieve_esi_criteria(2, "Chest Pain")
+        self.assertTrue(all(doc["level"] == 2 for doc in criteria.results))
+        self.assertEqual((await kb.retrieve_lab_indications("Unknown test")).num_results, 0)
+
+    async def test_ranked_condition_lookup(self):
+        kb = get_knowledge_base()
+
+        criteria = await kb.retrieve_esi_criteria(2, "Chest Pain")
+        self.assertEqual(criteria.results[0]["id"], "esi_2_chest_pain")
+        self.assertEqual(criteria.confidence_scores, sorted(criteria.confidence_scores, reverse=True))
+        self.assertLess(criteria.confidence_scores[-1], 1.0)
+
+        discrimination = await kb.retrieve_esi_criteria(0, condition="resource discrimination")
+        self.assertEqual([doc["id"] for doc in discrimination.results], ["esi_resource_discrimination"])
+
+        hits = kb.search_index.search("lactate sepsis", mode="and")
+        self.assertTrue(all(hit.collection in {"sepsis_criteria", "lab_indications"} for hit in hits))
+        self.assertGreater(len(kb.search_index.search("lactate sepsis", mode="or")), len(hits))
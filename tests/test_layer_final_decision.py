@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 from pathlib import Path
@@ -11,7 +12,9 @@ sys.path.insert(0, str(base_dir / "app"))
 sys.path.insert(0, str(base_dir / "tests"))
 
 from config import settings
-from detectors.final_decision import FinalDecisionDetector
+from detectors.extraction import ExtractionDetector
+from detectors.final_decision import FinalDecisionDetector, project_context
+from llm_client import count_tokens
 from test_helpers import FakeResponse
 
 
@@ -25,7 +28,7 @@ class TestFinalDecisionLayer(unittest.IsolatedAsyncioTestCase):
         async def fake_create(*_args, **_kwargs):
             return FakeResponse(fake_content)
 
-        with patch("detectors.final_decision.AsyncOpenAI") as mock_client:
+        with patch("detectors.final_decision.get_openai_client") as mock_client:
             instance = mock_client.return_value
             instance.chat.completions.create = fake_create
 
@@ -34,4 +37,48 @@ class TestFinalDecisionLayer(unittest.IsolatedAsyncioTestCase):
 
         self.assertEqual(result["esi"], 3)
         self.assertGreater(result["confidence"], 0.5)
-        self.assertTrue(result["reason"].startswith("Resources"))
\ No newline at end of file
+        self.assertTrue(result["reason"].startswith("Resources"))
+
+    async def test_prompt_carries_only_decision_fields(self):
+        settings.OPENROUTER_API_KEY = "test-key"
+        case_text = "58-year-old male with chest pain, HR 112, BP 150/95, SpO2 95%"
+        extracted = ExtractionDetector().extract(case_text)
+        context = {
+            "esi_level": 2,
+            "preliminary_reason": "Red flags detected",
+            "extraction": extracted,
+            "red_flags": {
+                "esi": 2, "flags": ["Chest pain"], "has_red_flags": True, "severity_score": 0.8,
+                "confidence": 0.9, "reason": "ACS risk", "cost_usd": 0.01, "prompt_tokens": 900,
+                "rag": {"enabled": True, "sources": ["esi_handbook"], "queries": ["ESI-2 criteria"]},
+            },
+            "vitals": {
+                "vitals": extracted["vitals"], "abnormalities": {"hr": True, "sbp": False, "rr": None},
+                "critical": False, "rag": {"enabled": True, "evidence": {"hr_normal": "60-100 bpm"}},
+            },
+            "resources": {"resources": ["ECG", "Troponin"], "resource_count": 2, "rag": {"evidence": []}},
+        }
+
+        projected = project_context(context)
+        self.assertEqual(projected["abnormal_vitals"], ["hr"])
+        self.assertEqual(projected["red_flags"], ["Chest pain"])
+        self.assertEqual(projected["resource_count"], 2)
+        self.assertNotIn(case_text, json.dumps(projected))
+        legacy = json.dumps({"case_text": case_text, "context": context}, ensure_ascii=False)
+
+        sent = {}
+
+        async def fake_create(*_args, **kwargs):
+            sent.update(kwargs)
+            return FakeResponse('{"esi_level": 2, "confidence": 0.9, "reasoning": "ACS"}')
+
+        with patch("detectors.final_decision.get_openai_client") as mock_client:
+            mock_client.return_value.chat.completions.create = fake_create
+            result = await FinalDecisionDetector().decide(case_text, context)
+
+        user_message = sent["messages"][-1]["content"]
+        self.assertEqual(result["esi"], 2)
+        self.assertEqual(user_message.count(case_text), 1)
+        self.assertNotIn("prompt_tokens", user_message)
+        self.assertNotIn("hr_normal", user_message)
+        self.assertLess(count_tokens(user_message), count_tokens(legacy) / 2)
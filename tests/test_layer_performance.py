@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+import unittest
+
+base_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(base_dir / "app"))
+sys.path.insert(0, str(base_dir / "scripts"))
+
+import bench_layers
+
+
+class TestLayerPerformance(unittest.TestCase):
+    """Short runs of scripts/bench_layers.py against the committed regression thresholds."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.thresholds = bench_layers.load_thresholds()
+        cls.report = bench_layers.run(budget_s=0.05, repeat=3)
+
+    def test_every_benchmark_has_thresholds(self):
+        for name, sizes in self.report.items():
+            self.assertEqual(set(sizes), set(self.thresholds[name]), name)
+
+    def test_within_thresholds(self):
+        self.assertEqual(bench_layers.check(self.report, self.thresholds), [])
+
+    def test_long_texts_are_10_to_50_kb(self):
+        texts = bench_layers.texts()
+        self.assertGreaterEqual(len(texts["10kb"]), 10 * 1024)
+        self.assertLess(len(texts["50kb"]), 51 * 1024)
+
+    def test_check_reports_breaches(self):
+        report = {"malicious.analyze": {"short": {"ops_per_s": 10.0, "peak_kb": 1.0, "blocks": 1}}}
+        failures = bench_layers.check(report, self.thresholds)
+        self.assertEqual(len(failures), 1)
+        self.assertIn("malicious.analyze [short]", failures[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
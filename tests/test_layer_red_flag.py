@@ -28,7 +28,7 @@ class TestRedFlagLayer(unittest.IsolatedAsyncioTestCase):
         async def fake_create(*_args, **_kwargs):
             return FakeResponse(fake_content)
 
-        with patch("detectors.red_flag.AsyncOpenAI") as mock_client:
+        with patch("detectors.red_flag.get_openai_client") as mock_client:
             instance = mock_client.return_value
             instance.chat.completions.create = fake_create
 
@@ -4,6 +4,7 @@ import unittest
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
 
+from detectors.extraction import ExtractionDetector
 from detectors.resource_inference import ResourceInferenceDetector
 
 
@@ -18,4 +19,19 @@ class TestResourceInferenceLayer(unittest.IsolatedAsyncioTestCase):
         self.assertGreaterEqual(result["resource_count"], 2)
         self.assertIn("ECG", result["resources"])
         self.assertIn("Sutures", result["resources"])
-        self.assertIn("X-ray", result["resources"])
\ No newline at end of file
+        self.assertIn("X-ray", result["resources"])
+
+    async def test_only_extracted_keywords_drive_resources(self):
+        detector = ResourceInferenceDetector()
+        extracted = ExtractionDetector().extract("45 yo with wrist injuries, headache and vomiting")
+        self.assertEqual(extracted["keywords"], ["wrist"])
+        result = await detector.infer("", extracted, use_llm=False)
+
+        # Headache (CT Head), injury (X-ray) and vomiting (IV Fluids) are not extraction keywords
+        self.assertEqual(result["resources"], ["X-ray", "Splint"])
+        # Two resources: preliminary ESI 3, as before the shared matcher
+        self.assertEqual(result["resource_count"], 2)
+
+        # Without keywords every lexicon hit counts
+        extracted = ExtractionDetector().extract("45 yo with injuries and headache")
+        self.assertEqual(detector.rule_based_resources("", extracted), ["X-ray", "CT Head"])
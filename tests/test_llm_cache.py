@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+import unittest
+
+base_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(base_dir / "app"))
+sys.path.insert(0, str(base_dir / "tests"))
+
+from llm_cache import LLMResponseCache, SQLiteCacheBackend
+from llm_client import create_chat_completion
+from test_helpers import FakeAsyncOpenAI
+
+
+class TestLLMResponseCache(unittest.IsolatedAsyncioTestCase):
+    async def test_repeated_request_is_served_from_cache(self):
+        cache = LLMResponseCache(max_entries=8, ttl_seconds=60)
+        client = FakeAsyncOpenAI('{"esi_level": 4}')
+        calls = []
+        original_create = client.chat.completions.create
+
+        async def counting_create(**kwargs):
+            calls.append(kwargs)
+            return await original_create(**kwargs)
+
+        client.chat.completions.create = counting_create
+        request = {
+            "model": "gpt-4o-mini",
+            "messages": [{"role": "user", "content": "Case: ankle sprain"}],
+            "temperature": 0.0,
+            "max_tokens": 100,
+            "response_format": {"type": "json_object"},
+        }
+
+        first = await create_chat_completion(client, cache=cache, **request)
+        second = await create_chat_completion(client, cache=cache, **request)
+
+        self.assertEqual(len(calls), 1)
+        self.assertFalse(first.cached)
+        self.assertTrue(second.cached)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second.cost_usd, 0.0)
+        self.assertAlmostEqual(second.cost_saved_usd, first.cost_usd)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_lru_and_ttl_eviction(self):
+        cache = LLMResponseCache(max_entries=2, ttl_seconds=60)
+        for key in ("a", "b", "c"):
+            cache.set(key, {"content": key})
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), {"content": "c"})
+
+        cache = LLMResponseCache(max_entries=2, ttl_seconds=0.01)
+        cache.set("a", {"content": "a"})
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("a"))
+
+    def test_sqlite_backend_survives_restart(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.db")
+            LLMResponseCache(backend=SQLiteCacheBackend(path)).set("k", {"content": "x"})
+            restarted = LLMResponseCache(backend=SQLiteCacheBackend(path))
+            self.assertEqual(restarted.get("k"), {"content": "x"})
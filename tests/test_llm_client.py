@@ -0,0 +1,132 @@
+import asyncio
+import gc
+import sys
+from pathlib import Path
+import unittest
+
+import httpx
+from openai import AsyncOpenAI
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from config import settings
+import llm_client
+from llm_client import create_chat_completion, estimate_cost_usd, get_openai_client
+from detectors import final_decision, malicious_input, red_flag, resource_inference
+from llm_stub_server import _detect_layer, create_stub_app
+from prompt_layout import EVIDENCE_GUARD, build_messages, message_text
+
+
+class TestLLMClient(unittest.IsolatedAsyncioTestCase):
+    def test_client_is_shared(self):
+        self.assertIs(get_openai_client(), get_openai_client())
+
+    def test_concurrency_limit_does_not_outlive_its_loop(self):
+        async def limit() -> None:
+            llm_client._concurrency_limit()
+
+        loops = len(llm_client._semaphores)
+        asyncio.run(limit())
+        asyncio.run(limit())
+        gc.collect()
+        self.assertLessEqual(len(llm_client._semaphores), loops)
+
+    async def test_completion_against_stub_server(self):
+        stub = create_stub_app()
+        http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub), base_url="http://stub")
+        client = AsyncOpenAI(api_key="stub", base_url="http://stub/v1", http_client=http_client)
+
+        completion = await create_chat_completion(
+            client,
+            model="stub-model",
+            messages=[
+                {"role": "system", "content": "Identify if this case has RED FLAGS"},
+                {"role": "user", "content": "Case: 60yo chest pain"},
+            ],
+            temperature=0.0,
+            max_tokens=50,
+            response_format={"type": "json_object"},
+            cache=None,
+        )
+        await client.close()
+
+        self.assertIn("has_red_flags", completion.content)
+        self.assertGreater(completion.total_tokens, 0)
+        self.assertEqual(stub.state.requests, 1)
+
+    async def test_cached_prompt_tokens_are_billed_at_cached_rate(self):
+        stub = create_stub_app()
+        http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub), base_url="http://stub")
+        client = AsyncOpenAI(api_key="stub", base_url="http://stub/v1", http_client=http_client)
+
+        completions = []
+        for case in ("Case: 60yo chest pain", "Case: 25yo ankle sprain"):
+            completions.append(
+                await create_chat_completion(
+                    client,
+                    model="anthropic/claude-3.5-sonnet",
+                    messages=build_messages(
+                        "Identify if this case has RED FLAGS", case, evidence="- level: 2",
+                        model="anthropic/claude-3.5-sonnet",
+                    ),
+                    temperature=0.0,
+                    max_tokens=50,
+                    response_format={"type": "json_object"},
+                    cache=None,
+                )
+            )
+        await client.close()
+
+        first, second = completions
+        self.assertEqual(first.cached_prompt_tokens, 0)
+        self.assertGreater(second.cached_prompt_tokens, 0)
+        self.assertAlmostEqual(
+            second.billed_cost_usd,
+            estimate_cost_usd(second.prompt_tokens, second.completion_tokens, second.cached_prompt_tokens),
+        )
+        self.assertLess(
+            second.billed_cost_usd, estimate_cost_usd(second.prompt_tokens, second.completion_tokens)
+        )
+
+
+class TestStubServer(unittest.TestCase):
+    def test_each_detector_prompt_gets_its_own_reply(self):
+        prompts = {
+            "malicious": malicious_input.LLM_SYSTEM_PROMPT,
+            "red_flag": red_flag.SYSTEM_PROMPT,
+            "resources": resource_inference.SYSTEM_PROMPT,
+            "final_decision": final_decision.SYSTEM_PROMPT,
+        }
+        for layer, prompt in prompts.items():
+            with self.subTest(layer=layer):
+                messages = build_messages(prompt, "Case: text", evidence="- level: 2", model="gpt-4o-mini")
+                self.assertEqual(_detect_layer(messages), layer)
+
+
+class TestPromptLayout(unittest.TestCase):
+    def test_static_content_comes_first(self):
+        messages = build_messages("Instructions", "Case: text", evidence="- level: 2", model="gpt-4o-mini")
+
+        self.assertEqual([m["role"] for m in messages], ["system", "system", "user"])
+        self.assertEqual(messages[0]["content"], "Instructions")
+        self.assertTrue(messages[1]["content"].startswith(EVIDENCE_GUARD))
+        self.assertEqual(messages[2]["content"], "Case: text")
+
+        without_evidence = build_messages("Instructions", "Case: text")
+        self.assertEqual(len(without_evidence), 2)
+
+    def test_cache_control_hint_on_last_static_block(self):
+        messages = build_messages("Instructions", "Case: text", evidence="- level: 2", model="anthropic/claude-3-haiku")
+
+        self.assertIsInstance(messages[0]["content"], str)
+        self.assertEqual(messages[1]["content"][0]["cache_control"], {"type": "ephemeral"})
+        self.assertIn("- level: 2", message_text(messages[1]))
+        self.assertIsInstance(messages[2]["content"], str)
+
+        original = settings.LLM_PROMPT_CACHE_HINTS
+        settings.LLM_PROMPT_CACHE_HINTS = False
+        try:
+            plain = build_messages("Instructions", "Case: text", model="anthropic/claude-3-haiku")
+        finally:
+            settings.LLM_PROMPT_CACHE_HINTS = original
+        self.assertIsInstance(plain[0]["content"], str)
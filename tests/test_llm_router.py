@@ -0,0 +1,86 @@
+import sys
+from pathlib import Path
+import unittest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from config import settings
+from detectors.extraction import ExtractionDetector
+from detectors.resource_inference import ResourceInferenceDetector
+from llm_router import LLMRouter
+
+
+class TestFastPath(unittest.TestCase):
+    def setUp(self):
+        self.router = LLMRouter()
+        self.extraction = ExtractionDetector()
+        self.resources = ResourceInferenceDetector()
+        self._enabled = settings.FAST_PATH_ENABLED
+        settings.FAST_PATH_ENABLED = True
+
+    def tearDown(self):
+        settings.FAST_PATH_ENABLED = self._enabled
+
+    def _fast_path(self, text):
+        extracted = self.extraction.extract(text)
+        return self.router.fast_path(text, extracted, self.resources.rule_based_resources(text, extracted))
+
+    def test_critical_vitals_are_esi_2(self):
+        decision = self._fast_path("66 year old with COPD, worse breathing. RR 32, SpO2 86% on room air, HR 108")
+        self.assertEqual(decision.esi_level, 2)
+        self.assertEqual(decision.rule, "critical_vitals")
+        self.assertTrue(decision.red_flag_result()["has_red_flags"])
+
+    def test_low_acuity_adult_is_esi_5(self):
+        decision = self._fast_path("25 yo with sore throat for 2 days. Temp 99.1 F, HR 78, BP 116/72, RR 14, SpO2 99%.")
+        self.assertEqual(decision.esi_level, 5)
+        self.assertEqual(decision.rule, "low_acuity")
+        self.assertEqual(decision.final_decision_result()["cost_usd"], 0.0)
+
+    def test_ambiguous_cases_go_to_the_llm(self):
+        cases = [
+            # Possible ESI-1
+            "70 yo unresponsive, SpO2 85%, BP 80/40",
+            "SpO2 75%, HR 130",
+            # Low confidence reading (no % unit)
+            "sat 86, HR 100",
+            # Child, abnormal vitals, resources, unrecognized complaint, too few vitals
+            "5 year old with sore throat. Temp 99.1 F, HR 100, RR 20, SpO2 99%",
+            "25 yo with sore throat. Temp 101.5 F, HR 110, RR 16, SpO2 99%",
+            "25 yo with sore throat and chest pain. HR 78, BP 116/72, RR 14, SpO2 99%",
+            "40 yo with worst headache of life. HR 78, BP 116/72, RR 14, SpO2 99%",
+            "25 yo with rash. HR 78",
+        ]
+        for text in cases:
+            with self.subTest(text=text):
+                self.assertIsNone(self._fast_path(text))
+
+    def test_high_risk_words_beside_a_low_acuity_term_go_to_the_llm(self):
+        vitals = " 30 yo. HR 80, BP 120/80, RR 16, SpO2 98%, T 98.6F"
+        notes = [
+            "requests refill of antidepressant, reports suicidal ideation with a plan",
+            "rash, petechiae and stiff neck",
+            "sore throat and drooling, unable to swallow",
+            "insect bite, lip swelling and hives",
+            "pregnant woman with rash",
+        ]
+        self.assertEqual(self._fast_path("rash." + vitals).esi_level, 5)
+        for note in notes:
+            with self.subTest(note=note):
+                self.assertIsNone(self._fast_path(note + "." + vitals))
+
+    def test_gates_are_configurable(self):
+        text = "25 yo with sore throat. Temp 99.1 F, HR 78, BP 116/72, RR 14, SpO2 99%."
+        original = settings.FAST_PATH_ESI5_MIN_CONFIDENCE, settings.FAST_PATH_ENABLED
+        try:
+            settings.FAST_PATH_ESI5_MIN_CONFIDENCE = 0.99
+            self.assertIsNone(self._fast_path(text))
+            settings.FAST_PATH_ESI5_MIN_CONFIDENCE = 0.9
+            settings.FAST_PATH_ENABLED = False
+            self.assertIsNone(self._fast_path(text))
+        finally:
+            settings.FAST_PATH_ESI5_MIN_CONFIDENCE, settings.FAST_PATH_ENABLED = original
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+import unittest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from metrics import MetricsRegistry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_openmetrics_rendering(self):
+        registry = MetricsRegistry()
+        requests = registry.counter("demo_requests", "Requests", ("model",))
+        latency = registry.histogram("demo_seconds", "Latency", ("layer",), buckets=(0.1, 1.0))
+        requests.inc("gpt-4o")
+        requests.inc("gpt-4o", amount=2)
+        latency.observe(0.05, "red_flag")
+        latency.observe(0.5, "red_flag")
+        latency.observe(5.0, "red_flag")
+        registry.register_collector("extra", lambda: [("demo_ratio", "gauge", "Ratio", [("", {}, 0.25)])])
+
+        lines = registry.render().splitlines()
+        self.assertIn("# TYPE demo_requests counter", lines)
+        self.assertIn('demo_requests_total{model="gpt-4o"} 3', lines)
+        self.assertIn('demo_seconds_bucket{layer="red_flag",le="0.1"} 1', lines)
+        self.assertIn('demo_seconds_bucket{layer="red_flag",le="1"} 2', lines)
+        self.assertIn('demo_seconds_bucket{layer="red_flag",le="+Inf"} 3', lines)
+        self.assertIn('demo_seconds_count{layer="red_flag"} 3', lines)
+        self.assertIn('demo_seconds_sum{layer="red_flag"} 5.55', lines)
+        self.assertIn("demo_ratio 0.25", lines)
+        self.assertEqual(lines[-1], "# EOF")
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.counter("demo", "Demo", ("model",)).inc('a"b')
+        self.assertIn('demo_total{model="a\\"b"} 1', registry.render())
+
+    def test_reregistering_a_collector_replaces_it(self):
+        registry = MetricsRegistry()
+        registry.register_collector("extra", lambda: [("demo_a", "gauge", "A", [("", {}, 1)])])
+        registry.register_collector("extra", lambda: [("demo_b", "gauge", "B", [("", {}, 2)])])
+        rendered = registry.render()
+        self.assertNotIn("demo_a", rendered)
+        self.assertIn("demo_b 2", rendered)
+
+
+if __name__ == "__main__":
+    unittest.main()
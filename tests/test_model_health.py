@@ -0,0 +1,158 @@
+import json
+import sys
+import time
+from pathlib import Path
+import unittest
+
+import httpx
+from openai import AsyncOpenAI
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from config import settings
+from llm_client import create_chat_completion
+from llm_router import LLMRouter
+from llm_stub_server import create_stub_app
+from model_health import LatencyHistogram, equivalent_model, model_health
+
+
+OVERRIDES = {
+    "ROUTER_ENABLED": True,
+    "ROUTER_DEFAULT_MODEL": "fast-a",
+    "ROUTER_DEFAULT_FALLBACK_MODEL": "fast-b",
+    "ROUTER_HIGH_MODEL": "big-a",
+    "ROUTER_HIGH_FALLBACK_MODEL": "big-b",
+    "ROUTER_HEALTH_MIN_SAMPLES": 5,
+    "ROUTER_HEDGING_ENABLED": True,
+    "ROUTER_HEDGE_DEFAULT_DELAY_MS": 50.0,
+    "ROUTER_HEDGE_MIN_DELAY_MS": 10.0,
+}
+
+
+class ModelHealthTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self._saved = {name: getattr(settings, name) for name in OVERRIDES}
+        for name, value in OVERRIDES.items():
+            setattr(settings, name, value)
+        model_health.reset()
+
+    def tearDown(self):
+        for name, value in self._saved.items():
+            setattr(settings, name, value)
+        model_health.reset()
+
+    def _client(self, **stub_options) -> AsyncOpenAI:
+        self.stub = create_stub_app(**stub_options)
+        http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=self.stub), base_url="http://stub")
+        return AsyncOpenAI(api_key="stub", base_url="http://stub/v1", http_client=http_client, max_retries=0)
+
+    async def _complete(self, client: AsyncOpenAI, model: str, case: str = "case", hedge: bool = True):
+        return await create_chat_completion(
+            client,
+            model=model,
+            messages=[{"role": "system", "content": "Identify if this case has red flags."}, {"role": "user", "content": case}],
+            temperature=0.0,
+            max_tokens=50,
+            response_format={"type": "json_object"},
+            cache=None,
+            hedge=hedge,
+        )
+
+
+class TestModelHealth(ModelHealthTestCase):
+    def test_histogram_percentiles_and_window(self):
+        histogram = LatencyHistogram(max_samples=100, window_seconds=60)
+        now = time.monotonic()
+        for latency in range(1, 101):
+            histogram.record(float(latency), ok=latency % 10 != 0, now=now)
+        # Failed calls (every tenth) are excluded from latency percentiles
+        self.assertEqual(histogram.percentile(50), 49.0)
+        self.assertGreaterEqual(histogram.percentile(95), 90.0)
+        self.assertAlmostEqual(histogram.error_rate(), 0.1)
+        self.assertEqual(sum(histogram.buckets().values()), 100)
+
+        histogram.window_seconds = 0.0
+        self.assertEqual(histogram.count(), 0)
+
+    def test_equivalent_model_is_symmetric(self):
+        self.assertEqual(equivalent_model("fast-a"), "fast-b")
+        self.assertEqual(equivalent_model("big-b"), "big-a")
+        self.assertIsNone(equivalent_model("unknown"))
+
+    def test_router_falls_back_when_a_model_degrades(self):
+        router = LLMRouter()
+        self.assertEqual(router.select_red_flag_model("sore throat"), "fast-a")
+
+        for _ in range(5):
+            model_health.record("fast-a", 100.0, ok=False)
+        self.assertTrue(model_health.is_degraded("fast-a"))
+        self.assertEqual(router.select_red_flag_model("sore throat"), "fast-b")
+
+        # No alternative is better than a degraded one: keep the primary
+        for _ in range(5):
+            model_health.record("fast-b", 100.0, ok=False)
+        self.assertEqual(router.select_red_flag_model("sore throat"), "fast-a")
+
+    def test_hedge_delay_tracks_p95(self):
+        self.assertAlmostEqual(model_health.hedge_delay_seconds("fast-a"), 0.05)
+        for latency in (100.0, 110.0, 120.0, 130.0, 400.0):
+            model_health.record("fast-a", latency, ok=True)
+        self.assertAlmostEqual(model_health.hedge_delay_seconds("fast-a"), 0.4)
+
+
+class TestHedgedRequests(ModelHealthTestCase):
+    async def test_backup_answers_when_primary_is_slow(self):
+        client = self._client(model_latency_ms={"fast-a": 2000.0, "fast-b": 5.0})
+        started = time.perf_counter()
+        completion = await self._complete(client, "fast-a")
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(completion.model, "fast-b")
+        self.assertTrue(completion.hedged)
+        self.assertIn("flags_detected", json.loads(completion.content))
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(self.stub.state.model_requests, {"fast-a": 1, "fast-b": 1})
+        await client.close()
+
+    async def test_fast_primary_is_not_hedged(self):
+        client = self._client(model_latency_ms={"fast-a": 5.0})
+        completion = await self._complete(client, "fast-a")
+        self.assertEqual(completion.model, "fast-a")
+        self.assertFalse(completion.hedged)
+        self.assertEqual(self.stub.state.model_requests, {"fast-a": 1})
+        await client.close()
+
+    async def test_slow_primary_degrades_while_hedging(self):
+        client = self._client(model_latency_ms={"fast-a": 3000.0, "fast-b": 5.0})
+        for index in range(5):
+            completion = await self._complete(client, "fast-a", case=f"case {index}")
+            self.assertTrue(completion.hedged)
+
+        snapshot = model_health.snapshot()["fast-a"]
+        self.assertEqual(snapshot["censored"], 5)
+        self.assertIsNone(snapshot["p95_ms"])
+        self.assertEqual(snapshot["error_rate"], 0.0)
+        self.assertTrue(snapshot["degraded"])
+        self.assertEqual(LLMRouter().select_red_flag_model("sore throat"), "fast-b")
+        # Finished calls only: the hedge delay does not grow without bound
+        self.assertAlmostEqual(model_health.hedge_delay_seconds("fast-a"), 0.05)
+        await client.close()
+
+    async def test_primary_error_falls_over_to_backup(self):
+        client = self._client(model_error_rate={"big-a": 1.0})
+        completion = await self._complete(client, "big-a")
+        self.assertEqual(completion.model, "big-b")
+        self.assertEqual(model_health.snapshot()["big-a"]["error_rate"], 1.0)
+        await client.close()
+
+    async def test_errors_feed_routing(self):
+        client = self._client(model_error_rate={"fast-a": 1.0})
+        for index in range(5):
+            with self.assertRaises(Exception):
+                await self._complete(client, "fast-a", case=f"case {index}", hedge=False)
+        self.assertEqual(LLMRouter().select_red_flag_model("sore throat"), "fast-b")
+        await client.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+import unittest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from config import settings
+from detectors.extraction import ExtractionDetector
+from llm_router import LLMRouter
+from offload import EventLoopLagMonitor, LayerExecutor, offload_calls, process_pool_size, thread_pool_size
+
+
+CASE = "58-year-old male with chest pain radiating to left arm. HR 112, BP 150/95, RR 22, SpO2 95%."
+
+
+class TestLayerExecutor(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.executor = LayerExecutor({"extraction": "auto", "router": "process", "malicious": "thread"})
+        self.addCleanup(self.executor.shutdown)
+
+    def test_auto_policy_dispatches_by_size(self):
+        self.assertEqual(self.executor.mode("extraction", 100), "inline")
+        self.assertEqual(self.executor.mode("extraction", settings.OFFLOAD_THREAD_MIN_CHARS), "thread")
+        self.assertEqual(self.executor.mode("extraction", settings.OFFLOAD_PROCESS_MIN_CHARS), "process")
+        self.assertEqual(self.executor.mode("malicious", 10), "thread")
+        # Unknown layers stay on the loop; the router never leaves the process (it reads model health)
+        self.assertEqual(self.executor.mode("vitals", 10**6), "inline")
+        self.assertEqual(self.executor.mode("router", 10), "thread")
+
+    def test_pool_sizes_shrink_with_more_workers(self):
+        saved = settings.WEB_CONCURRENCY
+        self.addCleanup(setattr, settings, "WEB_CONCURRENCY", saved)
+        settings.WEB_CONCURRENCY = 1
+        single = (thread_pool_size(), process_pool_size())
+        settings.WEB_CONCURRENCY = 64
+        self.assertLessEqual(thread_pool_size(), single[0])
+        self.assertLessEqual(process_pool_size(), single[1])
+        self.assertGreaterEqual(process_pool_size(), 1)
+
+    async def test_every_mode_returns_the_same_result(self):
+        detector = ExtractionDetector()
+        expected = detector.extract(CASE)
+        for mode in ("inline", "thread", "process"):
+            executor = LayerExecutor({"extraction": mode})
+            self.addCleanup(executor.shutdown)
+            before = offload_calls.value("extraction", mode)
+            self.assertEqual(await executor.run("extraction", detector.extract, CASE), expected, mode)
+            self.assertEqual(offload_calls.value("extraction", mode), before + 1)
+
+    async def test_router_runs_in_this_process(self):
+        router = LLMRouter()
+        self.assertEqual(
+            await self.executor.run("router", router.select_red_flag_model, CASE),
+            router.select_red_flag_model(CASE),
+        )
+
+
+class TestEventLoopLagMonitor(unittest.IsolatedAsyncioTestCase):
+    async def test_blocking_work_shows_up_as_lag(self):
+        monitor = EventLoopLagMonitor(interval=0.01)
+        monitor.start()
+        await asyncio.sleep(0.03)
+        time.sleep(0.1)  # inline CPU work holding the loop
+        await asyncio.sleep(0.03)
+        await monitor.stop()
+        self.assertGreater(monitor.samples, 1)
+        self.assertGreaterEqual(monitor.max_lag_s, 0.05)
+        self.assertGreaterEqual(monitor.stats()["max_lag_ms"], 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import asyncio
+import sys
+from pathlib import Path
+import unittest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from pipeline import PipelineError, PipelineExecutor, PipelineLayer, Speculation, SpeculationStats
+
+
+class TestPipelineExecutor(unittest.IsolatedAsyncioTestCase):
+    async def test_independent_layers_run_concurrently(self):
+        def slow(name):
+            async def run(_results):
+                await asyncio.sleep(0.05)
+                return name
+            return run
+
+        async def combine(results):
+            return [results["a"], results["b"], results["c"]]
+
+        executor = PipelineExecutor(
+            [
+                PipelineLayer("a", slow("a")),
+                PipelineLayer("b", slow("b")),
+                PipelineLayer("c", slow("c")),
+                PipelineLayer("combined", combine, depends_on=("a", "b", "c")),
+            ]
+        )
+        run = await executor.run()
+
+        self.assertEqual(run.results["combined"], ["a", "b", "c"])
+        self.assertLess(run.total_ms, 140)
+        self.assertEqual(set(run.timings), {"a", "b", "c", "combined"})
+        self.assertTrue(all(t["status"] == "ok" for t in run.timings.values()))
+
+    async def test_timeout_uses_fallback_or_cancels(self):
+        async def hang(_results):
+            await asyncio.sleep(10)
+
+        async def fast(_results):
+            return "done"
+
+        executor = PipelineExecutor(
+            [PipelineLayer("slow", hang, timeout=0.01, fallback=lambda exc: "fallback")]
+        )
+        run = await executor.run()
+        self.assertEqual(run.results["slow"], "fallback")
+        self.assertEqual(run.timings["slow"]["status"], "timeout")
+
+        executor = PipelineExecutor(
+            [
+                PipelineLayer("slow", hang, timeout=0.01),
+                PipelineLayer("after", fast, depends_on=("slow",)),
+            ]
+        )
+        with self.assertRaises(PipelineError) as ctx:
+            await executor.run()
+        self.assertEqual(ctx.exception.layer, "slow")
+
+    def test_rejects_cycles_and_unknown_dependencies(self):
+        async def noop(_results):
+            return None
+
+        with self.assertRaises(ValueError):
+            PipelineExecutor([PipelineLayer("a", noop, depends_on=("b",)), PipelineLayer("b", noop, depends_on=("a",))])
+        with self.assertRaises(ValueError):
+            PipelineExecutor([PipelineLayer("a", noop, depends_on=("missing",))])
+
+
+class TestSpeculation(unittest.IsolatedAsyncioTestCase):
+    async def test_matching_key_reuses_speculative_result(self):
+        stats = SpeculationStats()
+        calls = []
+
+        async def decide(label):
+            calls.append(label)
+            await asyncio.sleep(0.05)
+            return label
+
+        speculation = Speculation(stats)
+        speculation.start((3, "mini"), lambda: decide("speculative"))
+        await asyncio.sleep(0.04)
+        started = asyncio.get_running_loop().time()
+        result = await speculation.resolve((3, "mini"), lambda: decide("fresh"))
+
+        self.assertEqual(result, "speculative")
+        self.assertEqual(calls, ["speculative"])
+        self.assertLess(asyncio.get_running_loop().time() - started, 0.04)
+        self.assertEqual((stats.launched, stats.hits, stats.wasted), (1, 1, 0))
+
+    async def test_changed_key_cancels_and_reissues(self):
+        stats = SpeculationStats()
+        cancelled = []
+
+        async def decide(label):
+            try:
+                await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                cancelled.append(label)
+                raise
+            return label
+
+        speculation = Speculation(stats)
+        speculation.start((3, "mini"), lambda: decide("speculative"))
+        await asyncio.sleep(0.01)
+        result = await speculation.resolve((2, "turbo"), lambda: decide("fresh"))
+
+        self.assertEqual(result, "fresh")
+        self.assertEqual(cancelled, ["speculative"])
+        self.assertEqual(speculation.outcome, "wasted")
+        self.assertIsNone(speculation.discarded)
+        self.assertEqual(stats.as_dict()["waste_rate"], 1.0)
+
+    async def test_finished_result_is_discarded_and_unstarted_is_skipped(self):
+        stats = SpeculationStats()
+
+        async def decide(label):
+            return {"esi": label}
+
+        speculation = Speculation(stats)
+        speculation.start(3, lambda: decide(3))
+        await asyncio.sleep(0)
+        self.assertEqual(await speculation.resolve(2, lambda: decide(2)), {"esi": 2})
+        self.assertEqual(speculation.discarded, {"esi": 3})
+
+        unstarted = Speculation(stats)
+        self.assertEqual(await unstarted.resolve(2, lambda: decide(2)), {"esi": 2})
+        self.assertEqual((stats.launched, stats.wasted, stats.skipped), (1, 1, 1))
@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+import unittest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from rag.config import RAGConfigManager, get_rag_config_manager
+
+
+class TestRAGConfigService(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "rag_config.json")
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_shared_instance_per_path(self):
+        self.assertIs(get_rag_config_manager(self.path), get_rag_config_manager(self.path))
+
+    def test_edit_swaps_snapshot(self):
+        manager = RAGConfigManager(self.path, reload_interval=0)
+        before = manager.snapshot()
+        version = manager.version
+
+        self.assertTrue(manager.disable_layer_rag(3))
+
+        self.assertTrue(before.layer(3).enabled)
+        self.assertFalse(manager.snapshot().layer(3).enabled)
+        self.assertEqual(manager.version, version + 1)
+        with open(self.path) as f:
+            self.assertFalse(json.load(f)["layer_3_red_flag_detection"]["enabled"])
+
+    def test_other_worker_edit_is_picked_up(self):
+        worker_a = RAGConfigManager(self.path, reload_interval=0)
+        worker_b = RAGConfigManager(self.path, reload_interval=0)
+        worker_a.save_config()
+        self.assertTrue(worker_b.snapshot().global_settings["enable_rag_globally"])
+
+        self.assertTrue(worker_a.toggle_global_rag(False))
+
+        self.assertFalse(worker_b.snapshot().global_settings["enable_rag_globally"])
+
+    def test_pinned_snapshot_is_stable(self):
+        manager = RAGConfigManager(self.path, reload_interval=0)
+        with manager.pinned() as pinned:
+            manager.set_confidence_threshold(6, 0.5)
+            self.assertIs(manager.snapshot(), pinned)
+            self.assertEqual(manager.get_layer_config(6).confidence_threshold, 0.85)
+        self.assertEqual(manager.get_layer_config(6).confidence_threshold, 0.5)
+
+    def test_invalid_file_keeps_previous_config(self):
+        manager = RAGConfigManager(self.path, reload_interval=0)
+        manager.disable_layer_rag(4)
+        with open(self.path, "w") as f:
+            f.write("{not json")
+
+        self.assertFalse(manager.snapshot().layer(4).enabled)
+
+
+if __name__ == "__main__":
+    unittest.main()
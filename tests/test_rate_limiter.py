@@ -0,0 +1,151 @@
+import contextlib
+import io
+import sys
+import threading
+from pathlib import Path
+import unittest
+from unittest import mock
+
+base_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(base_dir / "app"))
+sys.path.insert(0, str(base_dir / "tests"))
+
+import auth
+from auth import MemoryRateLimitBackend, RateLimiter, RedisRateLimitBackend
+from test_helpers import FakeRedis, UnavailableRedis
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_workers_share_redis_counters(self):
+        shared = FakeRedis()
+        worker_a = RateLimiter(RedisRateLimitBackend(shared), algorithm="fixed")
+        worker_b = RateLimiter(RedisRateLimitBackend(shared), algorithm="fixed")
+        worker_a.daily_limit = worker_b.daily_limit = 3
+
+        for limiter in (worker_a, worker_b, worker_a):
+            self.assertTrue(limiter.check_limit("10.0.0.1")[0])
+            limiter.increment("10.0.0.1")
+
+        allowed, message = worker_b.check_limit("10.0.0.1")
+        self.assertFalse(allowed)
+        self.assertIn("Rate limit exceeded", message)
+        self.assertTrue(all(ttl == auth.COUNTER_TTL_SECONDS for ttl in shared.ttls.values()))
+
+    def test_budget_uses_float_counter(self):
+        limiter = RateLimiter(RedisRateLimitBackend(FakeRedis()), algorithm="fixed")
+        limiter.daily_budget = 0.05
+        limiter.add_cost("10.0.0.2", 0.02)
+        limiter.add_cost("10.0.0.2", 0.01)
+
+        self.assertAlmostEqual(limiter.get_remaining_budget("10.0.0.2"), 0.02)
+
+    def test_memory_backend_evicts_expired_windows(self):
+        backend = MemoryRateLimitBackend(sweep_interval_seconds=0)
+        with mock.patch("auth.time.time", return_value=1_000_000.0):
+            backend.incr("old", 1, ttl_seconds=10)
+        with mock.patch("auth.time.time", return_value=1_000_100.0):
+            self.assertEqual(backend.get_many(["old"]), [0.0])
+            backend.incr("new", 1, ttl_seconds=10)
+
+        self.assertEqual(len(backend), 1)
+
+    def test_sliding_window_carries_over_yesterday(self):
+        limiter = RateLimiter(MemoryRateLimitBackend(), algorithm="sliding")
+        limiter.daily_limit = 10
+        day_start = 20_000 * auth.DAY_SECONDS
+
+        with mock.patch("auth.time.time", return_value=day_start - 60):
+            for _ in range(10):
+                limiter.increment("10.0.0.3")
+        # A quarter into the next day, 75% of yesterday's 10 queries still count
+        with mock.patch("auth.time.time", return_value=day_start + auth.DAY_SECONDS / 4):
+            self.assertEqual(limiter.get_remaining("10.0.0.3"), 2)
+            self.assertTrue(limiter.check_limit("10.0.0.3")[0])
+
+    def test_reservations_stop_concurrent_overspend(self):
+        limiter = RateLimiter(RedisRateLimitBackend(FakeRedis()), algorithm="fixed")
+        limiter.daily_limit = 10
+        limiter.daily_budget = 0.05
+
+        # A burst reserves before any request finishes; only what fits in the budget is admitted
+        reservations = [limiter.reserve("10.0.0.4", 0.02)[0] for _ in range(5)]
+        admitted = [r for r in reservations if r is not None]
+        self.assertEqual(len(admitted), 2)
+        self.assertEqual(limiter.get_remaining("10.0.0.4"), 8)
+
+        limiter.settle(admitted[0], 0.005)
+        limiter.settle(admitted[1], 0.0)
+        limiter.settle(admitted[1], 0.03)  # already settled: ignored
+        self.assertAlmostEqual(limiter.get_remaining_budget("10.0.0.4"), 0.045)
+
+    def test_reserve_enforces_query_limit(self):
+        limiter = RateLimiter(MemoryRateLimitBackend(), algorithm="fixed")
+        limiter.daily_limit = 1
+        self.assertIsNotNone(limiter.reserve("10.0.0.5", 0.0)[0])
+        reservation, message = limiter.reserve("10.0.0.5", 0.0)
+        self.assertIsNone(reservation)
+        self.assertIn("Rate limit exceeded", message)
+        self.assertEqual(limiter.get_remaining("10.0.0.5"), 0)
+
+    def test_unavailable_redis_falls_back_to_process_limits(self):
+        client = UnavailableRedis()
+        limiter = RateLimiter(RedisRateLimitBackend(client, retry_after_seconds=60), algorithm="fixed")
+        limiter.daily_limit = 1
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertIsNotNone(limiter.reserve("10.0.0.6", 0.0)[0])
+            reservation, message = limiter.reserve("10.0.0.6", 0.0)
+        self.assertIsNone(reservation)
+        self.assertIn("Rate limit exceeded", message)
+        self.assertIn("per-process limits", output.getvalue())
+        # Redis is not retried on every call while it is down
+        self.assertEqual(client.attempts, 1)
+
+    def test_reservation_settles_on_the_store_that_holds_it(self):
+        healthy = FakeRedis()
+        backend = RedisRateLimitBackend(healthy, retry_after_seconds=60)
+        limiter = RateLimiter(backend, algorithm="fixed")
+        limiter.daily_budget = 1.0
+        held, _ = limiter.reserve("10.0.0.7", 0.5)
+
+        # Redis drops out before the settle: the hold stays in Redis, not as a negative memory counter
+        backend.client = UnavailableRedis()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            limiter.settle(held, 0.1)
+            during_outage, _ = limiter.reserve("10.0.0.7", 0.2)
+        self.assertIn("not settling", output.getvalue())
+        self.assertEqual(float(healthy.store[held.cost_key]), 0.5)
+        self.assertEqual(backend.fallback.get_many([held.cost_key]), [0.2])
+
+        # Redis is back: a reservation made on the fallback still settles there
+        backend.client = healthy
+        backend._retry_at = 0.0
+        limiter.settle(during_outage, 0.05)
+        self.assertAlmostEqual(backend.fallback.get_many([held.cost_key])[0], 0.05)
+        self.assertEqual(float(healthy.store[held.cost_key]), 0.5)
+
+
+class TestRateLimiterAsync(unittest.IsolatedAsyncioTestCase):
+    async def test_redis_calls_run_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        threads = set()
+
+        class RecordingRedis(FakeRedis):
+            def mget(self, keys):
+                threads.add(threading.get_ident())
+                return super().mget(keys)
+
+        limiter = RateLimiter(RedisRateLimitBackend(RecordingRedis()), algorithm="fixed")
+        reservation, _ = await limiter.reserve_async("10.0.0.7", 0.01)
+        await limiter.settle_async(reservation, 0.0)
+        remaining, _budget = await limiter.remaining_async("10.0.0.7")
+
+        self.assertEqual(remaining, limiter.daily_limit - 1)
+        self.assertTrue(threads)
+        self.assertNotIn(loop_thread, threads)
+
+
+if __name__ == "__main__":
+    unittest.main()
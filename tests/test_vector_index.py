@@ -0,0 +1,78 @@
+import sys
+from pathlib import Path
+import unittest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from rag.knowledge_base import KnowledgeBase
+from rag.vector_index import HashingEmbedder, VectorIndex
+
+
+class TestVectorIndex(unittest.IsolatedAsyncioTestCase):
+    def test_ivf_recall_against_brute_force(self):
+        items = [(i, text, None) for i, text in enumerate([
+            "chest pain radiating to left arm",
+            "fever and productive cough",
+            "wrist fracture after fall",
+            "shortness of breath with wheezing",
+            "abdominal pain with vomiting",
+            "laceration to forearm needs sutures",
+            "headache with neck stiffness",
+            "ankle sprain while running",
+            "urinary burning and frequency",
+            "seizure witnessed by family",
+        ])]
+        queries = [
+            "crushing chest pain",
+            "cough with fever",
+            "fell on wrist",
+            "wheezing and short of breath",
+            "vomiting and abdominal pain",
+            "forearm laceration",
+            "stiff neck headache",
+            "sprained ankle",
+            "burning urination",
+            "family saw a seizure",
+        ]
+        brute = VectorIndex(HashingEmbedder(dim=256)).build(items)
+        ivf = VectorIndex(HashingEmbedder(dim=256), method="ivf", n_lists=4, n_probe=2).build(items)
+
+        top = brute.search("crushing chest pain", top_k=1)[0]
+        self.assertEqual(top.key, 0)
+        self.assertGreater(top.score, brute.search("crushing chest pain", top_k=2)[1].score)
+
+        # Probing 2 of 4 lists scores only part of the index
+        for query in queries:
+            self.assertLess(len(ivf._candidate_rows(ivf.embedder.embed([query])[0])), len(items))
+        recall_at_1 = sum(
+            ivf.search(query, top_k=1)[0].key == brute.search(query, top_k=1)[0].key for query in queries
+        ) / len(queries)
+        recall_at_3 = sum(
+            len({hit.key for hit in ivf.search(query, top_k=3)} & {hit.key for hit in brute.search(query, top_k=3)})
+            for query in queries
+        ) / (3 * len(queries))
+        self.assertGreaterEqual(recall_at_1, 0.9)
+        self.assertGreaterEqual(recall_at_3, 0.8)
+
+    async def test_knowledge_base_free_text_retrieval(self):
+        kb = KnowledgeBase({"use_vector_db": True})
+        self.assertIsNotNone(kb.vector_index)
+
+        result = await kb.search("dyspnea, wheezing, COPD history", collection="differential_diagnosis", top_k=1)
+        self.assertEqual(result.results[0]["chief_complaint"], "Dyspnea")
+        self.assertLessEqual(result.confidence_scores[0], 1.0)
+
+        # A keyed miss is empty even with free text; search() is the free-text entry point
+        miss = await kb.retrieve_lab_indications("Unknown", query_text="chest pain troponin")
+        self.assertEqual((miss.results, miss.num_results), ([], 0))
+
+        # num_results counts matches before the top-k cut, as for structured lookups
+        protocols = await kb.retrieve_acs_protocols(query_text="troponin", top_k=1)
+        self.assertEqual((len(protocols.results), protocols.num_results), (1, 3))
+        search = await kb.search("lactate shock sepsis", top_k=1)
+        self.assertEqual(len(search.results), 1)
+        self.assertGreater(search.num_results, 1)
+
+        search = await kb.search("lactate shock sepsis", top_k=4)
+        self.assertEqual(len(search.results), 4)
+        self.assertEqual(search.confidence_scores, sorted(search.confidence_scores, reverse=True))
@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+import unittest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from vitals_parser import parse_vitals
+
+
+class TestVitalsParser(unittest.TestCase):
+    def test_legacy_format(self):
+        parsed = parse_vitals("32-year-old female. HR 110, RR 22, BP 140/90, T 99.1F, SpO2 94%")
+
+        self.assertEqual(parsed.age, 32)
+        self.assertEqual(
+            parsed.vitals,
+            {"hr": 110, "rr": 22, "sbp": 140, "dbp": 90, "temp_f": 99.1, "spo2": 94},
+        )
+
+    def test_extended_formats_and_celsius(self):
+        text = "67 yo. HR: 112, BP 90/60 mmHg, SpO2 88 %, T 38.5C, resp rate 24"
+        parsed = parse_vitals(text)
+
+        self.assertEqual(parsed.vitals["hr"], 112)
+        self.assertEqual((parsed.vitals["sbp"], parsed.vitals["dbp"]), (90, 60))
+        self.assertEqual(parsed.vitals["spo2"], 88)
+        self.assertEqual(parsed.vitals["temp_f"], 101.3)
+        self.assertEqual(parsed.vitals["rr"], 24)
+
+        bp = next(reading for reading in parsed.readings if reading.name == "sbp")
+        self.assertEqual(text[bp.start:bp.end], "BP 90/60 mmHg")
+        self.assertEqual(bp.confidence, 1.0)
+
+    def test_pulse_and_sat_labels(self):
+        parsed = parse_vitals("pulse ox 92%, pulse 130, sat 91%")
+
+        self.assertEqual(parsed.vitals["spo2"], 92)
+        self.assertEqual(parsed.vitals["hr"], 130)
+
+    def test_rejects_embedded_labels_and_implausible_values(self):
+        parsed = parse_vitals("Chart 45, sat up at 10, BP 40/90")
+
+        self.assertEqual(parsed.vitals, {})
+        self.assertIsNone(parsed.age)
+
+
+if __name__ == "__main__":
+    unittest.main()